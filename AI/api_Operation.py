@@ -2,19 +2,34 @@
 
 import google.generativeai as genai
 from google.generativeai.types import content_types
+from google.api_core import exceptions as google_exceptions
 from AI.api_load import load_api
+from AI.extraction_cache import extraction_cache_key, get_cached_extraction, store_extraction
+from AI.streaming_json import JsonArrayStreamParser
+from AI.schemas import find_schema, find_schema_in_text, validate_extraction, apply_repairs, describe_problems
+from utils.prompts import get_field_repair_prompt, get_missing_items_prompt
+from utils.rate_limiter import get_rate_limiter
 import time
 import numpy as np
 import streamlit as st
 import re
 import pandas as pd
 import json
+import logging
+
+def _quota_retry_delay(error):
+    """Erro de cota do Gemini (429): repete a chamada após o backoff do limitador."""
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return 0
+    return None
+
 
 class PDFQA:
     def __init__(self):
         load_api()  # Carrega a API
         # Seu modelo original para todas as operações
-        self.model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
+        self.model_name = 'gemini-2.5-flash-preview-05-20'
+        self.model = genai.GenerativeModel(self.model_name)
 
     #----------------- Função para fazer perguntas ao modelo Gemini (sua versão original) ----------------------
     def ask_gemini(self, pdf_files, question):
@@ -40,7 +55,7 @@ class PDFQA:
             progress_bar.progress(60)
             
             # Usa o seu modelo principal
-            response = self.model.generate_content(inputs)
+            response = self._generate_content(inputs)
             progress_bar.progress(100)
             st.success("Resposta gerada com sucesso!")
             return response.text
@@ -57,10 +72,152 @@ class PDFQA:
             return match.group(2)
         return text.strip()
 
+    #----------------- Chamada ao modelo pedindo resposta em JSON ----------------------
+    def _generate_json_response(self, pdf_bytes, prompt, stream=False):
+        part_pdf = {"mime_type": "application/pdf", "data": pdf_bytes}
+        
+        # Configuração para solicitar JSON
+        generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
+
+        # Usa o seu modelo principal com a configuração de resposta JSON
+        return self._generate_content(
+            [prompt, part_pdf],
+            generation_config=generation_config,
+            stream=stream
+        )
+
+    #----------------- Chamada ao modelo respeitando o limite de ritmo do Gemini ----------------------
+    def _generate_content(self, contents, **kwargs):
+        return get_rate_limiter("gemini").call(
+            lambda: self.model.generate_content(contents, **kwargs),
+            _quota_retry_delay
+        )
+
+    #----------------- Validação da resposta e novo pedido só do que faltou ----------------------
+    def _parse_response(self, pdf_bytes, prompt, text):
+        """
+        Converte a resposta da IA em JSON e a valida pelo esquema do prompt (AI/schemas.py).
+        - JSON truncado ou malformado: aproveita os itens completos e pede à IA só os restantes;
+        - campos ausentes ou inválidos: pede de novo apenas esses campos, uma única vez.
+        Campos que continuarem pendentes ficam como vieram, para o usuário conferir.
+        """
+        try:
+            data = json.loads(self._clean_json_string(text))
+        except json.JSONDecodeError:
+            data = self._recover_partial_response(pdf_bytes, prompt, text)
+            if data is None:
+                raise
+
+        schema = find_schema(data)
+        if schema is None:
+            return data
+        data, problems = validate_extraction(schema, data)
+        if problems:
+            data = self._repair_fields(pdf_bytes, schema, data, problems)
+        return data
+
+    def _recover_partial_response(self, pdf_bytes, prompt, text):
+        schema = find_schema_in_text(text)
+        if schema is None or not schema.is_list:
+            return None
+        items = [item for item in JsonArrayStreamParser(schema.key).feed(text) if isinstance(item, dict)]
+        if not items:
+            return None
+
+        extracted_ids = [str(item.get(schema.id_field)) for item in items if item.get(schema.id_field)]
+        missing_prompt = get_missing_items_prompt(prompt, schema.key, schema.id_field, extracted_ids)
+        response = self._generate_json_response(pdf_bytes, missing_prompt)
+        remaining = json.loads(self._clean_json_string(response.text))
+
+        seen_ids = set(extracted_ids)
+        for item in (remaining.get(schema.key) if isinstance(remaining, dict) else None) or []:
+            if isinstance(item, dict) and str(item.get(schema.id_field)) not in seen_ids:
+                items.append(item)
+        return {schema.key: items}
+
+    def _repair_fields(self, pdf_bytes, schema, data, problems):
+        pending = describe_problems(schema, data, problems)
+        repair_prompt = get_field_repair_prompt(
+            schema.key, schema.is_list, json.dumps(pending, ensure_ascii=False, indent=2)
+        )
+        try:
+            response = self._generate_json_response(pdf_bytes, repair_prompt)
+            repaired = json.loads(self._clean_json_string(response.text))
+        except Exception as e:
+            logging.warning(f"Não foi possível completar os campos pendentes da extração: {e}")
+            return data
+
+        data = apply_repairs(schema, data, problems, repaired)
+        data, _ = validate_extraction(schema, data)
+        return data
+
+    def _store_if_valid(self, cache_key, data, list_key=None):
+        """
+        Guarda a extração no cache só se ela confere com o esquema do prompt, sem campos pendentes,
+        ou, sem esquema conhecido, se traz a lista 'list_key'. Respostas fora do formato não são
+        guardadas, para que a próxima análise do mesmo PDF chame a IA de novo.
+        """
+        schema = find_schema(data)
+        if schema is not None:
+            try:
+                _, problems = validate_extraction(schema, data)
+            except ValueError:
+                return
+            if problems:
+                return
+        elif not (list_key and isinstance(data, dict) and isinstance(data.get(list_key), list)):
+            return
+        store_extraction(cache_key, data)
+
+    #----------------- Extração sem interface (para uso em threads) ----------------------
+    def extract_json(self, pdf_bytes, prompt):
+        """
+        Extrai dados estruturados dos bytes de um PDF e retorna o JSON já convertido.
+        Não usa elementos do Streamlit, então pode rodar fora da thread da página;
+        os erros (inclusive JSON inválido) são propagados para quem chamou.
+        Resultados já extraídos do mesmo PDF com o mesmo prompt vêm do cache em disco.
+        """
+        cache_key = extraction_cache_key(pdf_bytes, prompt, self.model_name)
+        cached = get_cached_extraction(cache_key)
+        if cached is not None:
+            return cached
+
+        response = self._generate_json_response(pdf_bytes, prompt)
+        extracted_data = self._parse_response(pdf_bytes, prompt, response.text)
+        self._store_if_valid(cache_key, extracted_data)
+        return extracted_data
+
+    #----------------- Extração com resposta em streaming (prévia dos itens) ----------------------
+    def extract_json_streaming(self, pdf_bytes, prompt, list_key, on_item):
+        """
+        Igual a extract_json, mas recebe a resposta em partes: cada objeto da lista 'list_key'
+        é repassado para on_item(objeto) assim que chega, para exibir uma prévia.
+        O JSON completo, validado no final, é o valor retornado.
+        """
+        cache_key = extraction_cache_key(pdf_bytes, prompt, self.model_name)
+        cached = get_cached_extraction(cache_key)
+        if cached is not None:
+            cached_items = cached.get(list_key) if isinstance(cached, dict) else None
+            for item in cached_items or []:
+                on_item(item)
+            return cached
+
+        parser = JsonArrayStreamParser(list_key)
+        text_parts = []
+        for chunk in self._generate_json_response(pdf_bytes, prompt, stream=True):
+            text_parts.append(chunk.text)
+            for item in parser.feed(chunk.text):
+                on_item(item)
+
+        extracted_data = self._parse_response(pdf_bytes, prompt, "".join(text_parts))
+        self._store_if_valid(cache_key, extracted_data, list_key)
+        return extracted_data
+
     #----------------- NOVA FUNÇÃO: Extração de Dados Estruturados ----------------------
     def extract_structured_data(self, pdf_file, prompt):
         """
         Extrai dados estruturados de um ÚNICO PDF, solicitando uma resposta em JSON.
+        Se o mesmo PDF já foi analisado com o mesmo prompt, o resultado vem do cache em disco.
         """
         if not pdf_file:
             st.warning("Nenhum arquivo PDF fornecido para extração.")
@@ -71,19 +228,16 @@ class PDFQA:
                 pdf_bytes = pdf_file.read()
                 pdf_file.seek(0)
 
-                part_pdf = {"mime_type": "application/pdf", "data": pdf_bytes}
-                
-                # Configuração para solicitar JSON
-                generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
-
-                # Usa o seu modelo principal com a configuração de resposta JSON
-                response = self.model.generate_content(
-                    [prompt, part_pdf],
-                    generation_config=generation_config
-                )
+                cache_key = extraction_cache_key(pdf_bytes, prompt, self.model_name)
+                extracted_data = get_cached_extraction(cache_key)
+                if extracted_data is not None:
+                    st.success(f"Dados de '{pdf_file.name}' recuperados de uma análise anterior.")
+                    return extracted_data
+
+                response = self._generate_json_response(pdf_bytes, prompt)
                 
-                cleaned_response = self._clean_json_string(response.text)
-                extracted_data = json.loads(cleaned_response)
+                extracted_data = self._parse_response(pdf_bytes, prompt, response.text)
+                self._store_if_valid(cache_key, extracted_data)
                 
                 st.success(f"Dados extraídos com sucesso de '{pdf_file.name}'!")
                 return extracted_data
@@ -0,0 +1,129 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pypdf import PdfReader, PdfWriter
+from gdrive.config import AI_CHUNK_PAGES, AI_CHUNK_MAX_WORKERS, AI_CHUNK_MAX_ATTEMPTS
+
+# Extração em partes para relatórios grandes: o PDF é dividido em faixas de páginas,
+# cada faixa vai para a IA em paralelo e as listas de equipamentos são unidas no final.
+# Como cada parte passa pelo cache de extração, repetir a análise após uma falha
+# só reenvia as partes que falharam.
+
+_chunk_pool = ThreadPoolExecutor(max_workers=AI_CHUNK_MAX_WORKERS, thread_name_prefix="isf-ia-parte")
+
+CHUNK_PROMPT_NOTE = """
+
+ATENÇÃO: este arquivo é um trecho de um relatório maior (páginas {first} a {last} do original).
+{context_note}Extraia apenas os equipamentos que aparecem nessas páginas, no mesmo formato JSON pedido acima.
+"""
+CONTEXT_PAGE_NOTE = "A primeira página do relatório foi incluída no início apenas como contexto (cabeçalho, datas, empresa); não extraia equipamentos dela.\n"
+
+
+class ChunkedExtractionError(Exception):
+    """Uma ou mais partes do PDF não puderam ser extraídas, mesmo após novas tentativas."""
+
+
+def _pdf_from_pages(reader, page_numbers):
+    writer = PdfWriter()
+    for page_number in page_numbers:
+        writer.add_page(reader.pages[page_number])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def split_pdf(pdf_bytes, pages_per_chunk=AI_CHUNK_PAGES):
+    """
+    Divide o PDF em partes de até 'pages_per_chunk' páginas.
+    Retorna uma lista de (primeira_pagina, ultima_pagina, bytes), com páginas numeradas a partir de 1.
+    A partir da segunda parte, a primeira página do relatório é repetida no início como contexto.
+    Retorna None se o PDF cabe em uma única parte.
+    """
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    total_pages = len(reader.pages)
+    if total_pages <= pages_per_chunk:
+        return None
+
+    chunks = []
+    for start in range(0, total_pages, pages_per_chunk):
+        pages = list(range(start, min(start + pages_per_chunk, total_pages)))
+        with_context = [0] + pages if start > 0 else pages
+        chunks.append((pages[0] + 1, pages[-1] + 1, _pdf_from_pages(reader, with_context)))
+    return chunks
+
+
+def _extract_part(pdf_qa, pdf_bytes, prompt, list_key, on_item):
+    if on_item is None:
+        return pdf_qa.extract_json(pdf_bytes, prompt)
+    return pdf_qa.extract_json_streaming(pdf_bytes, prompt, list_key, on_item)
+
+
+def _extract_chunk(pdf_qa, chunk_bytes, prompt, list_key, on_item):
+    last_error = None
+    for attempt in range(1, AI_CHUNK_MAX_ATTEMPTS + 1):
+        try:
+            return _extract_part(pdf_qa, chunk_bytes, prompt, list_key, on_item)
+        except Exception as e:
+            last_error = e
+            logging.warning(f"Falha na extração de uma parte do PDF (tentativa {attempt}): {e}")
+    raise last_error
+
+
+def merge_extractions(results, list_key, id_field):
+    """
+    Une os JSONs das partes: os campos fora da lista vêm da primeira parte e a lista
+    'list_key' é concatenada, sem repetir equipamentos com o mesmo 'id_field'.
+    Itens sem identificação são mantidos.
+    """
+    merged = {key: value for key, value in results[0].items() if key != list_key}
+    items = []
+    seen_ids = set()
+    for result in results:
+        for item in result.get(list_key) or []:
+            item_id = str(item.get(id_field, '')).strip() if isinstance(item, dict) else ''
+            if item_id:
+                if item_id in seen_ids:
+                    continue
+                seen_ids.add(item_id)
+            items.append(item)
+    merged[list_key] = items
+    return merged
+
+
+def extract_json_chunked(pdf_qa, pdf_bytes, prompt, list_key, id_field, pages_per_chunk=AI_CHUNK_PAGES, on_item=None):
+    """
+    Extrai um relatório em partes, em paralelo, e retorna o JSON unido.
+    PDFs pequenos (até 'pages_per_chunk' páginas) são enviados em uma única chamada.
+    Se 'on_item' for informado, as respostas vêm em streaming e cada item da lista é
+    repassado a on_item(item) assim que chega (itens de tentativas repetidas podem se repetir).
+    Levanta ChunkedExtractionError indicando as páginas das partes que falharam.
+    """
+    chunks = split_pdf(pdf_bytes, pages_per_chunk)
+    if chunks is None:
+        return _extract_part(pdf_qa, pdf_bytes, prompt, list_key, on_item)
+
+    futures = []
+    for first, last, chunk_bytes in chunks:
+        context_note = CONTEXT_PAGE_NOTE if first > 1 else ""
+        chunk_prompt = prompt + CHUNK_PROMPT_NOTE.format(first=first, last=last, context_note=context_note)
+        futures.append((first, last, _chunk_pool.submit(_extract_chunk, pdf_qa, chunk_bytes, chunk_prompt, list_key, on_item)))
+
+    results = []
+    failed_ranges = []
+    for first, last, future in futures:
+        try:
+            result = future.result()
+        except Exception:
+            failed_ranges.append(f"{first}-{last}")
+            continue
+        if isinstance(result, dict):
+            results.append(result)
+        else:
+            failed_ranges.append(f"{first}-{last}")
+
+    if failed_ranges:
+        raise ChunkedExtractionError(
+            f"Não foi possível extrair as páginas {', '.join(failed_ranges)}. "
+            "Tente novamente: as partes já extraídas não serão reenviadas à IA."
+        )
+    return merge_extractions(results, list_key, id_field)
@@ -0,0 +1,36 @@
+import json
+import hashlib
+from gdrive.config import EXTRACTION_CACHE_DB_PATH, EXTRACTION_CACHE_MAX_BYTES
+from utils.disk_cache import DiskLRUCache
+
+# Resultados de extração da IA já obtidos, guardados em disco: o mesmo PDF analisado com o
+# mesmo prompt e o mesmo modelo retorna o JSON na hora, sem nova chamada ao Gemini.
+
+_cache = DiskLRUCache(EXTRACTION_CACHE_DB_PATH, EXTRACTION_CACHE_MAX_BYTES)
+
+
+def extraction_cache_key(pdf_bytes, prompt, model_name):
+    """Chave do cache: SHA-256 do conteúdo do PDF, do prompt e do nome do modelo."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    return f"{model_name}:{prompt_hash}:{pdf_hash}"
+
+
+def get_cached_extraction(key):
+    """Retorna o JSON extraído anteriormente para a chave, ou None."""
+    value = _cache.get(key)
+    if value is None:
+        return None
+    try:
+        return json.loads(value.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+
+
+def store_extraction(key, data):
+    """Guarda no cache um JSON extraído com sucesso."""
+    _cache.set(key, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def clear_extraction_cache():
+    _cache.clear()
@@ -0,0 +1,246 @@
+import io
+import re
+import logging
+import unicodedata
+from datetime import datetime
+from pypdf import PdfReader
+
+# Extração local (sem IA) para layouts conhecidos de fornecedores.
+# Cada template é reconhecido por uma "impressão digital" (frases que precisam aparecer no
+# texto do PDF) e devolve o mesmo JSON pedido pelo prompt correspondente em utils/prompts.py.
+# Se nenhum template reconhece o documento, ou o resultado não passa na validação,
+# quem chamou segue para a extração pela IA.
+
+
+class PdfTemplate:
+    """
+    Layout conhecido de relatório.
+    - list_key: chave da lista no JSON de saída ("mangueiras", "scbas", ...);
+    - fingerprint: frases (sem acento, minúsculas) que precisam estar todas no texto;
+    - parse: função(lista_de_textos_das_paginas) -> dict no formato do prompt, ou None;
+    - required_fields: campos que todo item precisa ter preenchidos para o resultado ser aceito;
+    - expected_count: função(lista_de_textos_das_paginas) -> número de itens que o documento
+      parece ter (ex.: linhas da tabela), ou None. Se o parse achar menos itens, o resultado é
+      recusado e a extração segue pela IA, em vez de perder itens sem aviso.
+    """
+
+    def __init__(self, name, list_key, fingerprint, parse, required_fields, expected_count=None):
+        self.name = name
+        self.list_key = list_key
+        self.fingerprint = tuple(fingerprint)
+        self.parse = parse
+        self.required_fields = tuple(required_fields)
+        self.expected_count = expected_count
+
+    def matches(self, normalized_text):
+        return all(phrase in normalized_text for phrase in self.fingerprint)
+
+    def is_valid(self, data, expected=None):
+        items = data.get(self.list_key) if isinstance(data, dict) else None
+        if not items:
+            return False
+        if expected is not None and len(items) != expected:
+            return False
+        return all(
+            isinstance(item, dict) and all(str(item.get(field) or '').strip() for field in self.required_fields)
+            for item in items
+        )
+
+
+_templates = []
+
+
+def register_template(template):
+    """Adiciona um template ao registro; os templates são testados na ordem de registro."""
+    _templates.append(template)
+
+
+def normalize_text(text):
+    """Remove acentos e deixa em minúsculas, para comparar frases do layout."""
+    without_accents = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return without_accents.lower()
+
+
+def _read_pages(pdf_bytes):
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [page.extract_text() or '' for page in reader.pages]
+
+
+def extract_with_templates(pdf_bytes, list_key):
+    """
+    Tenta extrair o PDF com um template local para a lista 'list_key'.
+    Retorna o JSON extraído, ou None se nenhum template reconhece o documento (ou o
+    resultado é inválido) — nesse caso a extração deve seguir pela IA.
+    """
+    if not any(template.list_key == list_key for template in _templates):
+        return None
+
+    try:
+        pages = _read_pages(pdf_bytes)
+    except Exception as e:
+        logging.warning(f"Não foi possível ler o texto do PDF para os templates locais: {e}")
+        return None
+    return extract_from_pages(pages, list_key)
+
+
+def extract_from_pages(pages, list_key):
+    """Igual a extract_with_templates, a partir do texto já extraído de cada página."""
+    candidates = [template for template in _templates if template.list_key == list_key]
+    normalized = normalize_text("\n".join(pages))
+    for template in candidates:
+        if not template.matches(normalized):
+            continue
+        try:
+            data = template.parse(pages)
+        except Exception:
+            logging.exception(f"Falha no template local '{template.name}'.")
+            continue
+        expected = template.expected_count(pages) if template.expected_count else None
+        if data is not None and template.is_valid(data, expected):
+            logging.info(f"PDF extraído localmente com o template '{template.name}'.")
+            return data
+        logging.info(f"Template local '{template.name}' reconheceu o PDF, mas o resultado foi inválido.")
+    return None
+
+
+#----------------- Utilitários de leitura ----------------------
+
+def _search(pattern, text, flags=re.IGNORECASE):
+    match = re.search(pattern, text, flags)
+    return match.group(1).strip() if match else None
+
+
+def _iso_date(value):
+    """Converte DD/MM/AAAA (ou AAAA-MM-DD) em AAAA-MM-DD; None se não reconhecer."""
+    if not value:
+        return None
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y'):
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def _iso_datetime(value):
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M'):
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    return None
+
+
+#----------------- Certificado de mangueiras (NBR 12779) ----------------------
+
+# Linha da tabela: Número, Marca, Diâmetro, Tipo, Comprimento, Mês/Ano, ..., Resultado Final (A/R)
+_HOSE_ROW = re.compile(
+    r'^\s*(?P<id>\d{1,4})\s+(?P<marca>[^\W\d_][\w .&-]*?)\s+'
+    r'(?P<diametro>\d(?:\s+\d/\d)?|\d/\d)\s*"?\s+(?P<tipo>\d)\s+(?P<comprimento>\d{1,2},\d{2})\s+'
+    r'(?P<mes>\d{1,2})/(?P<ano>\d{4})\b.*?\b(?P<resultado>[AR])\s*$',
+    re.MULTILINE
+)
+# Qualquer linha que pareça da tabela (começa pelo número e termina no resultado A/R),
+# mesmo que _HOSE_ROW não consiga separar as colunas
+_HOSE_TABLE_LINE = re.compile(r'^\s*\d{1,4}\s+\S.*\s[AR]\s*$', re.MULTILINE)
+_HOSE_RESULTS = {'A': 'APROVADO', 'R': 'REPROVADO'}
+
+
+def count_hose_rows(pages):
+    return len(_HOSE_TABLE_LINE.findall("\n".join(pages)))
+
+
+def parse_hose_certificate(pages):
+    text = "\n".join(pages)
+    inspection_date = _iso_date(_search(r'Data\s+sa[ií]da\.*\s*:?\s*(\d{2}/\d{2}/\d{4})', text))
+    company = _search(r'Vendedor\.*\s*:?\s*([^\n]+)', text)
+    inspector = _search(r'Respons[aá]vel\s+T[eé]cnico\.*\s*:?\s*([^\n]+)', text)
+
+    hoses = []
+    for row in _HOSE_ROW.finditer(text):
+        hoses.append({
+            "id_mangueira": row.group('id'),
+            "marca": row.group('marca').strip(),
+            "diametro": re.sub(r'\s+', ' ', row.group('diametro')),
+            "tipo": row.group('tipo'),
+            "comprimento": row.group('comprimento'),
+            "ano_fabricacao": row.group('ano'),
+            "data_inspecao": inspection_date,
+            "empresa_executante": company,
+            "inspetor_responsavel": inspector,
+            "resultado": _HOSE_RESULTS[row.group('resultado')],
+        })
+    return {"mangueiras": hoses}
+
+
+register_template(PdfTemplate(
+    name="Certificado de mangueiras NBR 12779",
+    list_key="mangueiras",
+    fingerprint=("nbr 12779", "resultado final", "data saida"),
+    parse=parse_hose_certificate,
+    required_fields=("id_mangueira", "marca", "diametro", "data_inspecao", "resultado"),
+    expected_count=count_hose_rows,
+))
+
+
+#----------------- Relatório Posi3 USB (SCBA) ----------------------
+
+_POSI3_TEST = r'{label}[^\n]*?\b(Aprovado|Reprovado)\b[^\n]*?(\d+(?:,\d+)?\s*(?:mbar|bar))'
+# Rótulo no início da linha seguido de um ID com ao menos um dígito: não confunde com as linhas
+# de teste, como "Vazamento de máscara Aprovado"
+_POSI3_ID = r'^\s*{label}\s*:?\s*((?=[A-Z-]*\d)[A-Z0-9-]{{4,}})\s*$'
+
+
+def _posi3_id(label, page):
+    return _search(_POSI3_ID.format(label=label), page, re.IGNORECASE | re.MULTILINE)
+
+
+def _posi3_test(label, text):
+    match = re.search(_POSI3_TEST.format(label=label), text, re.IGNORECASE)
+    if not match:
+        return None, None
+    return match.group(1).capitalize(), re.sub(r'\s+', ' ', match.group(2))
+
+
+def parse_posi3_report(pages):
+    # Cada página com o título do Posi3 é o relatório de um equipamento
+    scbas = []
+    for page in pages:
+        if 'posi3' not in page.lower():
+            continue
+        mask_result, mask_value = _posi3_test(r'Vazamento\s+de\s+m[aá]scara', page)
+        high_result, high_value = _posi3_test(r'Vazamento\s+de\s+press[aã]o\s+alta', page)
+        alarm_result, alarm_value = _posi3_test(r'300\s*bar\s+Whistle', page)
+        scbas.append({
+            "data_teste": _iso_datetime(_search(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}|\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}(?::\d{2})?)', page)),
+            "data_validade": _iso_date(_search(r'V[aá]lid[a-z]*[^\n\d]*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})', page)),
+            "numero_serie_equipamento": _search(r'^\s*S/N\s*:?\s*([A-Z0-9-]+)\s*$', page, re.IGNORECASE | re.MULTILINE),
+            "marca": _search(r'^\s*Marca\s*:?\s*([^\n]+)', page, re.IGNORECASE | re.MULTILINE),
+            "modelo": _search(r'^\s*Modelo\s*:?\s*([^\n]+)', page, re.IGNORECASE | re.MULTILINE),
+            "numero_serie_mascara": _posi3_id(r'M[aá]scara', page),
+            "numero_serie_segundo_estagio": _posi3_id(r'Segundo\s+est[aá]gio', page),
+            "resultado_final": _search(r'\b(APTO PARA USO|INAPTO PARA USO|N[AÃ]O APTO PARA USO)\b', page),
+            "vazamento_mascara_resultado": mask_result,
+            "vazamento_mascara_valor": mask_value,
+            "vazamento_pressao_alta_resultado": high_result,
+            "vazamento_pressao_alta_valor": high_value,
+            "pressao_alarme_resultado": alarm_result,
+            "pressao_alarme_valor": alarm_value,
+            "empresa_executante": _search(r'\n([^\n]*\bLTDA\b[^\n]*)', page),
+            "responsavel_tecnico": _search(r'Respons[aá]vel\s+T[eé]cnico\s*:?\s*([^\n]+)', page),
+        })
+    return {"scbas": scbas}
+
+
+register_template(PdfTemplate(
+    name="Resultados do teste Posi3 USB",
+    list_key="scbas",
+    fingerprint=("resultados do teste posi3 usb",),
+    parse=parse_posi3_report,
+    required_fields=(
+        "data_teste", "data_validade", "numero_serie_equipamento", "resultado_final",
+        "vazamento_mascara_resultado", "vazamento_pressao_alta_resultado", "pressao_alarme_resultado",
+    ),
+))
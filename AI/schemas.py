@@ -0,0 +1,283 @@
+import re
+import unicodedata
+from datetime import datetime
+
+# Esquemas do JSON pedido por cada prompt de utils/prompts.py. A saída da IA é validada e
+# convertida para os formatos esperados pelo app; os campos que faltam ou não puderam ser
+# convertidos são listados para que só eles sejam pedidos de novo à IA.
+
+
+class Field:
+    """
+    Campo de um item extraído.
+    kind: 'str', 'date' (AAAA-MM-DD), 'datetime' (AAAA-MM-DD HH:MM:SS), 'year' (AAAA),
+    'choice' (um dos valores de 'choices'), 'str_list' (lista de textos) ou
+    'int_map' (dicionário nome -> quantidade inteira).
+    """
+
+    def __init__(self, name, kind='str', required=False, choices=None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.choices = choices or ()
+
+
+class ExtractionSchema:
+    """
+    Formato de uma extração: 'key' é a chave principal do JSON; se 'is_list', o valor é uma
+    lista de itens identificados por 'id_field'; senão, é um único objeto.
+    """
+
+    def __init__(self, key, fields, id_field=None, is_list=True):
+        self.key = key
+        self.fields = fields
+        self.id_field = id_field
+        self.is_list = is_list
+
+
+EXTINGUISHER_SCHEMA = ExtractionSchema("extintores", id_field="numero_identificacao", fields=[
+    Field("tipo_servico", 'choice', required=True, choices=("Inspeção", "Manutenção Nível 2", "Manutenção Nível 3")),
+    Field("numero_identificacao", required=True),
+    Field("numero_selo_inmetro"),
+    Field("tipo_agente"),
+    Field("capacidade"),
+    Field("marca_fabricante"),
+    Field("ano_fabricacao", 'year'),
+    Field("data_servico", 'date', required=True),
+    Field("empresa_executante"),
+    Field("inspetor_responsavel"),
+    Field("aprovado_inspecao", 'choice', choices=("Sim", "Não")),
+    Field("observacoes_gerais"),
+])
+
+HOSE_SCHEMA = ExtractionSchema("mangueiras", id_field="id_mangueira", fields=[
+    Field("id_mangueira", required=True),
+    Field("marca"),
+    Field("diametro", required=True),
+    Field("tipo"),
+    Field("comprimento"),
+    Field("ano_fabricacao", 'year'),
+    Field("data_inspecao", 'date', required=True),
+    Field("empresa_executante"),
+    Field("inspetor_responsavel"),
+    Field("resultado", required=True),
+])
+
+SHELTER_SCHEMA = ExtractionSchema("abrigos", id_field="id_abrigo", fields=[
+    Field("cliente", required=True),
+    Field("id_abrigo", required=True),
+    Field("itens", 'int_map', required=True),
+])
+
+SCBA_SCHEMA = ExtractionSchema("scbas", id_field="numero_serie_equipamento", fields=[
+    Field("data_teste", 'datetime', required=True),
+    Field("data_validade", 'date', required=True),
+    Field("numero_serie_equipamento", required=True),
+    Field("marca"),
+    Field("modelo"),
+    Field("numero_serie_mascara"),
+    Field("numero_serie_segundo_estagio"),
+    Field("resultado_final", required=True),
+    Field("vazamento_mascara_resultado", required=True),
+    Field("vazamento_mascara_valor"),
+    Field("vazamento_pressao_alta_resultado", required=True),
+    Field("vazamento_pressao_alta_valor"),
+    Field("pressao_alarme_resultado", required=True),
+    Field("pressao_alarme_valor"),
+    Field("empresa_executante"),
+    Field("responsavel_tecnico"),
+])
+
+AIR_QUALITY_SCHEMA = ExtractionSchema("laudo", is_list=False, fields=[
+    Field("data_ensaio", 'date', required=True),
+    Field("resultado_geral", 'choice', required=True, choices=("Aprovado", "Reprovado")),
+    Field("observacoes"),
+    Field("cilindros", 'str_list', required=True),
+])
+
+SCHEMAS = {
+    schema.key: schema
+    for schema in (EXTINGUISHER_SCHEMA, HOSE_SCHEMA, SHELTER_SCHEMA, SCBA_SCHEMA, AIR_QUALITY_SCHEMA)
+}
+
+
+def find_schema(data):
+    """Identifica o esquema pela chave principal do JSON extraído (None se desconhecida)."""
+    if not isinstance(data, dict):
+        return None
+    for key in data:
+        if key in SCHEMAS:
+            return SCHEMAS[key]
+    return None
+
+
+def find_schema_in_text(text):
+    """Identifica o esquema pela chave principal em um texto JSON, mesmo malformado."""
+    for key, schema in SCHEMAS.items():
+        if f'"{key}"' in text:
+            return schema
+    return None
+
+
+#----------------- Conversões ----------------------
+
+def _fold(text):
+    without_accents = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return without_accents.strip().lower()
+
+
+_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y')
+_DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M')
+_INVALID = object()
+
+
+def _parse_datetime(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _coerce(field, value):
+    """Converte um valor para o tipo do campo; retorna _INVALID se não for possível."""
+    if field.kind == 'int_map':
+        if not isinstance(value, dict):
+            return _INVALID
+        quantities = {}
+        for name, quantity in value.items():
+            try:
+                quantities[str(name).strip()] = int(float(str(quantity).replace(',', '.')))
+            except ValueError:
+                return _INVALID
+        return quantities
+
+    if field.kind == 'str_list':
+        if isinstance(value, str):
+            value = [part for part in re.split(r'[,;\n]', value)]
+        if not isinstance(value, list):
+            return _INVALID
+        return [str(part).strip() for part in value if str(part).strip()]
+
+    if isinstance(value, (dict, list)):
+        return _INVALID
+    text = str(value).strip()
+
+    if field.kind == 'date':
+        # Datas com hora ficam só com a data
+        parsed = _parse_datetime(text, _DATE_FORMATS) or _parse_datetime(text, _DATETIME_FORMATS)
+        return parsed.strftime('%Y-%m-%d') if parsed else _INVALID
+
+    if field.kind == 'datetime':
+        parsed = _parse_datetime(text, _DATETIME_FORMATS) or _parse_datetime(text, _DATE_FORMATS)
+        return parsed.strftime('%Y-%m-%d %H:%M:%S') if parsed else _INVALID
+
+    if field.kind == 'year':
+        match = re.search(r'\b(19|20)\d{2}\b', text)
+        return match.group(0) if match else _INVALID
+
+    if field.kind == 'choice':
+        folded = _fold(text)
+        for choice in field.choices:
+            if _fold(choice) == folded:
+                return choice
+        return _INVALID
+
+    return text
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, (str, list, dict)) and len(value) == 0)
+
+
+def _validate_item(schema, item):
+    """Retorna (item convertido, lista de campos ausentes ou inválidos)."""
+    coerced = dict(item)
+    problems = []
+    for field in schema.fields:
+        value = item.get(field.name)
+        if _is_empty(value):
+            coerced[field.name] = None
+            if field.required:
+                problems.append(field.name)
+            continue
+        converted = _coerce(field, value)
+        if converted is _INVALID:
+            # O valor original é mantido para o usuário conferir, mas o campo é pedido de novo
+            problems.append(field.name)
+        else:
+            coerced[field.name] = converted
+    return coerced, problems
+
+
+def validate_extraction(schema, data):
+    """
+    Valida e converte o JSON extraído.
+    Retorna (dados convertidos, problemas), onde problemas é uma lista de
+    (índice do item ou None para objeto único, [campos]) apenas dos itens com pendências.
+    Levanta ValueError se a chave principal estiver ausente ou no formato errado.
+    """
+    content = data.get(schema.key) if isinstance(data, dict) else None
+    if schema.is_list:
+        if not isinstance(content, list):
+            raise ValueError(f"O JSON extraído não contém a lista '{schema.key}'.")
+        items = []
+        problems = []
+        for index, item in enumerate(content):
+            if not isinstance(item, dict):
+                continue
+            coerced, item_problems = _validate_item(schema, item)
+            items.append(coerced)
+            if item_problems:
+                problems.append((len(items) - 1, item_problems))
+        return {**data, schema.key: items}, problems
+
+    if not isinstance(content, dict):
+        raise ValueError(f"O JSON extraído não contém o objeto '{schema.key}'.")
+    coerced, item_problems = _validate_item(schema, content)
+    return {**data, schema.key: coerced}, ([(None, item_problems)] if item_problems else [])
+
+
+def apply_repairs(schema, data, problems, repaired):
+    """
+    Aplica as respostas do novo pedido à IA: apenas os campos pendentes de cada item são
+    substituídos. Nas listas, os itens são localizados pelo 'indice' devolvido.
+    """
+    content = repaired.get(schema.key) if isinstance(repaired, dict) else None
+    if schema.is_list:
+        if not isinstance(content, list):
+            return data
+        items = [dict(item) for item in data[schema.key]]
+        pending = dict(problems)
+        for answer in content:
+            if not isinstance(answer, dict):
+                continue
+            try:
+                index = int(answer.get('indice'))
+            except (TypeError, ValueError):
+                continue
+            for field_name in pending.get(index, []):
+                if not _is_empty(answer.get(field_name)):
+                    items[index][field_name] = answer[field_name]
+        return {**data, schema.key: items}
+
+    if not isinstance(content, dict):
+        return data
+    fixed = dict(data[schema.key])
+    for field_name in problems[0][1] if problems else []:
+        if not _is_empty(content.get(field_name)):
+            fixed[field_name] = content[field_name]
+    return {**data, schema.key: fixed}
+
+
+def describe_problems(schema, data, problems):
+    """Monta a lista de pendências enviada no novo pedido à IA."""
+    if not schema.is_list:
+        return {"campos": problems[0][1]} if problems else {}
+    requests = []
+    for index, fields in problems:
+        item = data[schema.key][index]
+        known = {key: value for key, value in item.items() if key not in fields and not _is_empty(value)}
+        requests.append({"indice": index, "dados_conhecidos": known, "campos": fields})
+    return requests
@@ -0,0 +1,76 @@
+import json
+
+# Leitura incremental de uma resposta JSON que chega em partes (streaming):
+# devolve cada objeto da lista principal assim que ele se fecha, sem esperar o fim da resposta.
+
+
+class JsonArrayStreamParser:
+    """
+    Recebe trechos de texto de um JSON no formato {"<list_key>": [{...}, {...}]} e
+    devolve, a cada trecho, os objetos da lista que ficaram completos.
+    Objetos que não são JSON válido são ignorados aqui; o JSON completo é validado no final.
+    """
+
+    def __init__(self, list_key):
+        self._marker = f'"{list_key}"'
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def _find_array_start(self):
+        marker_at = self._buffer.find(self._marker)
+        if marker_at < 0:
+            return False
+        bracket_at = self._buffer.find('[', marker_at + len(self._marker))
+        if bracket_at < 0:
+            return False
+        self._in_array = True
+        self._pos = bracket_at + 1
+        return True
+
+    def feed(self, text):
+        """Acrescenta um trecho da resposta e retorna a lista de objetos completados por ele."""
+        items = []
+        if self._finished or not text:
+            return items
+        self._buffer += text
+        if not self._in_array and not self._find_array_start():
+            return items
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        items.append(json.loads(buffer[self._item_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+            elif char == ']' and self._depth == 0:
+                self._finished = True
+                i += 1
+                break
+            i += 1
+        self._pos = i
+        return items
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from AI.pdf_templates import extract_from_pages
+
+# Confere os templates locais (AI/pdf_templates.py) com textos de certificados, no formato
+# devolvido pelo pypdf (páginas separadas por '\f'), e o JSON esperado de cada um.
+# Uso: python AI/template_fixtures/check_templates.py
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_pages(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.txt"), encoding="utf-8") as f:
+        return f.read().split("\f")
+
+
+def check_fixtures():
+    """Retorna a lista de divergências entre o resultado dos templates e o JSON esperado."""
+    problems = []
+    for file_name in sorted(os.listdir(FIXTURES_DIR)):
+        if not file_name.endswith(".txt"):
+            continue
+        name = file_name[:-len(".txt")]
+        with open(os.path.join(FIXTURES_DIR, f"{name}.json"), encoding="utf-8") as f:
+            expected = json.load(f)
+        result = extract_from_pages(_load_pages(name), next(iter(expected)))
+        if result != expected:
+            problems.append(f"{name}: esperado {json.dumps(expected, ensure_ascii=False)}, obtido {json.dumps(result, ensure_ascii=False)}")
+
+    # Tabela com uma linha que o template não consegue separar: o resultado deve ser recusado (segue para a IA)
+    pages = _load_pages("hose_nbr12779")
+    pages[-1] = pages[-1].replace("Legenda:", '7 KIDDE BRASIL 1 1/2" 2 15.00 05/2015 S S A\nLegenda:')
+    if extract_from_pages(pages, "mangueiras") is not None:
+        problems.append("hose_nbr12779 incompleto: tabela com linha não reconhecida foi aceita")
+    return problems
+
+
+if __name__ == "__main__":
+    problems = check_fixtures()
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} divergência(s)")
+    sys.exit(1 if problems else 0)
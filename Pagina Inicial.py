@@ -4,6 +4,7 @@ import os
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import is_user_logged_in, is_admin, can_edit, can_view, get_user_role
 from operations.demo_page import show_demo_page
+from operations.archive import start_yearly_archiver
 from config.page_config import set_page_config 
 
 set_page_config()
@@ -43,6 +44,8 @@ def main():
     show_logout_button() 
 
     user_role = get_user_role()
+    # Move para as abas de arquivo os anos encerrados, uma vez por ano, sem bloquear a página
+    start_yearly_archiver()
 
     if user_role == 'admin':
         show_admin_homepage()
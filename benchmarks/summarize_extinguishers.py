@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from operations.dashboard_status import summarize_extinguishers, STATUS_OUT_OF_SERVICE
+
+# Mede summarize_extinguishers (operations/dashboard_status.py) em um histórico sintético de
+# NUM_IDS extintores com RECORDS_PER_ID registros cada, e confere o resultado com o laço
+# antigo da página de Situação Atual (um filtro + ordenação por equipamento). O laço antigo
+# é quadrático, então a conferência usa um histórico menor, de CHECK_IDS equipamentos.
+# Uso: python benchmarks/summarize_extinguishers.py
+
+NUM_IDS = 10_000
+RECORDS_PER_ID = 50
+CHECK_IDS = 300
+TODAY = date(2024, 12, 20)
+SEED = 42
+
+SERVICE_TYPES = ["Inspeção", "Manutenção Nível 2", "Manutenção Nível 3"]
+SERVICE_WEIGHTS = [0.85, 0.12, 0.03]
+
+
+def make_history(num_ids, records_per_id, seed=SEED):
+    """
+    Histórico sintético no formato da aba de extintores (datas como texto), com as linhas
+    embaralhadas como na planilha. Cada equipamento tem datas distintas: o laço antigo
+    ordenava sem estabilidade, então datas repetidas tornariam o resultado dele arbitrário.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.repeat([f"EXT-{i:05d}" for i in range(num_ids)], records_per_id)
+    start = np.datetime64("2019-01-01")
+    offsets = np.concatenate([
+        rng.choice(6 * 365, size=records_per_id, replace=False) for _ in range(num_ids)
+    ])
+    size = len(ids)
+    df = pd.DataFrame({
+        "numero_identificacao": ids,
+        "numero_selo_inmetro": rng.integers(10**7, 10**8, size=size).astype(str),
+        "tipo_agente": rng.choice(["ABC", "BC", "CO2", "AP"], size=size),
+        "tipo_servico": rng.choice(SERVICE_TYPES, size=size, p=SERVICE_WEIGHTS),
+        "data_servico": pd.Series(start + offsets).dt.strftime("%Y-%m-%d"),
+        "aprovado_inspecao": rng.choice(["Sim", "Não"], size=size, p=[0.9, 0.1]),
+        "plano_de_acao": rng.choice(
+            ["Manter em operação.", "FORA DE OPERAÇÃO (SUBSTITUÍDO)"], size=size, p=[0.98, 0.02]
+        ),
+    })
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def legacy_summary(df_full, today):
+    """Laço antigo de get_consolidated_status_df (pages/3_Situacao_Atual.py), com 'today' fixo."""
+    consolidated_data = []
+    df_copy = df_full.copy()
+    df_copy['data_servico'] = pd.to_datetime(df_copy['data_servico'], errors='coerce')
+    df_copy = df_copy.dropna(subset=['data_servico'])
+
+    for ext_id in df_copy['numero_identificacao'].unique():
+        ext_df = df_copy[df_copy['numero_identificacao'] == ext_id].sort_values(by='data_servico')
+        latest_record_info = ext_df.iloc[-1]
+
+        last_insp_date = ext_df['data_servico'].max()
+        last_maint2_date = ext_df[ext_df['tipo_servico'] == 'Manutenção Nível 2']['data_servico'].max()
+        last_maint3_date = ext_df[ext_df['tipo_servico'] == 'Manutenção Nível 3']['data_servico'].max()
+
+        next_insp = (last_insp_date + relativedelta(months=1)) if pd.notna(last_insp_date) else pd.NaT
+        next_maint2 = (last_maint2_date + relativedelta(months=12)) if pd.notna(last_maint2_date) else pd.NaT
+        next_maint3 = (last_maint3_date + relativedelta(years=5)) if pd.notna(last_maint3_date) else pd.NaT
+
+        vencimentos = [d for d in [next_insp, next_maint2, next_maint3] if pd.notna(d)]
+        if not vencimentos:
+            continue
+        proximo_vencimento_real = min(vencimentos)
+
+        status_atual = "OK"
+        if latest_record_info.get('plano_de_acao') == "FORA DE OPERAÇÃO (SUBSTITUÍDO)":
+            status_atual = "FORA DE OPERAÇÃO"
+        elif latest_record_info.get('aprovado_inspecao') == 'Não':
+            status_atual = "NÃO CONFORME (Aguardando Ação)"
+        elif proximo_vencimento_real < pd.Timestamp(today):
+            status_atual = "VENCIDO"
+        if status_atual == "FORA DE OPERAÇÃO":
+            continue
+
+        consolidated_data.append({
+            'numero_identificacao': ext_id,
+            'numero_selo_inmetro': latest_record_info.get('numero_selo_inmetro'),
+            'tipo_agente': latest_record_info.get('tipo_agente'),
+            'status_atual': status_atual,
+            'proximo_vencimento_geral': proximo_vencimento_real.strftime('%d/%m/%Y'),
+            'prox_venc_inspecao': next_insp.strftime('%d/%m/%Y') if pd.notna(next_insp) else "N/A",
+            'prox_venc_maint2': next_maint2.strftime('%d/%m/%Y') if pd.notna(next_maint2) else "N/A",
+            'prox_venc_maint3': next_maint3.strftime('%d/%m/%Y') if pd.notna(next_maint3) else "N/A",
+            'plano_de_acao': latest_record_info.get('plano_de_acao'),
+        })
+    return pd.DataFrame(consolidated_data)
+
+
+def as_legacy_columns(summary):
+    """Resultado de summarize_extinguishers nas colunas e formatos do laço antigo."""
+    summary = summary[summary['venc_geral'].notna() & (summary['status_atual'] != STATUS_OUT_OF_SERVICE)]
+
+    def formatted(column):
+        return summary[column].dt.strftime('%d/%m/%Y').fillna("N/A")
+
+    return pd.DataFrame({
+        'numero_identificacao': summary['numero_identificacao'],
+        'numero_selo_inmetro': summary['numero_selo_inmetro'],
+        'tipo_agente': summary['tipo_agente'],
+        'status_atual': summary['status_atual'],
+        'proximo_vencimento_geral': summary['venc_geral'].dt.strftime('%d/%m/%Y'),
+        'prox_venc_inspecao': formatted('venc_inspecao'),
+        'prox_venc_maint2': formatted('venc_manutencao_2'),
+        'prox_venc_maint3': formatted('venc_manutencao_3'),
+        'plano_de_acao': summary['plano_de_acao'],
+    }).reset_index(drop=True)
+
+
+def check_against_legacy(num_ids=CHECK_IDS, records_per_id=RECORDS_PER_ID):
+    """Confere summarize_extinguishers com o laço antigo; retorna os tempos (antigo, novo) em segundos."""
+    df = make_history(num_ids, records_per_id)
+    started = time.perf_counter()
+    expected = legacy_summary(df, TODAY)
+    legacy_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    result = as_legacy_columns(summarize_extinguishers(df, TODAY))
+    new_seconds = time.perf_counter() - started
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    return legacy_seconds, new_seconds
+
+
+def time_summary(num_ids=NUM_IDS, records_per_id=RECORDS_PER_ID, repeat=3):
+    """Melhor tempo, em segundos, de summarize_extinguishers no histórico sintético."""
+    df = make_history(num_ids, records_per_id)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        summary = summarize_extinguishers(df, TODAY)
+        timings.append(time.perf_counter() - started)
+    assert len(summary) == num_ids
+    return min(timings)
+
+
+if __name__ == "__main__":
+    legacy_seconds, new_seconds = check_against_legacy()
+    print(f"{CHECK_IDS} x {RECORDS_PER_ID}: resultado igual ao laço antigo "
+          f"(antigo {legacy_seconds:.2f} s, novo {new_seconds:.2f} s)")
+    seconds = time_summary()
+    print(f"{NUM_IDS} x {RECORDS_PER_ID} ({NUM_IDS * RECORDS_PER_ID} registros): {seconds:.2f} s")
@@ -18,6 +18,88 @@ SCBA_VISUAL_INSPECTIONS_SHEET_NAME = "inspecoes_scba"
 LOG_SCBA_SHEET_NAME = "log_scba"
 TH_SHIPMENT_LOG_SHEET_NAME = "log_remessas_th"
 EXTINGUISHER_SHIPMENT_LOG_SHEET_NAME = "log_remessas_extintores"
+# Abas de status atual: uma linha por equipamento, mantidas a cada gravação no histórico
+EXTINGUISHER_STATUS_SHEET_NAME = "status_extintores"
+HOSE_STATUS_SHEET_NAME = "status_mangueiras"
+
+# Número máximo de linhas enviadas em uma única chamada values.append
+SHEETS_APPEND_CHUNK_SIZE = 500
+
+# Diretório local para dados persistentes do app (fila de gravação, caches em disco)
+LOCAL_DATA_DIR = os.environ.get(
+    "ISF_LOCAL_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".local_data")
+)
+WRITE_QUEUE_DB_PATH = os.path.join(LOCAL_DATA_DIR, "write_queue.sqlite3")
+
+# Snapshots locais das abas, atualizados de forma incremental (apenas as linhas novas)
+SHEET_SNAPSHOT_DIR = os.path.join(LOCAL_DATA_DIR, "snapshots")
+# Intervalo máximo entre recargas completas, para capturar edições feitas no meio da aba
+SHEET_SNAPSHOT_FULL_RELOAD_SECONDS = 6 * 60 * 60
+
+# Tempo de vida dos DataFrames em memória de cada aba (load_sheet_data)
+SHEET_CACHE_TTL_SECONDS = 600
+# Atualização em segundo plano: a cada SHEET_REFRESH_INTERVAL_SECONDS, as abas em uso a menos de
+# SHEET_REFRESH_AHEAD_SECONDS de vencer são renovadas (sem download, se a planilha não mudou no Drive)
+SHEET_REFRESH_INTERVAL_SECONDS = 60
+SHEET_REFRESH_AHEAD_SECONDS = 120
+# Abas sem uso há mais tempo que isso deixam de ser atualizadas e vencem normalmente
+SHEET_REFRESH_IDLE_SECONDS = 30 * 60
+# Por quanto tempo após vencer uma aba ainda é servida do cache enquanto é atualizada
+SHEET_STALE_MAX_SECONDS = 60 * 60
+
+# Arquivamento anual: as linhas de anos encerrados saem das abas de histórico e vão para abas
+# '<aba>_arquivo_<ano>', lidas só sob demanda. Coluna de data que define o ano de cada linha.
+# Só entram abas cujas telas de situação não dependem do último registro de anos antigos
+# (extintores e mangueiras são lidos das abas de status atual); os testes e as inspeções
+# periódicas de SCBA e as inspeções de abrigos ficam inteiros na aba principal.
+ARCHIVE_DATE_COLUMNS = {
+    EXTINGUISHER_SHEET_NAME: "data_servico",
+    HOSE_SHEET_NAME: "data_inspecao",
+    LOG_ACTIONS: "data_correcao",
+    LOG_SHELTER_SHEET_NAME: "data_acao",
+    LOG_SCBA_SHEET_NAME: "data_acao",
+}
+# Anos mantidos na aba principal (o atual e os anteriores); os mais antigos são arquivados
+ARCHIVE_HOT_YEARS = 2
+# Último ano em que o arquivamento automático foi concluído
+ARCHIVE_STATE_PATH = os.path.join(LOCAL_DATA_DIR, "archive_state.json")
+
+# Réplica local (SQLite) das abas, consultada com SQL pelos relatórios
+LOCAL_REPLICA_DB_PATH = os.path.join(LOCAL_DATA_DIR, "replica.sqlite3")
+
+# Importação de PDFs em lote: extrações simultâneas na IA e uploads simultâneos no Drive
+AI_EXTRACTION_MAX_WORKERS = 3
+DRIVE_UPLOAD_MAX_WORKERS = 4
+
+# Cache em disco das extrações da IA (chave: hash do PDF + prompt + modelo)
+EXTRACTION_CACHE_DB_PATH = os.path.join(LOCAL_DATA_DIR, "extraction_cache.sqlite3")
+EXTRACTION_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Relatórios grandes são enviados à IA em partes de AI_CHUNK_PAGES páginas, processadas em paralelo
+AI_CHUNK_PAGES = 5
+AI_CHUNK_MAX_WORKERS = 4
+# Tentativas por parte antes de desistir dela
+AI_CHUNK_MAX_ATTEMPTS = 2
+
+# Fotos embutidas nos relatórios: downloads simultâneos e tempo máximo de cada um
+REPORT_IMAGE_MAX_WORKERS = 8
+REPORT_IMAGE_TIMEOUT_SECONDS = 15
+# Miniaturas JPEG das fotos, guardadas em disco por ID do arquivo no Drive
+REPORT_THUMBNAIL_CACHE_DB_PATH = os.path.join(LOCAL_DATA_DIR, "report_thumbnails.sqlite3")
+REPORT_THUMBNAIL_CACHE_MAX_BYTES = 100 * 1024 * 1024
+REPORT_THUMBNAIL_MAX_SIZE = 800
+REPORT_THUMBNAIL_JPEG_QUALITY = 70
+
+# Limites de ritmo por API: (chamadas por segundo, rajada máxima, chamadas simultâneas)
+API_RATE_LIMITS = {
+    "sheets": (1.0, 10, 4),
+    "drive": (5.0, 10, 4),
+    "gemini": (1.0, 5, 4),
+}
+# Tentativas em caso de erro de cota (429) e espera máxima entre elas
+THROTTLE_MAX_ATTEMPTS = 6
+THROTTLE_BACKOFF_MAX_SECONDS = 60
 
 def get_credentials_dict():
     """Retorna as credenciais do serviço do Google, seja do arquivo local ou do Streamlit Cloud."""
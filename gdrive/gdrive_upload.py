@@ -1,32 +1,69 @@
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import io
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 import streamlit as st
 import tempfile
-from gdrive.config import get_credentials_dict, GDRIVE_FOLDER_ID, GDRIVE_SHEETS_ID
+from gdrive.config import GDRIVE_FOLDER_ID, GDRIVE_SHEETS_ID, SHEETS_APPEND_CHUNK_SIZE
+from gdrive.google_clients import SCOPES, get_credentials, get_drive_service, get_sheets_service
+
+def append_values(sheets_service, sheet_name, rows):
+    """
+    Envia linhas para o fim da aba com values.append, em blocos de até SHEETS_APPEND_CHUNK_SIZE.
+    Não exibe mensagens na interface; pode ser usada fora de uma sessão do Streamlit.
+    """
+    range_name = f"{sheet_name}!A:Z"
+    results = []
+    for start in range(0, len(rows), SHEETS_APPEND_CHUNK_SIZE):
+        body = {
+            'values': rows[start:start + SHEETS_APPEND_CHUNK_SIZE]
+        }
+        result = sheets_service.spreadsheets().values().append(
+            spreadsheetId=GDRIVE_SHEETS_ID,
+            range=range_name,
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body=body
+        ).execute()
+        results.append(result)
+    return results
+
+
+def upload_bytes(drive_service, data, file_name, mime_type='application/pdf'):
+    """
+    Envia um arquivo em memória para a pasta do app no Drive e retorna o link de visualização.
+    Não exibe mensagens na interface; pode ser usada fora de uma sessão do Streamlit.
+    """
+    file_metadata = {
+        'name': file_name,
+        'parents': [GDRIVE_FOLDER_ID]
+    }
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime_type, resumable=True)
+    file = drive_service.files().create(
+        body=file_metadata,
+        media_body=media,
+        fields='id,webViewLink'
+    ).execute()
+    return file.get('webViewLink')
+
 
 class GoogleDriveUploader:
     def __init__(self):
-        self.SCOPES = [
-            'https://www.googleapis.com/auth/drive.file',
-            'https://www.googleapis.com/auth/spreadsheets'
-        ]
+        self.SCOPES = SCOPES
         self.credentials = None
         self.drive_service = None
         self.sheets_service = None
         self.initialize_services()
 
     def initialize_services(self):
-        """Inicializa os serviços do Google Drive e Google Sheets"""
+        """
+        Obtém os serviços do Google Drive e Google Sheets do registro compartilhado.
+        Credenciais, documentos de descoberta e conexões são reaproveitados entre instâncias,
+        então criar um GoogleDriveUploader por chamada não tem custo de inicialização.
+        """
         try:
-            credentials_dict = get_credentials_dict()
-            self.credentials = service_account.Credentials.from_service_account_info(
-                credentials_dict,
-                scopes=self.SCOPES
-            )
-            self.drive_service = build('drive', 'v3', credentials=self.credentials)
-            self.sheets_service = build('sheets', 'v4', credentials=self.credentials)
+            self.credentials = get_credentials()
+            self.drive_service = get_drive_service()
+            self.sheets_service = get_sheets_service()
         except Exception as e:
             st.error(f"Erro ao inicializar serviços do Google: {str(e)}")
             raise
@@ -125,19 +162,18 @@ class GoogleDriveUploader:
         """
         Adiciona uma nova linha de dados à planilha do Google Sheets.
         """
+        return self.append_rows(sheet_name, [data_row])[0]
+
+    def append_rows(self, sheet_name, rows):
+        """
+        Adiciona várias linhas à planilha com uma única chamada values.append.
+        Lotes maiores que SHEETS_APPEND_CHUNK_SIZE são divididos em poucas chamadas sequenciais.
+        Retorna a lista de respostas da API (uma por bloco enviado).
+        """
+        if not rows:
+            return []
         try:
-            range_name = f"{sheet_name}!A:Z"
-            body = {
-                'values': [data_row]
-            }
-            result = self.sheets_service.spreadsheets().values().append(
-                spreadsheetId=GDRIVE_SHEETS_ID,
-                range=range_name,
-                valueInputOption='RAW',
-                insertDataOption='INSERT_ROWS',
-                body=body
-            ).execute()
-            return result
+            return append_values(self.sheets_service, sheet_name, rows)
         except Exception as e:
             st.error(f"Erro ao adicionar dados à planilha '{sheet_name}': {str(e)}")
             raise
@@ -0,0 +1,129 @@
+import threading
+import httplib2
+import google_auth_httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+from googleapiclient.errors import HttpError
+from gdrive.config import get_credentials_dict
+from utils.rate_limiter import get_rate_limiter
+
+SCOPES = [
+    'https://www.googleapis.com/auth/drive.file',
+    'https://www.googleapis.com/auth/spreadsheets'
+]
+HTTP_TIMEOUT_SECONDS = 60
+QUOTA_ERROR_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "RATE_LIMIT_EXCEEDED")
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+_services = {}
+_services_lock = threading.Lock()
+
+_idle_connections = []
+_pool_lock = threading.Lock()
+
+
+def get_credentials():
+    """
+    Retorna as credenciais da conta de serviço, carregadas uma única vez por processo.
+    O mesmo objeto é compartilhado por todas as conexões, reaproveitando o token de acesso.
+    """
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_info(
+                get_credentials_dict(),
+                scopes=SCOPES
+            )
+        return _credentials
+
+
+def _new_connection():
+    """Cria um transporte HTTP autenticado (keep-alive) sobre as credenciais compartilhadas."""
+    return google_auth_httplib2.AuthorizedHttp(
+        get_credentials(),
+        http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+    )
+
+
+def _acquire_connection():
+    with _pool_lock:
+        if _idle_connections:
+            return _idle_connections.pop()
+    return _new_connection()
+
+
+def _release_connection(connection):
+    with _pool_lock:
+        _idle_connections.append(connection)
+
+
+def _quota_retry_delay(error):
+    """Segundos de espera para um erro de cota do Google (0 se não indicados); None se não for de cota."""
+    if not isinstance(error, HttpError):
+        return None
+    status = error.resp.status
+    content = error.content.decode('utf-8', 'ignore') if isinstance(error.content, bytes) else str(error.content)
+    if status != 429 and not (status == 403 and any(reason in content for reason in QUOTA_ERROR_REASONS)):
+        return None
+    try:
+        return float(error.resp.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _api_name(uri):
+    return "sheets" if "sheets.googleapis.com" in uri else "drive"
+
+
+class PooledHttpRequest(HttpRequest):
+    """
+    HttpRequest que executa cada chamada em uma conexão emprestada do pool.
+    O httplib2.Http não é thread-safe, então cada execução usa uma conexão exclusiva,
+    que volta ao pool ao final e mantém o socket aberto para a próxima chamada.
+    Todas as chamadas passam pelo limitador de ritmo da API (utils/rate_limiter.py).
+    """
+    def execute(self, http=None, num_retries=0):
+        return get_rate_limiter(_api_name(self.uri)).call(
+            lambda: self._execute_pooled(http, num_retries),
+            _quota_retry_delay
+        )
+
+    def _execute_pooled(self, http, num_retries):
+        if http is not None:
+            return super().execute(http=http, num_retries=num_retries)
+        connection = _acquire_connection()
+        try:
+            return super().execute(http=connection, num_retries=num_retries)
+        finally:
+            _release_connection(connection)
+
+
+def get_service(api_name, api_version):
+    """
+    Retorna o cliente compartilhado de uma API do Google (ex.: 'drive', 'v3').
+    O documento de descoberta é lido e interpretado apenas na primeira chamada do processo.
+    """
+    key = (api_name, api_version)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = build(
+                api_name,
+                api_version,
+                http=_new_connection(),
+                requestBuilder=PooledHttpRequest,
+                cache_discovery=False
+            )
+            _services[key] = service
+        return service
+
+
+def get_drive_service():
+    return get_service('drive', 'v3')
+
+
+def get_sheets_service():
+    return get_service('sheets', 'v4')
@@ -0,0 +1,118 @@
+import time
+import threading
+import pandas as pd
+from gdrive.config import GDRIVE_SHEETS_ID, SHEET_CACHE_TTL_SECONDS
+from gdrive.google_clients import get_sheets_service
+from gdrive.sheet_schemas import DATE_PREFIX
+
+# Leitura de apenas algumas colunas de uma aba, em vez do intervalo A:Z inteiro.
+# Os nomes das colunas são traduzidos para letras por um mapa do cabeçalho guardado em memória,
+# e os valores vêm sem formatação (UNFORMATTED_VALUE): números como números e datas digitadas
+# na planilha como número serial, sem o texto formatado de cada célula.
+
+# Dia zero das datas seriais do Google Sheets
+SHEETS_SERIAL_EPOCH = '1899-12-30'
+
+_header_maps = {}
+_header_maps_lock = threading.Lock()
+
+
+def column_letter(index):
+    """Letra da coluna para um índice a partir de 0 (0 -> 'A', 25 -> 'Z', 26 -> 'AA')."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def get_header_map(sheet_name):
+    """
+    Retorna {nome da coluna: posição a partir de 0} da aba, lido da primeira linha e guardado
+    por SHEET_CACHE_TTL_SECONDS. Em cabeçalhos repetidos, vale a primeira ocorrência.
+    """
+    with _header_maps_lock:
+        cached = _header_maps.get(sheet_name)
+        if cached and time.time() - cached["loaded_at"] < SHEET_CACHE_TTL_SECONDS:
+            return cached["columns"]
+
+    result = get_sheets_service().spreadsheets().values().get(
+        spreadsheetId=GDRIVE_SHEETS_ID,
+        range=f"{sheet_name}!A1:Z1"
+    ).execute()
+    headers = result.get('values', [[]])[0] if result.get('values') else []
+    columns = {}
+    for index, name in enumerate(headers):
+        if name and name not in columns:
+            columns[name] = index
+
+    with _header_maps_lock:
+        _header_maps[sheet_name] = {"columns": columns, "loaded_at": time.time()}
+    return columns
+
+
+def invalidate_header_map(sheet_name=None):
+    """Descarta o mapa de cabeçalho de uma aba (ou de todas)."""
+    with _header_maps_lock:
+        if sheet_name is None:
+            _header_maps.clear()
+        else:
+            _header_maps.pop(sheet_name, None)
+
+
+def _normalize_value(column, value):
+    """
+    Converte um valor sem formatação para o tipo usado nos DataFrames:
+    células vazias viram None; datas seriais viram Timestamp; demais números viram texto,
+    como na leitura formatada (IDs numéricos continuam comparáveis com os salvos pelo app).
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        if column.startswith(DATE_PREFIX):
+            return pd.Timestamp(SHEETS_SERIAL_EPOCH) + pd.to_timedelta(value, unit='D')
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    return value
+
+
+def read_columns(sheet_name, columns, extra_rows=()):
+    """
+    Lê apenas as colunas informadas da aba (sem o cabeçalho), em uma única chamada batchGet.
+    'extra_rows' são linhas completas (como em values().get) acrescentadas ao final, já
+    projetadas nas mesmas colunas (ex.: linhas ainda na fila de gravação).
+    Retorna um DataFrame com as colunas que existem na aba, na ordem pedida;
+    colunas ausentes no cabeçalho são ignoradas.
+    """
+    header_map = get_header_map(sheet_name)
+    present = [column for column in columns if column in header_map]
+    if not present:
+        return pd.DataFrame()
+
+    result = get_sheets_service().spreadsheets().values().batchGet(
+        spreadsheetId=GDRIVE_SHEETS_ID,
+        ranges=[f"{sheet_name}!{column_letter(header_map[c])}2:{column_letter(header_map[c])}" for c in present],
+        majorDimension='COLUMNS',
+        valueRenderOption='UNFORMATTED_VALUE',
+        dateTimeRenderOption='SERIAL_NUMBER'
+    ).execute()
+
+    data = {}
+    for column, value_range in zip(present, result.get('valueRanges', [])):
+        values = value_range.get('values', [[]])
+        data[column] = [_normalize_value(column, value) for value in (values[0] if values else [])]
+
+    # A API omite as células vazias no fim de cada coluna: completa até a coluna mais longa
+    num_rows = max(len(values) for values in data.values())
+    for column, values in data.items():
+        values.extend([None] * (num_rows - len(values)))
+        position = header_map[column]
+        values.extend(
+            _normalize_value(column, row[position]) if position < len(row) else None
+            for row in extra_rows
+        )
+    return pd.DataFrame(data, columns=present)
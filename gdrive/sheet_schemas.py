@@ -0,0 +1,64 @@
+import pandas as pd
+from gdrive.config import (
+    EXTINGUISHER_SHEET_NAME, HOSE_SHEET_NAME, INSPECTIONS_SHELTER_SHEET_NAME,
+    SCBA_SHEET_NAME, SCBA_VISUAL_INSPECTIONS_SHEET_NAME
+)
+
+# Tipos das colunas das abas, aplicados uma única vez quando a aba é carregada
+# (ver load_typed_sheet_data em operations/history.py):
+# - colunas 'data_*' viram datetime (NaT quando vazias ou inválidas);
+# - latitude/longitude viram float, aceitando vírgula como separador decimal;
+# - colunas 'ano_*' viram inteiros (Int64, com <NA> quando vazias);
+# - colunas de status/classificação com poucos valores distintos viram 'category'.
+
+DATE_PREFIX = 'data_'
+YEAR_PREFIX = 'ano_'
+COORDINATE_COLUMNS = ('latitude', 'longitude')
+
+CATEGORY_COLUMNS = {
+    EXTINGUISHER_SHEET_NAME: ['tipo_servico', 'tipo_agente', 'capacidade', 'aprovado_inspecao', 'plano_de_acao'],
+    HOSE_SHEET_NAME: ['marca', 'diametro', 'tipo', 'comprimento', 'resultado'],
+    INSPECTIONS_SHELTER_SHEET_NAME: ['status_geral'],
+    SCBA_SHEET_NAME: ['marca', 'modelo', 'resultado_final'],
+    SCBA_VISUAL_INSPECTIONS_SHEET_NAME: ['status_geral'],
+}
+
+
+def parse_dates(series):
+    """
+    Converte uma coluna de datas em texto para datetime.
+    O formato ISO gravado pelo app é lido de uma vez; valores em outros formatos
+    (ex.: digitados na planilha como DD/MM/AAAA) são lidos um a um em seguida.
+    """
+    parsed = pd.to_datetime(series, errors='coerce', format='ISO8601')
+    text = series.astype('string').str.strip()
+    retry = parsed.isna() & text.notna() & (text != '')
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], errors='coerce', format='mixed', dayfirst=True)
+    return parsed
+
+
+def parse_numbers(series):
+    """Converte texto em float, aceitando vírgula decimal (ex.: coordenadas '-23,5')."""
+    text = series.astype('string').str.replace(',', '.', regex=False)
+    return pd.to_numeric(text, errors='coerce').astype('float64')
+
+
+def apply_sheet_schema(sheet_name, df):
+    """Retorna uma cópia do DataFrame da aba com as colunas convertidas para os tipos acima."""
+    typed = df.copy()
+    categories = set(CATEGORY_COLUMNS.get(sheet_name, []))
+    # Acesso por posição: cabeçalhos repetidos na planilha não quebram a conversão
+    for position, column in enumerate(typed.columns):
+        if not isinstance(column, str):
+            continue
+        values = typed.iloc[:, position]
+        if column.startswith(DATE_PREFIX):
+            typed.isetitem(position, parse_dates(values))
+        elif column.startswith(YEAR_PREFIX):
+            typed.isetitem(position, parse_numbers(values).round().astype('Int64'))
+        elif column in COORDINATE_COLUMNS:
+            typed.isetitem(position, parse_numbers(values))
+        elif column in categories:
+            typed.isetitem(position, values.astype('category'))
+    return typed
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import logging
+import threading
+from gdrive.config import GDRIVE_SHEETS_ID, SHEET_SNAPSHOT_DIR, SHEET_SNAPSHOT_FULL_RELOAD_SECONDS
+from gdrive.google_clients import get_sheets_service
+
+# Carregamento incremental das abas: o histórico é só de inclusão, então guardamos em disco
+# as linhas já lidas e, a cada atualização, buscamos apenas o intervalo de linhas novas.
+# Se o cabeçalho ou a última linha conhecida mudarem, a aba foi editada e recarregamos tudo.
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _sheet_lock(sheet_name):
+    with _locks_guard:
+        return _locks.setdefault(sheet_name, threading.Lock())
+
+
+def _snapshot_path(sheet_name):
+    return os.path.join(SHEET_SNAPSHOT_DIR, f"{sheet_name}.json")
+
+
+def _read_snapshot(sheet_name):
+    try:
+        with open(_snapshot_path(sheet_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(sheet_name, values, full_loaded_at):
+    """Grava o snapshot de forma atômica (arquivo temporário + os.replace)."""
+    os.makedirs(SHEET_SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(sheet_name)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"values": values, "full_loaded_at": full_loaded_at}, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _needs_full_load(snapshot):
+    return (
+        not snapshot
+        or not snapshot.get("values")
+        or time.time() - snapshot.get("full_loaded_at", 0) > SHEET_SNAPSHOT_FULL_RELOAD_SECONDS
+    )
+
+
+def _incremental_ranges(sheet_name, snapshot):
+    """
+    Intervalos da leitura incremental: o cabeçalho e, a partir da última linha conhecida, as
+    linhas novas. O segundo intervalo começa em uma linha que já existe: começando logo abaixo
+    dela, passaria do limite da grade quando a aba não tem linhas sobrando (como depois de um
+    values.append com INSERT_ROWS).
+    """
+    last_row = len(snapshot["values"])
+    return [
+        f"{sheet_name}!A1:Z1",
+        f"{sheet_name}!A{last_row}:Z",
+    ]
+
+
+def _apply_incremental(sheet_name, snapshot, header_range, tail_range):
+    """
+    Acrescenta ao snapshot as linhas novas da leitura incremental ('tail_range': a última linha
+    conhecida seguida das novas). Retorna None quando o snapshot não confere mais com a planilha.
+    """
+    values = snapshot["values"]
+    header = header_range[0] if header_range else []
+    anchor = tail_range[0] if tail_range else []
+    if header != values[0] or anchor != values[-1]:
+        return None
+
+    new_range = tail_range[1:]
+    if new_range:
+        values = values + new_range
+        _write_snapshot(sheet_name, values, snapshot["full_loaded_at"])
+    return values
+
+
+def _batch_get(ranges):
+    """Lê vários intervalos (de uma ou mais abas) em uma única chamada batchGet."""
+    result = get_sheets_service().spreadsheets().values().batchGet(
+        spreadsheetId=GDRIVE_SHEETS_ID,
+        ranges=ranges
+    ).execute()
+    return [r.get('values', []) for r in result.get('valueRanges', [])]
+
+
+def _full_load_batch(sheet_names):
+    loaded_at = time.time()
+    results = dict(zip(sheet_names, _batch_get([f"{name}!A:Z" for name in sheet_names])))
+    for name, values in results.items():
+        _write_snapshot(name, values, loaded_at)
+    return results
+
+
+def _full_load_all(sheet_names):
+    """
+    Lê as abas por completo em uma única chamada. Se ela falhar, tenta cada aba separadamente,
+    para que uma aba com problema não impeça as demais de carregar; as que falharem de novo
+    ficam de fora do resultado (se todas falharem, o erro é repassado).
+    """
+    if not sheet_names:
+        return {}
+    try:
+        return _full_load_batch(sheet_names)
+    except Exception:
+        if len(sheet_names) == 1:
+            raise
+        logging.warning(f"Falha ao ler {sheet_names} em conjunto; tentando aba por aba.", exc_info=True)
+    return _full_load_each(sheet_names)
+
+
+def _full_load_each(sheet_names):
+    """Lê cada aba por completo em uma chamada própria; as que falharem ficam de fora do resultado."""
+    results = {}
+    last_error = None
+    for name in sheet_names:
+        try:
+            results.update(_full_load_batch([name]))
+        except Exception as e:
+            logging.warning(f"Falha ao ler a aba '{name}'.", exc_info=True)
+            last_error = e
+    if not results:
+        raise last_error
+    return results
+
+
+def load_sheets_values(sheet_names):
+    """
+    Retorna {aba: linhas} para várias abas, lidas juntas em uma única chamada batchGet
+    (mais uma, só para as abas editadas desde a última leitura, que precisam ser relidas inteiras).
+    Cada aba segue as mesmas regras de load_sheet_values: leitura incremental a partir do snapshot
+    local, ou completa quando não há snapshot ou ele está vencido.
+    Se a chamada conjunta falhar, as abas são relidas uma a uma; as que não puderem ser lidas
+    ficam de fora do resultado, em vez de derrubar as demais.
+    """
+    names = sorted(set(sheet_names))
+    if not names:
+        return {}
+    # Travas sempre na mesma ordem, para que leituras simultâneas de conjuntos de abas não se bloqueiem
+    locks = [_sheet_lock(name) for name in names]
+    for lock in locks:
+        lock.acquire()
+    try:
+        snapshots = {name: _read_snapshot(name) for name in names}
+        full_names = [name for name in names if _needs_full_load(snapshots[name])]
+        incremental_names = [name for name in names if name not in full_names]
+
+        ranges = [f"{name}!A:Z" for name in full_names]
+        for name in incremental_names:
+            ranges.extend(_incremental_ranges(name, snapshots[name]))
+        try:
+            value_ranges = iter(_batch_get(ranges))
+        except Exception:
+            if not incremental_names:
+                if len(names) == 1:
+                    raise
+                logging.warning(f"Falha ao ler {names} em conjunto; tentando aba por aba.", exc_info=True)
+                return _full_load_each(names)
+            # Um intervalo incremental inválido (ex.: linhas apagadas da aba) derruba a chamada inteira:
+            # relê todas as abas por completo, o que não depende do snapshot
+            logging.warning(f"Falha na leitura incremental de {incremental_names}; recarregando por completo.", exc_info=True)
+            return _full_load_all(names)
+
+        loaded_at = time.time()
+        results = {}
+        for name in full_names:
+            results[name] = next(value_ranges)
+            _write_snapshot(name, results[name], loaded_at)
+
+        edited_names = []
+        for name in incremental_names:
+            header_range, tail_range = next(value_ranges), next(value_ranges)
+            values = _apply_incremental(name, snapshots[name], header_range, tail_range)
+            if values is None:
+                edited_names.append(name)
+            else:
+                results[name] = values
+
+        results.update(_full_load_all(edited_names))
+        return results
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def load_sheet_values(sheet_name):
+    """
+    Retorna todas as linhas da aba (cabeçalho incluso), no mesmo formato de values().get.
+    Usa o snapshot local e baixa apenas as linhas adicionadas desde a última leitura;
+    faz a recarga completa quando não há snapshot, quando a aba foi editada ou
+    quando a última recarga completa tem mais de SHEET_SNAPSHOT_FULL_RELOAD_SECONDS.
+    """
+    return load_sheets_values([sheet_name])[sheet_name]
+
+
+def reset_sheet_snapshot(sheet_name=None):
+    """Apaga o snapshot de uma aba (ou de todas), forçando a próxima leitura a ser completa."""
+    if sheet_name is None:
+        if not os.path.isdir(SHEET_SNAPSHOT_DIR):
+            return
+        names = [f[:-len(".json")] for f in os.listdir(SHEET_SNAPSHOT_DIR) if f.endswith(".json")]
+    else:
+        names = [sheet_name]
+
+    for name in names:
+        with _sheet_lock(name):
+            try:
+                os.remove(_snapshot_path(name))
+            except FileNotFoundError:
+                pass
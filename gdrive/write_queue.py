@@ -0,0 +1,424 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+import httplib2
+from googleapiclient.errors import HttpError
+from gdrive.config import WRITE_QUEUE_DB_PATH, SHEETS_APPEND_CHUNK_SIZE, GDRIVE_SHEETS_ID
+from gdrive.google_clients import get_sheets_service
+from gdrive.gdrive_upload import append_values
+
+# Fila de gravação "write-behind": os save_* gravam as linhas em um diário local (SQLite)
+# e retornam na hora; uma thread em segundo plano envia o diário para o Google Sheets em lotes.
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_FLUSHED = "flushed"
+STATUS_FAILED = "failed"
+
+RETRYABLE_HTTP_STATUS = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+IDLE_POLL_SECONDS = 5
+FLUSHED_RETENTION_DAYS = 30
+RECONCILE_TAIL_ROWS = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    sheet_name TEXT NOT NULL,
+    row_json TEXT NOT NULL,
+    status TEXT NOT NULL,
+    batch_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_journal_sheet ON journal (sheet_name, status);
+"""
+
+_init_lock = threading.Lock()
+_initialized = False
+_worker = None
+_worker_lock = threading.Lock()
+_enqueue_listeners = []
+_flush_listeners = []
+_save_action = threading.local()
+
+
+@contextmanager
+def _connect():
+    """Abre uma conexão com o diário; cada operação usa a sua, o que mantém o acesso thread-safe."""
+    global _initialized
+    with _init_lock:
+        if not _initialized:
+            os.makedirs(os.path.dirname(WRITE_QUEUE_DB_PATH), exist_ok=True)
+            conn = sqlite3.connect(WRITE_QUEUE_DB_PATH, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+            finally:
+                conn.close()
+            _initialized = True
+
+    conn = sqlite3.connect(WRITE_QUEUE_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def save_action_scope(scope):
+    """
+    Agrupa as chamadas a enqueue_rows feitas dentro do bloco em uma única ação de gravação 'scope'.
+    Reexecutar o bloco com o mesmo 'scope' (rerun, clique duplo) gera as mesmas chaves e não duplica
+    linhas; cada aba numera as suas linhas na ordem em que foram enfileiradas dentro da ação.
+    """
+    previous = getattr(_save_action, "current", None)
+    _save_action.current = {"scope": scope, "offsets": {}}
+    try:
+        yield
+    finally:
+        _save_action.current = previous
+
+
+def make_idempotency_key(sheet_name, scope, index):
+    """
+    Chave de uma linha: mesma aba, mesma ação de gravação e mesma posição geram a mesma chave.
+    Não depende do conteúdo, então linhas idênticas de uma mesma ação são todas gravadas.
+    """
+    payload = json.dumps([sheet_name, scope, index], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def enqueue_rows(sheet_name, rows, scope=None):
+    """
+    Grava as linhas no diário local e retorna imediatamente.
+    'scope' identifica a ação de gravação (ex.: o envio de um formulário): reenviar as linhas com o
+    mesmo 'scope' não as duplica. Sem 'scope', vale o de save_action_scope; fora dele, cada chamada
+    é uma ação nova. Retorna o número de linhas novas (linhas já presentes no diário são ignoradas).
+    """
+    if not rows:
+        return 0
+    first_index = 0
+    action = getattr(_save_action, "current", None)
+    if scope is None and action is not None:
+        scope = action["scope"]
+        first_index = action["offsets"].get(sheet_name, 0)
+        action["offsets"][sheet_name] = first_index + len(rows)
+    if scope is None:
+        scope = uuid.uuid4().hex
+    now = time.time()
+    # Normaliza os valores como o Sheets os receberia (datas e números viram texto/JSON simples)
+    rows = json.loads(json.dumps(rows, ensure_ascii=False, default=str))
+    inserted_rows = []
+    with _connect() as conn:
+        for index, row in enumerate(rows):
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO journal "
+                "(idempotency_key, sheet_name, row_json, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    make_idempotency_key(sheet_name, scope, first_index + index),
+                    sheet_name,
+                    json.dumps(row, ensure_ascii=False),
+                    STATUS_PENDING,
+                    now,
+                    now,
+                )
+            )
+            if cursor.rowcount:
+                inserted_rows.append(_normalize_row(row))
+    ensure_worker_started()
+    _worker.wake()
+    _notify_enqueue_listeners(sheet_name, inserted_rows)
+    return len(inserted_rows)
+
+
+def add_enqueue_listener(callback):
+    """
+    Registra uma função chamada como callback(sheet_name, rows) após cada enfileiramento,
+    com as linhas novas já no formato em que a planilha as devolve. Usado para atualizar caches.
+    """
+    if callback not in _enqueue_listeners:
+        _enqueue_listeners.append(callback)
+
+
+def _notify_enqueue_listeners(sheet_name, rows):
+    if not rows:
+        return
+    for callback in list(_enqueue_listeners):
+        try:
+            callback(sheet_name, rows)
+        except Exception:
+            # Um cache desatualizado não pode impedir a gravação, que já está no diário
+            logging.exception(f"Falha ao notificar gravação na aba '{sheet_name}'.")
+
+
+def add_flush_listener(callback):
+    """
+    Registra uma função chamada como callback(sheet_name, rows) na thread da fila, depois que
+    um lote foi confirmado pela planilha, com as linhas no formato em que a planilha as devolve.
+    Usado para manter as abas derivadas do histórico (ex.: status atual dos equipamentos).
+    """
+    if callback not in _flush_listeners:
+        _flush_listeners.append(callback)
+
+
+def _notify_flush_listeners(sheet_name, rows):
+    for callback in list(_flush_listeners):
+        try:
+            callback(sheet_name, rows)
+        except Exception:
+            # As linhas já estão na planilha; a aba derivada pode ser reconstruída depois
+            logging.exception(f"Falha ao processar o lote gravado na aba '{sheet_name}'.")
+
+
+def get_pending_rows(sheet_name):
+    """
+    Linhas ainda não confirmadas pela planilha, na ordem em que foram salvas,
+    no mesmo formato em que a planilha as devolve.
+    """
+    ensure_worker_started()
+    with _connect() as conn:
+        cursor = conn.execute(
+            "SELECT row_json FROM journal WHERE sheet_name = ? AND status IN (?, ?) ORDER BY id",
+            (sheet_name, STATUS_PENDING, STATUS_SENDING)
+        )
+        return [_normalize_row(json.loads(r["row_json"])) for r in cursor.fetchall()]
+
+
+def get_queue_status():
+    """Contagem de entradas do diário por status (pending, sending, flushed, failed)."""
+    ensure_worker_started()
+    counts = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_FLUSHED: 0, STATUS_FAILED: 0}
+    with _connect() as conn:
+        for r in conn.execute("SELECT status, COUNT(*) AS total FROM journal GROUP BY status"):
+            counts[r["status"]] = r["total"]
+    return counts
+
+
+def list_entries(statuses=None, limit=200):
+    """Lista as entradas mais recentes do diário, opcionalmente filtradas por status."""
+    query = ("SELECT id, sheet_name, row_json, status, attempts, next_attempt_at, last_error, "
+             "created_at, updated_at FROM journal")
+    params = []
+    if statuses:
+        query += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+        params.extend(statuses)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    with _connect() as conn:
+        return [dict(r) for r in conn.execute(query, params).fetchall()]
+
+
+def retry_failed():
+    """Devolve as entradas com falha para a fila. Retorna quantas foram reenfileiradas."""
+    with _connect() as conn:
+        cursor = conn.execute(
+            "UPDATE journal SET status = ?, attempts = 0, next_attempt_at = 0, updated_at = ? WHERE status = ?",
+            (STATUS_PENDING, time.time(), STATUS_FAILED)
+        )
+        count = cursor.rowcount
+    ensure_worker_started()
+    _worker.wake()
+    return count
+
+
+def flush_now():
+    """Pede ao worker que tente enviar imediatamente, ignorando a espera de backoff."""
+    with _connect() as conn:
+        conn.execute("UPDATE journal SET next_attempt_at = 0 WHERE status = ?", (STATUS_PENDING,))
+    ensure_worker_started()
+    _worker.wake()
+
+
+def _normalize_row(row):
+    """Converte uma linha para a forma como a API de leitura a devolve (texto, sem vazios no fim)."""
+    cells = ["" if cell is None else str(cell) for cell in row]
+    while cells and cells[-1] == "":
+        cells.pop()
+    return cells
+
+
+def _is_retryable(error):
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_HTTP_STATUS
+    return isinstance(error, (socket.timeout, ConnectionError, TimeoutError, httplib2.HttpLib2Error))
+
+
+def _backoff_delay(attempts):
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    return delay + random.uniform(0, delay / 2)
+
+
+class _WriteBehindWorker(threading.Thread):
+    """Thread que envia o diário para o Google Sheets em lotes, com retentativas e backoff exponencial."""
+
+    def __init__(self):
+        super().__init__(name="isf-write-behind", daemon=True)
+        self._wake_event = threading.Event()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def run(self):
+        try:
+            self._reconcile_inflight()
+        except Exception:
+            logging.exception("Falha ao reconciliar lotes interrompidos da fila de gravação.")
+        while True:
+            try:
+                sent = self._flush_next_batch()
+                if not sent:
+                    self._prune_flushed()
+            except Exception:
+                logging.exception("Erro inesperado no worker da fila de gravação.")
+                sent = False
+            if not sent:
+                self._wake_event.wait(IDLE_POLL_SECONDS)
+                self._wake_event.clear()
+
+    def _claim_batch(self):
+        """Seleciona e marca como 'sending' o próximo lote de uma mesma aba."""
+        now = time.time()
+        with _connect() as conn:
+            first = conn.execute(
+                "SELECT sheet_name FROM journal WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                (STATUS_PENDING, now)
+            ).fetchone()
+            if first is None:
+                return None, None, []
+            sheet_name = first["sheet_name"]
+            entries = conn.execute(
+                "SELECT id, row_json, attempts FROM journal "
+                "WHERE status = ? AND sheet_name = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (STATUS_PENDING, sheet_name, now, SHEETS_APPEND_CHUNK_SIZE)
+            ).fetchall()
+            batch_id = uuid.uuid4().hex
+            conn.executemany(
+                "UPDATE journal SET status = ?, batch_id = ?, updated_at = ? WHERE id = ?",
+                [(STATUS_SENDING, batch_id, now, e["id"]) for e in entries]
+            )
+        return sheet_name, batch_id, entries
+
+    def _flush_next_batch(self):
+        sheet_name, batch_id, entries = self._claim_batch()
+        if not entries:
+            return False
+
+        rows = [json.loads(e["row_json"]) for e in entries]
+        try:
+            append_values(get_sheets_service(), sheet_name, rows)
+        except Exception as e:
+            self._record_failure(entries, e)
+            # Lotes de outras abas podem seguir; as entradas com falha aguardam o backoff
+            return True
+
+        with _connect() as conn:
+            conn.execute(
+                "UPDATE journal SET status = ?, last_error = NULL, updated_at = ? WHERE batch_id = ?",
+                (STATUS_FLUSHED, time.time(), batch_id)
+            )
+        _notify_flush_listeners(sheet_name, [_normalize_row(row) for row in rows])
+        return True
+
+    def _record_failure(self, entries, error):
+        now = time.time()
+        retryable = _is_retryable(error)
+        updates = []
+        for e in entries:
+            attempts = e["attempts"] + 1
+            if retryable and attempts < MAX_ATTEMPTS:
+                updates.append((STATUS_PENDING, attempts, now + _backoff_delay(attempts), str(error), now, e["id"]))
+            else:
+                updates.append((STATUS_FAILED, attempts, 0, str(error), now, e["id"]))
+        with _connect() as conn:
+            conn.executemany(
+                "UPDATE journal SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                "batch_id = NULL, updated_at = ? WHERE id = ?",
+                updates
+            )
+        logging.warning(f"Falha ao enviar lote de {len(entries)} linha(s) para o Sheets: {error}")
+
+    def _reconcile_inflight(self):
+        """
+        Trata lotes que estavam sendo enviados quando o processo parou.
+        Se o lote completo já aparece em sequência no fim da aba, ele é marcado como enviado;
+        caso contrário volta para a fila. Isso evita linhas duplicadas em um reenvio.
+        """
+        with _connect() as conn:
+            entries = conn.execute(
+                "SELECT id, sheet_name, batch_id, row_json FROM journal WHERE status = ? ORDER BY id",
+                (STATUS_SENDING,)
+            ).fetchall()
+        if not entries:
+            return
+
+        batches = {}
+        for e in entries:
+            batches.setdefault((e["sheet_name"], e["batch_id"]), []).append(e)
+
+        sheet_tails = {}
+        for (sheet_name, batch_id), batch_entries in batches.items():
+            if sheet_name not in sheet_tails:
+                result = get_sheets_service().spreadsheets().values().get(
+                    spreadsheetId=GDRIVE_SHEETS_ID,
+                    range=f"{sheet_name}!A:Z"
+                ).execute()
+                values = result.get("values", [])[-RECONCILE_TAIL_ROWS:]
+                sheet_tails[sheet_name] = [_normalize_row(r) for r in values]
+
+            tail = sheet_tails[sheet_name]
+            expected = [_normalize_row(json.loads(e["row_json"])) for e in batch_entries]
+            already_written = any(
+                tail[i:i + len(expected)] == expected
+                for i in range(len(tail) - len(expected) + 1)
+            )
+            new_status = STATUS_FLUSHED if already_written else STATUS_PENDING
+            with _connect() as conn:
+                conn.executemany(
+                    "UPDATE journal SET status = ?, batch_id = NULL, updated_at = ? WHERE id = ?",
+                    [(new_status, time.time(), e["id"]) for e in batch_entries]
+                )
+            if already_written:
+                _notify_flush_listeners(sheet_name, expected)
+
+    def _prune_flushed(self):
+        cutoff = time.time() - FLUSHED_RETENTION_DAYS * 86400
+        with _connect() as conn:
+            conn.execute("DELETE FROM journal WHERE status = ? AND updated_at < ?", (STATUS_FLUSHED, cutoff))
+
+
+def ensure_worker_started():
+    """
+    Inicia (uma única vez por processo) a thread que esvazia a fila.
+    Antes, importa as abas derivadas do histórico, que se registram como listeners de
+    gravação: lotes pendentes de uma execução anterior só são enviados com elas já registradas.
+    """
+    global _worker
+    import operations.current_status  # noqa: F401
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = _WriteBehindWorker()
+            _worker.start()
+    return _worker
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import date
+import pandas as pd
+import streamlit as st
+from gdrive.config import (
+    GDRIVE_SHEETS_ID, SHEET_CACHE_TTL_SECONDS, ARCHIVE_DATE_COLUMNS, ARCHIVE_HOT_YEARS, ARCHIVE_STATE_PATH
+)
+from gdrive.google_clients import get_sheets_service
+from gdrive.sheet_snapshot import reset_sheet_snapshot
+from gdrive.sheet_schemas import apply_sheet_schema, parse_dates
+from operations.history import load_sheets_data, invalidate_sheet_cache
+
+# Particionamento anual das abas de histórico: as linhas de anos encerrados (mais antigas que
+# ARCHIVE_HOT_YEARS) são movidas para abas '<aba>_arquivo_<ano>'. load_sheet_data continua lendo
+# só a aba principal; as telas que consultam anos antigos usam load_sheet_history, que inclui
+# as abas de arquivo do período pedido. O arquivamento roda uma vez por ano, em segundo plano
+# (start_yearly_archiver), ou pelo painel de Utilitários (archive_closed_years).
+
+ARCHIVE_SUFFIX = "_arquivo_"
+
+_titles_cache = {"titles": [], "loaded_at": 0}
+_archive_lock = threading.Lock()
+_archiver = None
+_archiver_lock = threading.Lock()
+
+
+def archive_sheet_name(sheet_name, year):
+    """Nome da aba de arquivo de um ano (ex.: extintores_arquivo_2023)."""
+    return f"{sheet_name}{ARCHIVE_SUFFIX}{year}"
+
+
+def _sheet_properties():
+    sheets = get_sheets_service().spreadsheets().get(
+        spreadsheetId=GDRIVE_SHEETS_ID, fields='sheets.properties'
+    ).execute().get('sheets', [])
+    return {sheet['properties']['title']: sheet['properties'] for sheet in sheets}
+
+
+def list_archive_years(sheet_name):
+    """Anos já arquivados da aba, em ordem crescente (lista das abas em cache por SHEET_CACHE_TTL_SECONDS)."""
+    if time.time() - _titles_cache["loaded_at"] >= SHEET_CACHE_TTL_SECONDS:
+        try:
+            _titles_cache["titles"] = list(_sheet_properties())
+        except Exception as e:
+            st.error(f"Erro ao listar as abas de arquivo da planilha: {e}")
+            return []
+        _titles_cache["loaded_at"] = time.time()
+
+    pattern = re.compile(rf"^{re.escape(sheet_name + ARCHIVE_SUFFIX)}(\d{{4}})$")
+    return sorted(int(match.group(1)) for match in map(pattern.match, _titles_cache["titles"]) if match)
+
+
+def load_sheet_history(sheet_name, since_year=None, until_year=None, typed=False):
+    """
+    Carrega a aba principal junto com as abas de arquivo dos anos entre 'since_year' e
+    'until_year' (None: sem limite), como um único DataFrame: os anos arquivados primeiro,
+    em ordem, e depois a aba principal. As abas que faltam em cache são lidas em uma única chamada.
+    Com 'typed', as colunas vêm convertidas como em load_typed_sheet_data.
+    """
+    years = [
+        year for year in list_archive_years(sheet_name)
+        if (since_year is None or year >= since_year) and (until_year is None or year <= until_year)
+    ]
+    names = [archive_sheet_name(sheet_name, year) for year in years] + [sheet_name]
+    frames = load_sheets_data(names)
+    parts = [frames[name] for name in names if not frames[name].empty]
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    if typed:
+        return apply_sheet_schema(sheet_name, df)
+    return df
+
+
+def _row_key(row):
+    """Linha como tupla de texto, sem as células vazias do fim (para comparar leituras da planilha)."""
+    values = ["" if value is None else str(value) for value in row]
+    while values and values[-1] == "":
+        values.pop()
+    return tuple(values)
+
+
+def _row_ranges(positions):
+    """Agrupa posições de linha (0 = cabeçalho) em intervalos contínuos [início, fim)."""
+    ranges = []
+    for position in sorted(positions):
+        if ranges and ranges[-1][1] == position:
+            ranges[-1][1] = position + 1
+        else:
+            ranges.append([position, position + 1])
+    return ranges
+
+
+def _write_archive_rows(properties, archive_name, headers, rows):
+    """
+    Acrescenta as linhas à aba de arquivo, criando-a se preciso. Linhas que já estão nela
+    (de uma execução interrompida antes de limpar a aba principal) não são repetidas.
+    """
+    service = get_sheets_service().spreadsheets()
+    if archive_name not in properties:
+        service.batchUpdate(spreadsheetId=GDRIVE_SHEETS_ID, body={"requests": [{"addSheet": {"properties": {
+            "title": archive_name,
+            "gridProperties": {"rowCount": len(rows) + 1, "columnCount": max(26, len(headers))},
+        }}}]}).execute()
+        existing = []
+    else:
+        existing = service.values().get(
+            spreadsheetId=GDRIVE_SHEETS_ID, range=f"{archive_name}!A:Z"
+        ).execute().get('values', [])
+
+    if existing and existing[0] != headers[:len(existing[0])]:
+        raise ValueError(f"O cabeçalho da aba '{archive_name}' não confere com o da aba principal.")
+    if existing[:1] != [headers]:
+        service.values().update(
+            spreadsheetId=GDRIVE_SHEETS_ID, range=f"{archive_name}!A1",
+            valueInputOption='RAW', body={"values": [headers]}
+        ).execute()
+
+    already_archived = Counter(_row_key(row) for row in existing[1:])
+    missing = []
+    for row in rows:
+        key = _row_key(row)
+        if already_archived[key]:
+            already_archived[key] -= 1
+        else:
+            missing.append(row)
+    if missing:
+        service.values().append(
+            spreadsheetId=GDRIVE_SHEETS_ID, range=f"{archive_name}!A1",
+            valueInputOption='RAW', insertDataOption='INSERT_ROWS', body={"values": missing}
+        ).execute()
+
+
+def archive_closed_years(sheet_name, today=None):
+    """
+    Move para as abas de arquivo as linhas da aba com data anterior aos ARCHIVE_HOT_YEARS
+    anos mais recentes. Linhas sem data válida ficam na aba principal.
+    As linhas são copiadas antes de serem apagadas da aba principal, e apagadas por posição,
+    sem regravar a aba: registros acrescentados pela fila de gravação no meio do processo
+    não se perdem. Retorna {ano: linhas arquivadas}.
+    """
+    first_hot_year = (today or date.today()).year - ARCHIVE_HOT_YEARS + 1
+    with _archive_lock:
+        service = get_sheets_service().spreadsheets()
+        values = service.values().get(
+            spreadsheetId=GDRIVE_SHEETS_ID, range=f"{sheet_name}!A:Z"
+        ).execute().get('values', [])
+        if len(values) < 2:
+            return {}
+        headers = values[0]
+        date_column = ARCHIVE_DATE_COLUMNS[sheet_name]
+        if date_column not in headers:
+            raise ValueError(f"A aba '{sheet_name}' não tem a coluna '{date_column}'.")
+
+        position = headers.index(date_column)
+        dates = parse_dates(pd.Series([row[position] if position < len(row) else None for row in values[1:]]))
+        years = dates.dt.year
+        closed = years[years < first_hot_year]
+        if closed.empty:
+            return {}
+
+        properties = _sheet_properties()
+        archived = {}
+        for year, rows_index in closed.groupby(closed).groups.items():
+            year = int(year)
+            _write_archive_rows(properties, archive_sheet_name(sheet_name, year), headers, [values[i + 1] for i in rows_index])
+            archived[year] = len(rows_index)
+
+        # Confere se as linhas não mudaram de posição desde a leitura antes de apagá-las
+        positions = [i + 1 for i in closed.index]
+        last = max(positions) + 1
+        current = service.values().get(
+            spreadsheetId=GDRIVE_SHEETS_ID, range=f"{sheet_name}!A1:Z{last}"
+        ).execute().get('values', [])
+        if [_row_key(row) for row in current] != [_row_key(row) for row in values[:last]]:
+            raise RuntimeError(f"A aba '{sheet_name}' foi alterada durante o arquivamento; tente novamente.")
+
+        sheet_id = properties[sheet_name]['sheetId']
+        requests = [
+            {"deleteDimension": {"range": {
+                "sheetId": sheet_id, "dimension": "ROWS", "startIndex": start, "endIndex": end
+            }}}
+            for start, end in reversed(_row_ranges(positions))
+        ]
+        service.batchUpdate(spreadsheetId=GDRIVE_SHEETS_ID, body={"requests": requests}).execute()
+
+    _titles_cache["loaded_at"] = 0
+    reset_sheet_snapshot(sheet_name)
+    invalidate_sheet_cache(sheet_name)
+    for year in archived:
+        reset_sheet_snapshot(archive_sheet_name(sheet_name, year))
+        invalidate_sheet_cache(archive_sheet_name(sheet_name, year))
+    logging.info(f"Arquivamento de '{sheet_name}': {archived}")
+    return archived
+
+
+def _read_archive_state():
+    try:
+        with open(ARCHIVE_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_archive_state(state):
+    os.makedirs(os.path.dirname(ARCHIVE_STATE_PATH), exist_ok=True)
+    temp_path = f"{ARCHIVE_STATE_PATH}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, ARCHIVE_STATE_PATH)
+
+
+def _run_yearly_archive(year):
+    """Arquiva todas as abas de ARCHIVE_DATE_COLUMNS; só marca o ano como concluído se nenhuma falhar."""
+    failed = False
+    for sheet_name in ARCHIVE_DATE_COLUMNS:
+        try:
+            archive_closed_years(sheet_name)
+        except Exception:
+            logging.exception(f"Falha ao arquivar os anos encerrados de '{sheet_name}'.")
+            failed = True
+    if not failed:
+        _write_archive_state({"last_year": year})
+
+
+def start_yearly_archiver():
+    """
+    Inicia, em segundo plano, o arquivamento das abas de histórico se ele ainda não foi
+    concluído neste ano. Não bloqueia a página; chamadas repetidas não fazem nada.
+    """
+    global _archiver
+    year = date.today().year
+    if _read_archive_state().get("last_year", 0) >= year:
+        return
+    with _archiver_lock:
+        if _archiver is not None and (_archiver.is_alive() or _archiver.year == year):
+            return
+        _archiver = threading.Thread(target=_run_yearly_archive, args=(year,), name="isf-yearly-archive", daemon=True)
+        _archiver.year = year
+        _archiver.start()
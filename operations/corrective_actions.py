@@ -1,7 +1,7 @@
 import streamlit as st
 from datetime import date
-from .extinguisher_operations import save_inspection, calculate_next_dates, generate_action_plan
-from gdrive.gdrive_upload import GoogleDriveUploader
+from .extinguisher_operations import save_inspection, save_inspections, calculate_next_dates, generate_action_plan
+from utils.save_action import enqueue_rows_checked
 
 def save_corrective_action(original_record, substitute_last_record, action_details, user_name):
     """
@@ -33,7 +33,6 @@ def save_corrective_action(original_record, substitute_last_record, action_detai
                 'data_proxima_manutencao_2_nivel': None, 
                 'data_proxima_manutencao_3_nivel': None
             })
-            save_inspection(retirement_record)
 
             # 2. "Ativa" o equipamento substituto no local do antigo
             new_equip_record = {
@@ -55,7 +54,9 @@ def save_corrective_action(original_record, substitute_last_record, action_detai
             new_equip_record['plano_de_acao'] = generate_action_plan(new_equip_record)
             # O terceiro argumento foi removido, pois era uma string ('tipo_agente') em vez de um dicionário.
             new_equip_record.update(calculate_next_dates(new_equip_record['data_servico'], 'Inspeção'))
-            save_inspection(new_equip_record)
+
+            # Aposentadoria e ativação vão para a planilha na mesma chamada em lote
+            save_inspections([retirement_record, new_equip_record])
 
         # --- Cenário 2: Ação Corretiva Simples (sem substituição) ---
         else:
@@ -86,8 +87,7 @@ def save_corrective_action(original_record, substitute_last_record, action_detai
             action_details.get('photo_link', None)
         ]
         
-        uploader = GoogleDriveUploader()
-        uploader.append_data_to_sheet("log_acoes", log_row)
+        enqueue_rows_checked("log_acoes", [log_row])
         
         return True
 
@@ -0,0 +1,431 @@
+import time
+import logging
+import threading
+import pandas as pd
+import streamlit as st
+from gdrive.config import (
+    GDRIVE_SHEETS_ID, SHEET_CACHE_TTL_SECONDS, EXTINGUISHER_SHEET_NAME, HOSE_SHEET_NAME,
+    EXTINGUISHER_STATUS_SHEET_NAME, HOSE_STATUS_SHEET_NAME
+)
+from gdrive.google_clients import get_sheets_service
+from gdrive.write_queue import get_pending_rows, add_flush_listener
+from gdrive.sheet_columns import get_header_map, column_letter
+from gdrive.sheet_schemas import apply_sheet_schema, parse_dates
+from operations.history import consolidate_record, CONSOLIDATED_DATE_COLUMNS
+from operations.archive import load_sheet_history
+
+# Status atual dos equipamentos: para cada aba de histórico (só de inclusão), uma aba de
+# status com uma linha por equipamento: o último registro (pela data do serviço; em datas
+# iguais, o mais abaixo na planilha) e, nas colunas extras, datas máximas do histórico.
+# Cada lote gravado no histórico pela fila de gravação atualiza, na mesma thread, só as linhas
+# dos equipamentos afetados; as leituras carregam a aba de status (tamanho da frota) e aplicam
+# as linhas ainda na fila. rebuild_current_status recalcula a aba a partir do histórico; quando
+# a aba falta ou não confere, a leitura dispara o recálculo em segundo plano e continua servindo
+# o status anterior em memória (só a primeira leitura do processo precisa esperar por ele).
+
+# Colunas extras: nome -> (coluna de data do histórico, coluna de filtro, valor do filtro)
+STATUS_PROJECTIONS = {
+    EXTINGUISHER_SHEET_NAME: {
+        "status_sheet": EXTINGUISHER_STATUS_SHEET_NAME,
+        "id_column": "numero_identificacao",
+        "date_column": "data_servico",
+        "max_dates": {
+            "ultima_manutencao_2": ("data_servico", "tipo_servico", "Manutenção Nível 2"),
+            "ultima_manutencao_3": ("data_servico", "tipo_servico", "Manutenção Nível 3"),
+            **{f"max_{col}": (col, None, None) for col in CONSOLIDATED_DATE_COLUMNS},
+        },
+    },
+    HOSE_SHEET_NAME: {
+        "status_sheet": HOSE_STATUS_SHEET_NAME,
+        "id_column": "id_mangueira",
+        "date_column": "data_inspecao",
+        "max_dates": {},
+    },
+}
+
+_states = {}
+_needs_rebuild = set()
+_status_lock = threading.RLock()
+# Lotes gravados no histórico durante uma reconstrução, aplicados ao resultado dela no fim
+_rebuild_backlog = {}
+_rebuild_lock = threading.Lock()
+_rebuilders = {}
+
+
+def fold_history_rows(projection, status, rows):
+    """
+    Aplica linhas do histórico (DataFrame com as colunas da aba) ao status atual (DataFrame
+    de texto com as colunas do histórico e as extras) e retorna o novo status, em texto.
+    Os equipamentos mantêm suas posições; os novos entram no fim, na ordem do histórico.
+    """
+    id_column, date_column = projection["id_column"], projection["date_column"]
+    extras = list(projection["max_dates"])
+    columns = [col for col in rows.columns if col not in extras] + extras
+
+    # O status vem antes das linhas novas: em datas iguais, prevalece a linha nova
+    combined = pd.concat([status.reindex(columns=columns), rows.reindex(columns=columns)], ignore_index=True)
+    dates = parse_dates(combined[date_column])
+    valid = dates.notna() & combined[id_column].notna() & (combined[id_column].astype(str) != '')
+    combined, dates = combined[valid], dates[valid]
+    if combined.empty:
+        return pd.DataFrame(columns=columns)
+
+    ids = combined[id_column].astype(str)
+    order = dates.sort_values(kind='mergesort').index
+    latest = combined.loc[order].groupby(ids.loc[order], sort=False).tail(1)
+    latest = latest.set_axis(ids.loc[latest.index]).reindex(ids.unique())
+
+    num_status = len(status)
+    for name, (source, filter_column, filter_value) in projection["max_dates"].items():
+        from_history = combined[source] if source in combined.columns else pd.Series(None, index=combined.index)
+        if filter_column is not None:
+            if filter_column in combined.columns:
+                from_history = from_history.where(combined[filter_column] == filter_value)
+            else:
+                from_history = pd.Series(None, index=combined.index)
+        # Linhas vindas do status já trazem a data máxima na própria coluna extra
+        values = combined[name].where(combined.index < num_status, from_history)
+        maximum = parse_dates(values).groupby(ids).max()
+        latest[name] = maximum.reindex(latest.index).dt.strftime('%Y-%m-%d')
+
+    return latest.reset_index(drop=True).fillna('').astype(str)
+
+
+def _rows_frame(headers, rows):
+    """DataFrame de texto com as linhas do histórico nas colunas do cabeçalho ({nome: posição})."""
+    return pd.DataFrame(
+        [[row[position] if position < len(row) else '' for position in headers.values()] for row in rows],
+        columns=list(headers)
+    )
+
+
+def _read_status_sheet(status_sheet):
+    """Lê a aba de status inteira; retorna None se ela ainda não existe."""
+    sheets = get_sheets_service().spreadsheets().get(
+        spreadsheetId=GDRIVE_SHEETS_ID, fields='sheets.properties.title'
+    ).execute().get('sheets', [])
+    if status_sheet not in [sheet['properties']['title'] for sheet in sheets]:
+        return None
+    values = get_sheets_service().spreadsheets().values().get(
+        spreadsheetId=GDRIVE_SHEETS_ID, range=status_sheet
+    ).execute().get('values', [])
+    if not values:
+        return pd.DataFrame()
+    headers = values[0]
+    return pd.DataFrame(
+        [row + [''] * (len(headers) - len(row)) for row in values[1:]], columns=headers
+    )
+
+
+def _write_status_sheet(status_sheet, status):
+    """
+    Regrava a aba de status com o DataFrame informado (cabeçalho + uma linha por equipamento),
+    criando-a se não existir. O conteúdo novo é escrito por cima do antigo e só depois as células
+    que sobraram são limpas: a aba nunca fica vazia ou ausente no meio da gravação.
+    """
+    service = get_sheets_service().spreadsheets()
+    sheets = service.get(spreadsheetId=GDRIVE_SHEETS_ID, fields='sheets.properties').execute().get('sheets', [])
+    properties = next((sheet['properties'] for sheet in sheets if sheet['properties']['title'] == status_sheet), None)
+    grid = properties.get('gridProperties', {}) if properties else {}
+    old_rows, old_columns = grid.get('rowCount', 0), grid.get('columnCount', 0)
+    num_rows, num_columns = len(status) + 1, len(status.columns)
+    grid = {
+        "rowCount": max(old_rows, len(status) + 1000),
+        "columnCount": max(old_columns, 26, num_columns),
+    }
+    if properties is None:
+        request = {"addSheet": {"properties": {"title": status_sheet, "gridProperties": grid}}}
+    elif old_rows < num_rows or old_columns < num_columns:
+        request = {"updateSheetProperties": {
+            "properties": {"sheetId": properties['sheetId'], "gridProperties": grid},
+            "fields": "gridProperties.rowCount,gridProperties.columnCount",
+        }}
+    else:
+        request = None
+    if request:
+        service.batchUpdate(spreadsheetId=GDRIVE_SHEETS_ID, body={"requests": [request]}).execute()
+
+    service.values().update(
+        spreadsheetId=GDRIVE_SHEETS_ID,
+        range=f"{status_sheet}!A1",
+        valueInputOption='RAW',
+        body={"values": [list(status.columns)] + status.values.tolist()}
+    ).execute()
+
+    # Limpa o que sobrou do conteúdo anterior: linhas abaixo e colunas à direita
+    last_column = column_letter(grid["columnCount"] - 1)
+    leftovers = []
+    if old_rows > num_rows:
+        leftovers.append(f"{status_sheet}!A{num_rows + 1}:{last_column}{old_rows}")
+    if old_columns > num_columns:
+        leftovers.append(f"{status_sheet}!{column_letter(num_columns)}1:{last_column}{num_rows}")
+    if leftovers:
+        service.values().batchClear(spreadsheetId=GDRIVE_SHEETS_ID, body={"ranges": leftovers}).execute()
+
+
+def _positions_preserved(projection, old_status, new_status):
+    """Confere se os equipamentos do status antigo continuam nas mesmas posições do novo."""
+    if len(new_status) < len(old_status):
+        return False
+    id_column = projection["id_column"]
+    if id_column not in old_status.columns:
+        return old_status.empty
+    old_ids = old_status[id_column].astype(str).tolist()
+    return new_status[id_column].iloc[:len(old_ids)].astype(str).tolist() == old_ids
+
+
+def _upsert_status_rows(status_sheet, old_status, new_status):
+    """Grava na aba apenas as linhas alteradas (na posição do equipamento) e acrescenta as novas no fim."""
+    service = get_sheets_service().spreadsheets().values()
+    changed = [
+        {"range": f"{status_sheet}!A{position + 2}", "values": [new_status.iloc[position].tolist()]}
+        for position in range(len(old_status))
+        if old_status.iloc[position].tolist() != new_status.iloc[position].tolist()
+    ]
+    if changed:
+        service.batchUpdate(
+            spreadsheetId=GDRIVE_SHEETS_ID,
+            body={"valueInputOption": "RAW", "data": changed}
+        ).execute()
+    added = new_status.iloc[len(old_status):].values.tolist()
+    if added:
+        service.append(
+            spreadsheetId=GDRIVE_SHEETS_ID,
+            range=f"{status_sheet}!A1",
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body={"values": added}
+        ).execute()
+
+
+def rebuild_current_status(sheet_name):
+    """
+    Recalcula a aba de status a partir de todo o histórico (incluindo os anos arquivados) e a regrava.
+    Use depois de editar o histórico diretamente na planilha. Retorna o número de equipamentos.
+    As leituras continuam sendo atendidas durante o recálculo; os lotes gravados nesse meio-tempo
+    são aplicados ao resultado no fim.
+    """
+    projection = STATUS_PROJECTIONS[sheet_name]
+    with _rebuild_lock:
+        with _status_lock:
+            _rebuild_backlog[sheet_name] = []
+        try:
+            history = load_sheet_history(sheet_name)
+            history = history.loc[:, [bool(column) for column in history.columns]]
+            history = history.loc[:, ~history.columns.duplicated()]
+            status = fold_history_rows(projection, pd.DataFrame(), history)
+            _write_status_sheet(projection["status_sheet"], status)
+
+            with _status_lock:
+                backlog = _rebuild_backlog.pop(sheet_name)
+                if backlog:
+                    # Linhas que já entraram pela leitura do histórico não mudam o resultado
+                    new_status = fold_history_rows(projection, status, _rows_frame(get_header_map(sheet_name), backlog))
+                    if _positions_preserved(projection, status, new_status):
+                        _upsert_status_rows(projection["status_sheet"], status, new_status)
+                    else:
+                        _write_status_sheet(projection["status_sheet"], new_status)
+                    status = new_status
+                _states[sheet_name] = {"df": status, "loaded_at": time.time()}
+                _needs_rebuild.discard(sheet_name)
+            return len(status)
+        finally:
+            with _status_lock:
+                _rebuild_backlog.pop(sheet_name, None)
+
+
+def _rebuild_in_background(sheet_name):
+    logging.info(f"Reconstruindo a aba de status de '{sheet_name}'.")
+    try:
+        rebuild_current_status(sheet_name)
+    except Exception:
+        logging.exception(f"Falha ao reconstruir a aba de status de '{sheet_name}'.")
+
+
+def _start_rebuild(sheet_name):
+    """Inicia a reconstrução da aba de status em segundo plano, se ela ainda não estiver em andamento."""
+    with _status_lock:
+        _needs_rebuild.add(sheet_name)
+        rebuilder = _rebuilders.get(sheet_name)
+        if rebuilder is None or not rebuilder.is_alive():
+            rebuilder = threading.Thread(
+                target=_rebuild_in_background, args=(sheet_name,),
+                name=f"isf-status-rebuild-{sheet_name}", daemon=True
+            )
+            _rebuilders[sheet_name] = rebuilder
+            rebuilder.start()
+        return rebuilder
+
+
+def _expected_columns(sheet_name, history_headers):
+    return list(history_headers) + list(STATUS_PROJECTIONS[sheet_name]["max_dates"])
+
+
+def _load_state(sheet_name):
+    """Status atual em memória (recarregado da aba após SHEET_CACHE_TTL_SECONDS); None se precisar ser reconstruído."""
+    with _status_lock:
+        state = _states.get(sheet_name)
+        if state and time.time() - state["loaded_at"] < SHEET_CACHE_TTL_SECONDS:
+            return state["df"]
+        projection = STATUS_PROJECTIONS[sheet_name]
+        status = _read_status_sheet(projection["status_sheet"])
+        if status is None or list(status.columns) != _expected_columns(sheet_name, get_header_map(sheet_name)):
+            return None
+        # IDs repetidos: a aba foi editada à mão ou a última gravação parou no meio
+        if status[projection["id_column"]].duplicated().any():
+            return None
+        _states[sheet_name] = {"df": status, "loaded_at": time.time()}
+        return status
+
+
+def _on_rows_flushed(sheet_name, rows):
+    """Atualiza a aba de status com um lote recém-gravado no histórico (thread da fila de gravação)."""
+    projection = STATUS_PROJECTIONS.get(sheet_name)
+    if projection is None:
+        return
+    with _status_lock:
+        if sheet_name in _rebuild_backlog:
+            _rebuild_backlog[sheet_name].extend(rows)
+            return
+        if sheet_name in _needs_rebuild:
+            return
+        try:
+            status = _load_state(sheet_name)
+            if status is None:
+                _needs_rebuild.add(sheet_name)
+                return
+            new_status = fold_history_rows(projection, status, _rows_frame(get_header_map(sheet_name), rows))
+            if not _positions_preserved(projection, status, new_status):
+                # Linhas do status foram descartadas ou mudaram de lugar: gravar por posição
+                # sobrescreveria outros equipamentos, então a aba é recalculada na próxima leitura
+                logging.warning(f"A aba de status de '{sheet_name}' não confere com o histórico; será reconstruída.")
+                _needs_rebuild.add(sheet_name)
+                return
+            _upsert_status_rows(projection["status_sheet"], status, new_status)
+            _states[sheet_name] = {"df": new_status, "loaded_at": _states[sheet_name]["loaded_at"]}
+        except Exception:
+            # A aba pode ter ficado sem parte das linhas: recalcula tudo na próxima leitura
+            # (até lá, as leituras usam o status em memória)
+            _needs_rebuild.add(sheet_name)
+            raise
+
+
+add_flush_listener(_on_rows_flushed)
+
+
+def invalidate_current_status(sheet_name=None):
+    """Descarta o status em memória de uma aba (ou de todas); a próxima leitura relê a aba de status."""
+    with _status_lock:
+        if sheet_name is None:
+            _states.clear()
+        else:
+            _states.pop(sheet_name, None)
+
+
+def _status_frame(sheet_name):
+    """
+    Status atual em texto, como está na aba de status (sem as linhas ainda na fila de gravação).
+    Se a aba precisar ser reconstruída, o recálculo roda em segundo plano e o status anterior
+    em memória é devolvido; sem um status anterior, espera o recálculo terminar.
+    """
+    with _status_lock:
+        status = None if sheet_name in _needs_rebuild else _load_state(sheet_name)
+        if status is not None:
+            return status
+        state = _states.get(sheet_name)
+    rebuilder = _start_rebuild(sheet_name)
+    if state is not None:
+        return state["df"]
+
+    rebuilder.join()
+    with _status_lock:
+        state = _states.get(sheet_name)
+    if state is None:
+        raise RuntimeError(f"Não foi possível reconstruir a aba de status de '{sheet_name}'.")
+    return state["df"]
+
+
+def _status_index(sheet_name, status):
+    """{ID: posição} do status em memória, montado uma única vez por versão do status."""
+    with _status_lock:
+        state = _states.get(sheet_name)
+        if state is not None and state["df"] is status and "index" in state:
+            return state["index"]
+
+    index = {}
+    for position, key in enumerate(status[STATUS_PROJECTIONS[sheet_name]["id_column"]].astype(str)):
+        index.setdefault(key, position)
+    with _status_lock:
+        state = _states.get(sheet_name)
+        if state is not None and state["df"] is status:
+            state["index"] = index
+    return index
+
+
+def _current_status_text(sheet_name):
+    """Status atual em texto, com as linhas ainda na fila de gravação já aplicadas."""
+    projection = STATUS_PROJECTIONS[sheet_name]
+    status = _status_frame(sheet_name)
+    pending = get_pending_rows(sheet_name)
+    if pending:
+        status = fold_history_rows(projection, status, _rows_frame(get_header_map(sheet_name), pending))
+    return status.replace('', None)
+
+
+def load_current_status(sheet_name):
+    """
+    Retorna o status atual da aba de histórico: uma linha por equipamento, com as colunas do
+    último registro (tipadas como em load_typed_sheet_data) e as colunas extras de datas máximas.
+    Inclui as linhas salvas que ainda estão na fila de gravação. Se a aba de status não existir
+    ou estiver desatualizada, ela é reconstruída a partir do histórico.
+    """
+    try:
+        status = _current_status_text(sheet_name)
+    except Exception as e:
+        st.error(f"Erro ao carregar o status atual de '{sheet_name}': {e}")
+        return pd.DataFrame()
+
+    typed = apply_sheet_schema(sheet_name, status)
+    for name in STATUS_PROJECTIONS[sheet_name]["max_dates"]:
+        typed[name] = parse_dates(typed[name])
+    return typed
+
+
+def lookup_current_record(sheet_name, search_value):
+    """
+    Último registro do equipamento com as datas consolidadas do histórico (datas como
+    'YYYY-MM-DD', vazios como None), lido da aba de status por um índice {ID: posição}:
+    a consulta não depende do tamanho da frota. Linhas do equipamento ainda na fila de
+    gravação são aplicadas. Retorna None se o equipamento não tiver registros.
+    """
+    projection = STATUS_PROJECTIONS[sheet_name]
+    try:
+        status = _status_frame(sheet_name)
+        pending = get_pending_rows(sheet_name)
+    except Exception as e:
+        st.error(f"Erro ao carregar o status atual de '{sheet_name}': {e}")
+        return None
+
+    key = str(search_value)
+    position = _status_index(sheet_name, status).get(key) if not status.empty else None
+    record_status = status.iloc[[position]] if position is not None else status.iloc[0:0]
+    if pending:
+        headers = get_header_map(sheet_name)
+        id_position = headers.get(projection["id_column"])
+        pending = [
+            row for row in pending
+            if id_position is not None and id_position < len(row) and row[id_position] == key
+        ]
+    if pending:
+        record_status = fold_history_rows(projection, record_status, _rows_frame(headers, pending))
+    if record_status.empty:
+        return None
+
+    record = {column: (None if value == '' else value) for column, value in record_status.iloc[0].items()}
+    max_dates = {}
+    for name in projection["max_dates"]:
+        value = record.pop(name, None)
+        column = name[len("max_"):]
+        if name.startswith("max_") and column in record:
+            max_dates[column] = pd.to_datetime(value, errors='coerce')
+    return consolidate_record(record, max_dates)
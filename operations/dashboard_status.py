@@ -0,0 +1,117 @@
+import pandas as pd
+import numpy as np
+from datetime import date
+
+# Periodicidades usadas para calcular os próximos vencimentos dos extintores
+INSPECTION_INTERVAL = pd.DateOffset(months=1)
+MAINTENANCE_N2_INTERVAL = pd.DateOffset(months=12)
+MAINTENANCE_N3_INTERVAL = pd.DateOffset(years=5)
+
+STATUS_OUT_OF_SERVICE = "FORA DE OPERAÇÃO"
+STATUS_NON_COMPLIANT = "NÃO CONFORME (Aguardando Ação)"
+STATUS_EXPIRED = "VENCIDO"
+STATUS_OK = "OK"
+
+
+def summarize_extinguishers(df_full, today=None):
+    """
+    Consolida o histórico de extintores em uma linha por equipamento, em uma única passada
+    (groupby), sem percorrer equipamento por equipamento.
+
+    Para cada 'numero_identificacao' retorna as colunas do último registro e:
+    - ultima_manutencao_2 / ultima_manutencao_3: data do último serviço de cada nível;
+    - venc_inspecao, venc_manutencao_2, venc_manutencao_3: próximos vencimentos;
+    - venc_geral: o vencimento mais próximo;
+    - status_atual: OK, VENCIDO, NÃO CONFORME ou FORA DE OPERAÇÃO.
+    As datas são devolvidas como Timestamp (NaT quando não há registro).
+    """
+    if df_full.empty:
+        return pd.DataFrame()
+
+    df = df_full.copy()
+    df['data_servico'] = pd.to_datetime(df['data_servico'], errors='coerce')
+    df = df.dropna(subset=['data_servico'])
+    if df.empty:
+        return pd.DataFrame()
+
+    for col in ['tipo_servico', 'plano_de_acao', 'aprovado_inspecao']:
+        if col not in df.columns:
+            df[col] = None
+
+    # Mantém os equipamentos na ordem em que aparecem no histórico
+    first_seen = df['numero_identificacao'].dropna().unique()
+
+    # Ordenação estável: em datas iguais, vale o registro mais abaixo na planilha
+    df = df.sort_values(by='data_servico', kind='mergesort')
+    by_id = df.groupby('numero_identificacao', sort=False)
+
+    summary = by_id.tail(1).set_index('numero_identificacao')
+    summary['ultima_manutencao_2'] = (
+        df[df['tipo_servico'] == 'Manutenção Nível 2'].groupby('numero_identificacao')['data_servico'].max()
+    )
+    summary['ultima_manutencao_3'] = (
+        df[df['tipo_servico'] == 'Manutenção Nível 3'].groupby('numero_identificacao')['data_servico'].max()
+    )
+
+    return extinguisher_status(summary.reindex(first_seen).reset_index(), today)
+
+
+def extinguisher_status(latest, today=None):
+    """
+    Calcula vencimentos e 'status_atual' a partir de uma linha por equipamento: o último
+    registro ('data_servico' é o serviço mais recente) com 'ultima_manutencao_2' e
+    'ultima_manutencao_3'. Aceita o resultado consolidado do histórico ou a aba de status
+    atual (operations/current_status.py).
+    """
+    if latest.empty:
+        return pd.DataFrame()
+
+    summary = latest.copy()
+    for col in ['plano_de_acao', 'aprovado_inspecao']:
+        if col not in summary.columns:
+            summary[col] = None
+    for col in ['data_servico', 'ultima_manutencao_2', 'ultima_manutencao_3']:
+        summary[col] = pd.to_datetime(summary[col], errors='coerce')
+
+    summary['venc_inspecao'] = summary['data_servico'] + INSPECTION_INTERVAL
+    summary['venc_manutencao_2'] = summary['ultima_manutencao_2'] + MAINTENANCE_N2_INTERVAL
+    summary['venc_manutencao_3'] = summary['ultima_manutencao_3'] + MAINTENANCE_N3_INTERVAL
+    summary['venc_geral'] = summary[['venc_inspecao', 'venc_manutencao_2', 'venc_manutencao_3']].min(axis=1)
+
+    today_ts = pd.Timestamp(today or date.today())
+    conditions = [
+        summary['plano_de_acao'] == "FORA DE OPERAÇÃO (SUBSTITUÍDO)",
+        summary['aprovado_inspecao'] == 'Não',
+        summary['venc_geral'] < today_ts,
+    ]
+    choices = [STATUS_OUT_OF_SERVICE, STATUS_NON_COMPLIANT, STATUS_EXPIRED]
+    summary['status_atual'] = np.select(conditions, choices, default=STATUS_OK)
+    return summary
+
+
+SHELTER_PENDING_STATUS = "Reprovado com Pendências"
+
+
+def latest_shelter_inspections(df_inspections):
+    """
+    Retorna a inspeção vigente de cada abrigo, uma linha por 'id_abrigo', de uma só vez
+    (ordenação + remoção de duplicados): a inspeção da data mais recente e, entre as dessa
+    data, a primeira aprovada; se nenhuma foi aprovada, a primeira registrada.
+    A coluna 'data_inspecao' é devolvida como date; o índice é o da linha no DataFrame da aba.
+    """
+    if df_inspections.empty:
+        return pd.DataFrame()
+
+    df = df_inspections.assign(
+        _dia=pd.to_datetime(df_inspections['data_inspecao'], errors='coerce').dt.normalize(),
+        _pendente=df_inspections['status_geral'] == SHELTER_PENDING_STATUS
+    )
+    df = df.dropna(subset=['_dia'])
+    if df.empty:
+        return pd.DataFrame()
+
+    # Ordenação estável: entre inspeções equivalentes, prevalece a ordem da planilha
+    df = df.sort_values(by=['_dia', '_pendente'], ascending=[False, True], kind='mergesort')
+    latest = df.drop_duplicates(subset='id_abrigo', keep='first').copy()
+    latest['data_inspecao'] = latest['_dia'].dt.date
+    return latest.drop(columns=['_dia', '_pendente'])
@@ -3,12 +3,10 @@ import pandas as pd
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from gdrive.gdrive_upload import GoogleDriveUploader
+from utils.save_action import enqueue_rows_checked
 from gdrive.config import EXTINGUISHER_SHEET_NAME
-from AI.api_Operation import PDFQA
-from utils.prompts import get_extinguisher_inspection_prompt
 
 uploader = GoogleDriveUploader()
-pdf_qa = PDFQA()
 
 def generate_action_plan(record):
     """
@@ -94,23 +92,29 @@ def calculate_next_dates(service_date_str, service_level, existing_dates=None):
 
     return dates
     
-def process_extinguisher_pdf(uploaded_file):
-    """Processa um PDF de inspeção de extintor usando IA para extrair dados em lote."""
-    if uploaded_file:
-        prompt = get_extinguisher_inspection_prompt()
-        extracted_data = pdf_qa.extract_structured_data(uploaded_file, prompt)
-        if extracted_data and "extintores" in extracted_data and isinstance(extracted_data["extintores"], list):
-            return extracted_data["extintores"]
-        else:
-            st.error("A IA não retornou os dados no formato esperado (uma lista de extintores).")
-            st.json(extracted_data)
-            return None
+MAINTENANCE_SERVICE_LEVELS = ["Manutenção Nível 2", "Manutenção Nível 3"]
+
+
+def extinguishers_from_extraction(extracted_data):
+    """Valida o JSON retornado pela IA e retorna a lista de extintores (ou None, com aviso na tela)."""
+    if extracted_data and "extintores" in extracted_data and isinstance(extracted_data["extintores"], list):
+        return extracted_data["extintores"]
+    st.error("A IA não retornou os dados no formato esperado (uma lista de extintores).")
+    st.json(extracted_data)
     return None
 
 
+def extraction_has_maintenance(extracted_data):
+    """Indica se o relatório extraído contém manutenções N2/N3 (que exigem o PDF no Drive)."""
+    items = extracted_data.get("extintores") if isinstance(extracted_data, dict) else None
+    if not isinstance(items, list):
+        return False
+    return any(isinstance(item, dict) and item.get('tipo_servico') in MAINTENANCE_SERVICE_LEVELS for item in items)
 
-def save_inspection(data):
-    """Salva os dados de UMA inspeção no Google Sheets, garantindo a serialização correta dos dados."""
+
+
+def build_inspection_row(data):
+    """Monta a linha da aba de extintores para UMA inspeção, garantindo a serialização correta dos dados."""
     
     def to_safe_string(value):
         if pd.isna(value) or value is None:
@@ -125,7 +129,7 @@ def save_inspection(data):
     lat_str = str(lat).replace('.', ',') if lat is not None else None
     lon_str = str(lon).replace('.', ',') if lon is not None else None
 
-    data_row = [
+    return [
         to_safe_string(data.get('numero_identificacao')),
         to_safe_string(data.get('numero_selo_inmetro')),
         to_safe_string(data.get('tipo_agente')),
@@ -148,16 +152,36 @@ def save_inspection(data):
         lon_str, 
         to_safe_string(data.get('link_foto_nao_conformidade'))
     ]
-    
+
+
+def save_inspection(data):
+    """
+    Salva os dados de UMA inspeção no Google Sheets, garantindo a serialização correta dos dados.
+    A linha entra na fila de gravação local e é enviada à planilha em segundo plano.
+    """
     try:
-        uploader = GoogleDriveUploader()
-        uploader.append_data_to_sheet(EXTINGUISHER_SHEET_NAME, data_row)
+        enqueue_rows_checked(EXTINGUISHER_SHEET_NAME, [build_inspection_row(data)])
         return True
     except Exception as e:
         st.error(f"Erro ao salvar dados do equipamento {data.get('numero_identificacao')}: {e}")
         return False
 
 
+def save_inspections(records):
+    """
+    Salva VÁRIAS inspeções de uma vez, com uma única chamada em lote à planilha
+    (ou poucas, para lotes muito grandes).
+    """
+    if not records:
+        return True
+    try:
+        enqueue_rows_checked(EXTINGUISHER_SHEET_NAME, [build_inspection_row(record) for record in records])
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar o lote de {len(records)} inspeções de extintores: {e}")
+        return False
+
+
 def clean_and_prepare_ia_data(ia_item):
     """
     Limpa e prepara um item extraído pela IA.
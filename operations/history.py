@@ -2,92 +2,391 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
+import time
+import logging
+import threading
 
 # Garante que o app encontre a pasta gdrive
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from gdrive.gdrive_upload import GoogleDriveUploader
-from gdrive.config import EXTINGUISHER_SHEET_NAME
+from gdrive.sheet_snapshot import load_sheets_values
+from gdrive.write_queue import get_pending_rows, add_enqueue_listener
+from gdrive.google_clients import get_drive_service
+from gdrive.config import (
+    GDRIVE_SHEETS_ID, EXTINGUISHER_SHEET_NAME, SHEET_CACHE_TTL_SECONDS, SHEET_REFRESH_INTERVAL_SECONDS,
+    SHEET_REFRESH_AHEAD_SECONDS, SHEET_REFRESH_IDLE_SECONDS, SHEET_STALE_MAX_SECONDS
+)
+from gdrive.sheet_schemas import apply_sheet_schema
+from gdrive.sheet_columns import read_columns, invalidate_header_map
+
+_sheet_cache = {}
+_sheet_generation = {}
+_sheet_cache_lock = threading.Lock()
+_column_cache = {}
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def _rows_to_dataframe(headers, rows):
+    """Monta o DataFrame da aba, ajustando cada linha ao número de colunas do cabeçalho."""
+    num_columns = len(headers)
+    cleaned_rows = []
+    for row in rows:
+        row = list(row)
+        # Completa a linha com 'None' se ela for mais curta que o cabeçalho
+        row.extend([None] * (num_columns - len(row)))
+        cleaned_rows.append(row[:num_columns])
+    return pd.DataFrame(cleaned_rows, columns=headers)
+
+
+def _get_sheet_entries(sheet_names):
+    """
+    Retorna {aba: entrada de cache} ({'headers', 'df', 'loaded_at', 'used_at', 'modified', 'derived'}),
+    carregando as abas que não estão em cache em uma única leitura da planilha (ver load_sheets_values).
+    Abas vencidas há menos de SHEET_STALE_MAX_SECONDS são devolvidas como estão e atualizadas em
+    segundo plano (ver _SheetRefresher), sem fazer o usuário esperar pelo download.
+    A entrada é None para as abas cuja leitura falhou. O DataFrame da entrada não deve ser modificado.
+    """
+    refresher = ensure_refresher_started()
+    entries = {}
+    generations = {}
+    stale = []
+    now = time.time()
+    with _sheet_cache_lock:
+        for sheet_name in sheet_names:
+            entry = _sheet_cache.get(sheet_name)
+            age = now - entry["loaded_at"] if entry else None
+            if entry and age < SHEET_CACHE_TTL_SECONDS + SHEET_STALE_MAX_SECONDS:
+                entry["used_at"] = now
+                entries[sheet_name] = entry
+                if age >= SHEET_CACHE_TTL_SECONDS:
+                    stale.append(sheet_name)
+            else:
+                generations[sheet_name] = _sheet_generation.get(sheet_name, 0)
+    if stale:
+        refresher.request(stale)
+    if generations:
+        entries.update(_load_entries(generations))
+    return entries
+
+
+def _load_entries(generations, modified=None, quiet=False):
+    """
+    Lê da planilha as abas de 'generations' ({aba: geração no início da leitura}) e atualiza o cache.
+    'modified' é o modifiedTime da planilha no Drive consultado antes da leitura, se conhecido.
+    Se os dados lidos forem iguais aos do cache, a entrada existente é apenas renovada, mantendo
+    os valores derivados. Com 'quiet' (thread em segundo plano), os erros só vão para o log.
+    """
+    try:
+        values_by_sheet = load_sheets_values(list(generations))
+    except Exception as e:
+        if quiet:
+            raise
+        st.error(f"Erro ao carregar dados da planilha '{', '.join(generations)}': {e}")
+        return {sheet_name: None for sheet_name in generations}
+
+    entries = {}
+    for sheet_name, generation in generations.items():
+        if sheet_name not in values_by_sheet:
+            # Aba que falhou na releitura individual (ver load_sheets_values); as demais seguem
+            if not quiet:
+                st.error(f"Erro ao carregar dados da planilha '{sheet_name}': a leitura da aba falhou.")
+            entries[sheet_name] = None
+            continue
+        try:
+            data = values_by_sheet[sheet_name]
+            # Inclui as linhas salvas que ainda estão na fila de gravação local
+            rows = data[1:] + get_pending_rows(sheet_name) if data else []
+            headers = data[0] if data else []
+            df = _rows_to_dataframe(headers, rows)
+        except Exception as e:
+            if quiet:
+                logging.warning(f"Erro ao atualizar a aba '{sheet_name}' em segundo plano: {e}")
+            else:
+                st.error(f"Erro ao carregar dados da planilha '{sheet_name}': {e}")
+            entries[sheet_name] = None
+            continue
+
+        now = time.time()
+        entry = {"headers": headers, "df": df, "loaded_at": now, "used_at": now, "modified": modified, "derived": {}}
+        with _sheet_cache_lock:
+            previous = _sheet_cache.get(sheet_name)
+            # A atualização em segundo plano não conta como uso da aba
+            used_at = previous["used_at"] if quiet and previous is not None else now
+            if previous is not None and previous["headers"] == headers and previous["df"].equals(df):
+                previous.update(loaded_at=now, used_at=used_at, modified=modified)
+                entry = previous
+            # Se houve gravação durante a leitura, o resultado pode não conter a linha nova; não guarda
+            elif _sheet_generation.get(sheet_name, 0) == generation:
+                entry["used_at"] = used_at
+                _sheet_cache[sheet_name] = entry
+
+        if not rows and not quiet:
+            st.warning(f"A planilha '{sheet_name}' está vazia ou não contém cabeçalhos.")
+        entries[sheet_name] = entry
+    return entries
+
+
+def _spreadsheet_modified_time():
+    """modifiedTime da planilha no Drive, ou None se a consulta falhar (as abas são então relidas)."""
+    try:
+        return get_drive_service().files().get(
+            fileId=GDRIVE_SHEETS_ID, fields='modifiedTime'
+        ).execute().get('modifiedTime')
+    except Exception as e:
+        logging.warning(f"Não foi possível consultar a data de modificação da planilha: {e}")
+        return None
+
+
+class _SheetRefresher(threading.Thread):
+    """
+    Thread que mantém em dia as abas em uso (stale-while-revalidate). A cada
+    SHEET_REFRESH_INTERVAL_SECONDS, ou quando uma aba vencida é servida do cache, verifica as abas
+    usadas recentemente que estão a menos de SHEET_REFRESH_AHEAD_SECONDS de vencer: se o
+    modifiedTime da planilha no Drive não mudou desde a leitura, só renova o prazo; senão, relê
+    todas juntas (leitura incremental, ver load_sheets_values).
+    """
+
+    def __init__(self):
+        super().__init__(name="isf-sheet-refresher", daemon=True)
+        self._wake_event = threading.Event()
+        self._requested = set()
+        self._requested_lock = threading.Lock()
+
+    def request(self, sheet_names):
+        """Pede a atualização imediata das abas (ex.: vencidas e servidas do cache)."""
+        with self._requested_lock:
+            self._requested.update(sheet_names)
+        self._wake_event.set()
+
+    def run(self):
+        while True:
+            self._wake_event.wait(SHEET_REFRESH_INTERVAL_SECONDS)
+            self._wake_event.clear()
+            try:
+                self._refresh_due()
+            except Exception:
+                logging.exception("Erro ao atualizar as abas da planilha em segundo plano.")
+
+    def _refresh_due(self):
+        with self._requested_lock:
+            requested, self._requested = self._requested, set()
+        now = time.time()
+        with _sheet_cache_lock:
+            due = {
+                sheet_name: entry for sheet_name, entry in _sheet_cache.items()
+                if sheet_name in requested or (
+                    now - entry["used_at"] < SHEET_REFRESH_IDLE_SECONDS
+                    and now - entry["loaded_at"] >= SHEET_CACHE_TTL_SECONDS - SHEET_REFRESH_AHEAD_SECONDS
+                )
+            }
+        if not due:
+            return
+
+        modified = _spreadsheet_modified_time()
+        with _sheet_cache_lock:
+            generations = {}
+            for sheet_name, entry in due.items():
+                if _sheet_cache.get(sheet_name) is not entry:
+                    continue
+                if modified is not None and entry["modified"] == modified:
+                    # A planilha não mudou desde a leitura: o cache continua válido
+                    entry["loaded_at"] = time.time()
+                else:
+                    generations[sheet_name] = _sheet_generation.get(sheet_name, 0)
+        if generations:
+            _load_entries(generations, modified=modified, quiet=True)
+
+
+def ensure_refresher_started():
+    """Inicia (uma única vez por processo) a thread que atualiza as abas em segundo plano."""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = _SheetRefresher()
+            _refresher.start()
+    return _refresher
+
+
+def _get_sheet_entry(sheet_name):
+    """Entrada de cache de uma aba (ver _get_sheet_entries), ou None se a leitura falhar."""
+    return _get_sheet_entries([sheet_name])[sheet_name]
+
 
-@st.cache_data(ttl=600)
 def load_sheet_data(sheet_name):
     """
     Carrega dados de uma aba específica do Google Sheets e os converte em um DataFrame do Pandas.
     Esta é uma função de utilidade central.
+    A leitura é incremental: apenas as linhas novas desde a última carga são baixadas.
+    O resultado fica em cache por aba (SHEET_CACHE_TTL_SECONDS) e é atualizado em segundo plano
+    antes de vencer; gravações feitas pelo app são incluídas no cache localmente, sem nova
+    leitura da planilha.
     """
-    try:
-        uploader = GoogleDriveUploader()
-        data = uploader.get_data_from_sheet(sheet_name)
-        
-        if not data or len(data) < 2:
-            st.warning(f"A planilha '{sheet_name}' está vazia ou não contém cabeçalhos.")
-            return pd.DataFrame()
-            
-        headers = data[0]
-        rows = data[1:]
-        
-        # Garante que todas as linhas tenham o mesmo número de colunas do cabeçalho
-        num_columns = len(headers)
-        cleaned_rows = []
-        for row in rows:
-            # Completa a linha com 'None' se ela for mais curta que o cabeçalho
-            row.extend([None] * (num_columns - len(row)))
-            cleaned_rows.append(row[:num_columns])
+    entry = _get_sheet_entry(sheet_name)
+    if entry is None:
+        return pd.DataFrame()
+    return entry["df"].copy()
+
+
+def load_typed_sheet_data(sheet_name):
+    """
+    Igual a load_sheet_data, mas com as colunas já convertidas (gdrive/sheet_schemas.py):
+    datas como datetime, coordenadas como float, anos como inteiros e status como 'category'.
+    A conversão é feita uma única vez por versão dos dados da aba. Para leituras (painéis,
+    relatórios); para montar linhas que serão gravadas de volta, use load_sheet_data.
+    """
+    return _typed_frame(_get_sheet_entry(sheet_name), sheet_name)
+
+
+def _typed_frame(entry, sheet_name):
+    typed = _derived_value(entry, "tipado", lambda df: apply_sheet_schema(sheet_name, df))
+    return typed.copy()
+
+
+def load_sheet_columns(sheet_name, columns):
+    """
+    Carrega apenas as colunas informadas da aba, tipadas como em load_typed_sheet_data.
+    Se a aba inteira já estiver em cache, as colunas saem dele; senão, só elas são baixadas
+    (gdrive/sheet_columns.py), em vez do intervalo A:Z, e o resultado fica em cache até a
+    aba receber gravações ou passar SHEET_CACHE_TTL_SECONDS.
+    Colunas que não existem na aba ficam de fora do DataFrame.
+    """
+    key = (sheet_name, tuple(columns))
+    with _sheet_cache_lock:
+        entry = _sheet_cache.get(sheet_name)
+        if not (entry and time.time() - entry["loaded_at"] < SHEET_CACHE_TTL_SECONDS):
+            entry = None
+        generation = _sheet_generation.get(sheet_name, 0)
+        cached = _column_cache.get(key)
 
-        df = pd.DataFrame(cleaned_rows, columns=headers)
-        return df
+    if entry is not None:
+        typed = _typed_frame(entry, sheet_name)
+        return typed[[column for column in columns if column in typed.columns]]
+    if (
+        cached and cached["generation"] == generation
+        and time.time() - cached["loaded_at"] < SHEET_CACHE_TTL_SECONDS
+    ):
+        return cached["df"].copy()
 
+    try:
+        df = apply_sheet_schema(sheet_name, read_columns(sheet_name, columns, get_pending_rows(sheet_name)))
     except Exception as e:
         st.error(f"Erro ao carregar dados da planilha '{sheet_name}': {e}")
         return pd.DataFrame()
-        
 
-def find_last_record(df, search_value, column_name):
+    with _sheet_cache_lock:
+        if _sheet_generation.get(sheet_name, 0) == generation:
+            _column_cache[key] = {"df": df, "generation": generation, "loaded_at": time.time()}
+    return df.copy()
+
+
+def load_sheets_data(sheet_names, typed=False):
     """
-    Encontra o último registro e consolida as datas de vencimento de todo o histórico,
-    retornando tudo como strings formatadas ou None.
+    Carrega várias abas de uma vez e retorna {aba: DataFrame}.
+    As abas que não estão em cache são lidas juntas, em uma única chamada à planilha,
+    em vez de uma chamada por aba. Com 'typed', os DataFrames vêm como em load_typed_sheet_data.
     """
-    if df.empty or column_name not in df.columns:
-        return None
+    frames = {}
+    for sheet_name, entry in _get_sheet_entries(sheet_names).items():
+        if typed:
+            frames[sheet_name] = _typed_frame(entry, sheet_name)
+        else:
+            frames[sheet_name] = entry["df"].copy() if entry is not None else pd.DataFrame()
+    return frames
 
-    records = df[df[column_name].astype(str) == str(search_value)].copy()
-    if records.empty:
-        return None
 
-    # Lista de todas as colunas que podem conter datas
-    date_columns = [
-        'data_servico', 'data_proxima_inspecao', 'data_proxima_manutencao_2_nivel',
-        'data_proxima_manutencao_3_nivel', 'data_ultimo_ensaio_hidrostatico'
-    ]
-    
-    # Converte todas as colunas de data de uma vez, tratando erros
-    for col in date_columns:
-        if col in records.columns:
-            records[col] = pd.to_datetime(records[col], errors='coerce')
-
-    records.dropna(subset=['data_servico'], inplace=True)
-    if records.empty:
-        return None
+def prefetch_sheets(sheet_names):
+    """
+    Garante em cache as abas informadas, lendo as que faltam em uma única chamada à planilha.
+    Útil antes de várias chamadas a load_derived_data/load_sheet_data para abas diferentes.
+    """
+    _get_sheet_entries(sheet_names)
 
-    # Pega o último registro cronológico como um dicionário
-    latest_record_dict = records.sort_values(by='data_servico', ascending=False).iloc[0].to_dict()
 
-    # Varre todo o histórico para encontrar a data MÁXIMA de cada coluna de vencimento
-    last_valid_n2_date = records['data_proxima_manutencao_2_nivel'].max()
-    last_valid_n3_date = records['data_proxima_manutencao_3_nivel'].max()
-    last_valid_hydro_date = records['data_ultimo_ensaio_hidrostatico'].max()
+def load_derived_data(sheet_name, name, builder):
+    """
+    Retorna builder(df) da aba, calculado uma única vez e guardado junto ao DataFrame em cache.
+    O valor é recalculado quando a aba recebe linhas novas ou o cache é invalidado.
+    'builder' não deve modificar o DataFrame recebido, e o valor retornado é compartilhado
+    entre as chamadas: quem o usa deve tratá-lo como somente leitura.
+    """
+    return _derived_value(_get_sheet_entry(sheet_name), name, builder)
+
+
+def _derived_value(entry, name, builder):
+    if entry is None:
+        return builder(pd.DataFrame())
+
+    with _sheet_cache_lock:
+        df = entry["df"]
+        derived = entry["derived"]
+        value = derived.get(name)
 
-    # Sobrescreve as datas no dicionário final com os valores consolidados
-    latest_record_dict['data_proxima_manutencao_2_nivel'] = last_valid_n2_date
-    latest_record_dict['data_proxima_manutencao_3_nivel'] = last_valid_n3_date
-    latest_record_dict['data_ultimo_ensaio_hidrostatico'] = last_valid_hydro_date
+    if value is None:
+        value = builder(df)
+        with _sheet_cache_lock:
+            # Só guarda se a aba não mudou durante o cálculo
+            if entry["df"] is df:
+                entry["derived"][name] = value
+    return value
+
+
+def invalidate_sheet_cache(sheet_name=None):
+    """Descarta o cache de uma aba (ou de todas); a próxima leitura volta à planilha."""
+    with _sheet_cache_lock:
+        names = list(_sheet_cache) if sheet_name is None else [sheet_name]
+        for name in names:
+            _sheet_cache.pop(name, None)
+            _sheet_generation[name] = _sheet_generation.get(name, 0) + 1
+    invalidate_header_map(sheet_name)
+
+
+def patch_sheet_cache(sheet_name, rows):
+    """
+    Acrescenta ao DataFrame em cache as linhas recém-gravadas em uma aba.
+    Chamada pela fila de gravação; as demais abas permanecem em cache.
+    """
+    with _sheet_cache_lock:
+        _sheet_generation[sheet_name] = _sheet_generation.get(sheet_name, 0) + 1
+        entry = _sheet_cache.get(sheet_name)
+        if not entry:
+            return
+        if not entry["headers"]:
+            _sheet_cache.pop(sheet_name, None)
+            return
+        new_df = _rows_to_dataframe(entry["headers"], rows)
+        entry["df"] = new_df if entry["df"].empty else pd.concat([entry["df"], new_df], ignore_index=True)
+        entry["derived"] = {}
+
+
+add_enqueue_listener(patch_sheet_cache)
+        
+
+# Colunas de data normalizadas em consolidate_record; as três últimas são consolidadas
+# pelo valor máximo de todo o histórico do equipamento
+DATE_COLUMNS = [
+    'data_servico', 'data_proxima_inspecao', 'data_proxima_manutencao_2_nivel',
+    'data_proxima_manutencao_3_nivel', 'data_ultimo_ensaio_hidrostatico'
+]
+CONSOLIDATED_DATE_COLUMNS = [
+    'data_proxima_manutencao_2_nivel', 'data_proxima_manutencao_3_nivel', 'data_ultimo_ensaio_hidrostatico'
+]
+
+
+def consolidate_record(record, max_dates):
+    """
+    Aplica ao último registro de um equipamento as datas máximas do histórico ('max_dates',
+    por coluna consolidada) e devolve as datas como texto 'YYYY-MM-DD' e vazios como None.
+    """
+    record = dict(record)
+    for col in DATE_COLUMNS:
+        if col in record:
+            record[col] = pd.to_datetime(record[col], errors='coerce')
+    record.update(max_dates)
 
-    # --- CORREÇÃO APLICADA: Garante que todas as datas no dicionário de retorno sejam strings ---
-    for key, value in latest_record_dict.items():
+    # Garante que todas as datas no dicionário de retorno sejam strings
+    for field, value in record.items():
         if isinstance(value, pd.Timestamp):
-            # Formata o Timestamp para string 'YYYY-MM-DD'
-            latest_record_dict[key] = value.strftime('%Y-%m-%d')
+            record[field] = value.strftime('%Y-%m-%d')
         elif pd.isna(value):
-            # Garante que valores nulos (NaT) se tornem None
-            latest_record_dict[key] = None
-            
-    return latest_record_dict
+            record[field] = None
+    return record
@@ -0,0 +1,157 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import pandas as pd
+import streamlit as st
+from AI.api_Operation import PDFQA
+from AI.chunked_extraction import extract_json_chunked
+from AI.pdf_templates import extract_with_templates
+from gdrive.config import AI_EXTRACTION_MAX_WORKERS, DRIVE_UPLOAD_MAX_WORKERS
+from gdrive.gdrive_upload import upload_bytes
+from gdrive.google_clients import get_drive_service
+
+# Importação de PDFs em etapas paralelas: a extração pela IA e o upload para o Drive
+# começam juntos, em pools de threads com limite de concorrência (cotas do Gemini e do Drive).
+# Assim, o link do PDF já está pronto quando o usuário confirma os dados extraídos.
+
+_extraction_pool = ThreadPoolExecutor(max_workers=AI_EXTRACTION_MAX_WORKERS, thread_name_prefix="isf-ia")
+_upload_pool = ThreadPoolExecutor(max_workers=DRIVE_UPLOAD_MAX_WORKERS, thread_name_prefix="isf-drive")
+
+_pdf_qa = None
+_pdf_qa_lock = threading.Lock()
+
+
+def _get_pdf_qa():
+    # Criado na thread da página, pois load_api lê os secrets do Streamlit
+    global _pdf_qa
+    with _pdf_qa_lock:
+        if _pdf_qa is None:
+            _pdf_qa = PDFQA()
+        return _pdf_qa
+
+
+def _extract_list(pdf_qa, pdf_bytes, prompt, list_key, id_field, on_item):
+    # Layouts conhecidos são lidos localmente; os demais seguem para a IA em partes
+    data = extract_with_templates(pdf_bytes, list_key)
+    if data is not None:
+        for item in data[list_key]:
+            on_item(item)
+        return data
+    return extract_json_chunked(pdf_qa, pdf_bytes, prompt, list_key, id_field, on_item=on_item)
+
+
+def _upload_pdf(pdf_bytes, file_name):
+    return upload_bytes(get_drive_service(), pdf_bytes, file_name)
+
+
+class ImportJob:
+    """
+    Importação de um PDF: extração pela IA e upload para o Drive em andamento.
+
+    'upload_name' é uma função(nome_do_arquivo, dados_extraidos) -> nome do arquivo no Drive.
+    'upload_if' é opcional: função(dados_extraidos) -> bool que decide se o PDF deve ir ao Drive.
+    Se o nome usa os dados extraídos ('name_uses_data') ou há 'upload_if', o upload começa
+    assim que a extração termina; caso contrário, começa junto com a extração
+    (e 'upload_name' recebe None como dados).
+    'chunk_by' é opcional: (chave_da_lista, campo_de_id) para extrair relatórios grandes em
+    partes paralelas, unindo as listas sem repetir equipamentos. Com ele, layouts conhecidos
+    são lidos sem IA (AI/pdf_templates.py), a resposta da IA chega em streaming e os itens
+    já extraídos ficam disponíveis em get_preview_items().
+    """
+
+    def __init__(self, uploaded_file, prompt, upload_name, upload_if=None, name_uses_data=False, chunk_by=None):
+        self.file_name = uploaded_file.name
+        self.pdf_bytes = uploaded_file.getvalue()
+        self._upload_name = upload_name
+        self._upload_if = upload_if
+        self._id_field = chunk_by[1] if chunk_by is not None else None
+        self._preview_items = {}
+        self._preview_lock = threading.Lock()
+
+        if chunk_by is not None:
+            list_key, id_field = chunk_by
+            self._extraction = _extraction_pool.submit(
+                _extract_list, _get_pdf_qa(), self.pdf_bytes, prompt, list_key, id_field,
+                self._add_preview_item
+            )
+        else:
+            self._extraction = _extraction_pool.submit(_get_pdf_qa().extract_json, self.pdf_bytes, prompt)
+
+        if name_uses_data or upload_if is not None:
+            self._upload = Future()
+            self._extraction.add_done_callback(self._start_dependent_upload)
+        else:
+            self._upload = _upload_pool.submit(_upload_pdf, self.pdf_bytes, upload_name(self.file_name, None))
+
+    def _start_dependent_upload(self, extraction):
+        if extraction.exception() is not None:
+            self._upload.set_result(None)
+            return
+        data = extraction.result()
+        try:
+            if self._upload_if is not None and not self._upload_if(data):
+                self._upload.set_result(None)
+                return
+            name = self._upload_name(self.file_name, data)
+        except Exception as e:
+            self._upload.set_exception(e)
+            return
+
+        upload = _upload_pool.submit(_upload_pdf, self.pdf_bytes, name)
+        upload.add_done_callback(self._finish_dependent_upload)
+
+    def _finish_dependent_upload(self, upload):
+        if upload.exception() is not None:
+            self._upload.set_exception(upload.exception())
+        else:
+            self._upload.set_result(upload.result())
+
+    def _add_preview_item(self, item):
+        # Chamado pelas threads da IA; itens repetidos (mesmo ID) substituem o anterior
+        item_id = item.get(self._id_field) if isinstance(item, dict) else None
+        with self._preview_lock:
+            key = str(item_id) if item_id else len(self._preview_items)
+            self._preview_items[key] = item
+
+    def get_preview_items(self):
+        """Itens extraídos até agora (prévia, antes da validação do JSON completo)."""
+        with self._preview_lock:
+            return list(self._preview_items.values())
+
+    def is_extraction_done(self):
+        return self._extraction.done()
+
+    def get_extracted_data(self):
+        """Aguarda a extração e retorna o JSON extraído; repassa o erro da IA, se houver."""
+        return self._extraction.result()
+
+    def get_pdf_link(self):
+        """Aguarda o upload e retorna o link do PDF no Drive (None se o upload não era necessário)."""
+        return self._upload.result()
+
+
+def start_imports(uploaded_files, prompt, upload_name, upload_if=None, name_uses_data=False, chunk_by=None):
+    """
+    Inicia a importação de vários PDFs de uma vez; cada um vira um ImportJob.
+    Os PDFs são processados em paralelo, respeitando os limites de cada pool.
+    """
+    return [
+        ImportJob(uploaded_file, prompt, upload_name, upload_if, name_uses_data, chunk_by)
+        for uploaded_file in uploaded_files
+    ]
+
+
+def wait_for_imports(jobs, poll_seconds=0.5):
+    """
+    Aguarda a extração de todos os PDFs, exibindo na página uma prévia dos
+    equipamentos à medida que a IA os devolve.
+    """
+    preview = st.empty()
+    while not all(job.is_extraction_done() for job in jobs):
+        items = [item for job in jobs for item in job.get_preview_items()]
+        if items:
+            with preview.container():
+                st.caption(f"{len(items)} equipamento(s) extraído(s) até agora...")
+                st.dataframe(pd.DataFrame(items), use_container_width=True)
+        time.sleep(poll_seconds)
+    preview.empty()
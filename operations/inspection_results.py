@@ -0,0 +1,73 @@
+import json
+import pandas as pd
+from operations.history import load_derived_data
+
+# Tabela "longa" com o conteúdo da coluna resultados_json: uma linha por item inspecionado.
+# 'linha' é o índice da inspeção no DataFrame da aba; 'categoria' é None para itens sem
+# agrupamento (ex.: itens do inventário de um abrigo).
+RESULT_COLUMNS = ['linha', 'id_equipamento', 'data_inspecao', 'categoria', 'item', 'status', 'observacao']
+
+
+def _result_record(linha, equipment_id, inspection_date, category, item, details):
+    if isinstance(details, dict):
+        status = details.get('status', 'N/A')
+        observation = details.get('observacao', '')
+    else:
+        status = details
+        observation = ''
+    return (linha, equipment_id, inspection_date, category, item, status, observation)
+
+
+def parse_inspection_results(df, id_column, json_column='resultados_json', date_column='data_inspecao'):
+    """
+    Converte a coluna de resultados (JSON) de uma aba de inspeções em uma tabela longa.
+    Aceita os dois formatos gravados pelo app:
+    - {item: {"status": ..., "observacao": ...}} (abrigos), com categoria None;
+    - {categoria: {item: status}} (SCBA e "Condições Gerais" dos abrigos).
+    Linhas com JSON inválido ou vazio não geram registros.
+    """
+    if df.empty or json_column not in df.columns or id_column not in df.columns:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    dates = df[date_column] if date_column in df.columns else pd.Series(None, index=df.index)
+    records = []
+    for linha, equipment_id, inspection_date, raw in zip(df.index, df[id_column], dates, df[json_column]):
+        try:
+            results = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if not isinstance(results, dict):
+            continue
+
+        for key, value in results.items():
+            if isinstance(value, dict) and 'status' not in value:
+                for item, details in value.items():
+                    records.append(_result_record(linha, equipment_id, inspection_date, key, item, details))
+            else:
+                records.append(_result_record(linha, equipment_id, inspection_date, None, key, value))
+
+    return pd.DataFrame(records, columns=RESULT_COLUMNS)
+
+
+def load_inspection_results(sheet_name, id_column):
+    """
+    Retorna a tabela longa de resultados da aba, analisada uma única vez por versão dos dados
+    e mantida em cache junto ao DataFrame da aba.
+    """
+    return load_derived_data(
+        sheet_name,
+        f"resultados:{id_column}",
+        lambda df: parse_inspection_results(df, id_column)
+    )
+
+
+def index_results_by_row(results):
+    """Agrupa a tabela longa por inspeção: {linha: DataFrame com os itens daquela inspeção}."""
+    if results.empty:
+        return {}
+    return {linha: group for linha, group in results.groupby('linha', sort=False)}
+
+
+def has_unreadable_results(raw):
+    """Indica se um resultados_json não vazio ficou sem itens na tabela (formato inválido)."""
+    return isinstance(raw, str) and raw.strip() not in ('', '{}')
@@ -0,0 +1,111 @@
+import os
+import re
+import sqlite3
+import threading
+import pandas as pd
+from gdrive.config import LOCAL_REPLICA_DB_PATH
+from gdrive.sheet_schemas import apply_sheet_schema
+from operations.history import load_derived_data, prefetch_sheets
+
+# Réplica local (SQLite) das abas da planilha, para filtros e junções com SQL.
+# Cada aba vira uma tabela com o mesmo nome (ex.: extintores, log_acoes, locais), com as colunas
+# convertidas pelos tipos de gdrive/sheet_schemas.py (datas como TIMESTAMP), índices nas colunas de identificação e de data, e a coluna
+# 'linha' com a posição da linha no DataFrame da aba. As tabelas são sincronizadas sob demanda,
+# a partir do cache em memória de load_sheet_data: nada é baixado de novo da planilha, e
+# gravações feitas pelo app entram na réplica como linhas acrescentadas.
+
+ID_COLUMNS = {
+    'id', 'numero_identificacao', 'id_mangueira', 'id_abrigo', 'numero_serie_equipamento',
+    'id_equipamento', 'numero_serie_cilindro'
+}
+
+_connection = None
+_replica_lock = threading.Lock()
+_synced_frames = {}
+
+
+def table_name(sheet_name):
+    """Nome da tabela da réplica para uma aba."""
+    return re.sub(r'\W', '_', sheet_name)
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(LOCAL_REPLICA_DB_PATH), exist_ok=True)
+        _connection = sqlite3.connect(LOCAL_REPLICA_DB_PATH, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+    return _connection
+
+
+def _typed_frame(sheet_name, df):
+    """Prepara o DataFrame para a tabela: remove colunas sem nome ou repetidas e converte os tipos."""
+    df = df.loc[:, [bool(column) for column in df.columns]]
+    df = df.loc[:, ~df.columns.duplicated()]
+    return apply_sheet_schema(sheet_name, df)
+
+
+def _create_indexes(conn, table, columns):
+    for column in columns:
+        if column in ID_COLUMNS or column.startswith('data_'):
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+
+
+def _sync_table(conn, sheet_name, df):
+    """
+    Atualiza a tabela da aba. Se o DataFrame só ganhou linhas no final (gravações do app),
+    acrescenta apenas as novas; caso contrário, recria a tabela.
+    """
+    if df.columns.empty:
+        # Aba sem cabeçalho ou falha na leitura: mantém a tabela como estava
+        return True
+    table = table_name(sheet_name)
+    previous = _synced_frames.get(sheet_name)
+    if (
+        previous is not None and len(df) > len(previous)
+        and list(df.columns) == list(previous.columns)
+        and df.iloc[:len(previous)].equals(previous)
+    ):
+        _typed_frame(sheet_name, df.iloc[len(previous):]).to_sql(table, conn, if_exists='append', index=True, index_label='linha')
+    else:
+        typed = _typed_frame(sheet_name, df)
+        typed.to_sql(table, conn, if_exists='replace', index=True, index_label='linha')
+        _create_indexes(conn, table, typed.columns)
+    conn.commit()
+    _synced_frames[sheet_name] = df
+    return True
+
+
+def query_replica(sql, sheet_names, params=()):
+    """
+    Executa uma consulta SQL na réplica e retorna um DataFrame.
+    'sheet_names' são as abas usadas na consulta; elas são sincronizadas antes, apenas
+    quando os dados em cache mudaram desde a última sincronização.
+    Erros de SQL (ex.: coluna inexistente em uma aba vazia) são repassados para quem chamou.
+    """
+    with _replica_lock:
+        conn = _connect()
+        prefetch_sheets(sheet_names)
+        for sheet_name in sheet_names:
+            load_derived_data(sheet_name, "replica_sqlite", lambda df, name=sheet_name: _sync_table(conn, name, df))
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def query_frames(sql, frames, params=()):
+    """
+    Executa a consulta SQL sobre os DataFrames informados ({aba: DataFrame}), carregados em um
+    banco SQLite temporário, em memória, com as mesmas tabelas, tipos e colunas da réplica.
+    Para dados lidos sob demanda (ex.: anos arquivados), que não devem ocupar a réplica.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        for sheet_name, df in frames.items():
+            if df.columns.empty:
+                continue
+            typed = _typed_frame(sheet_name, df)
+            typed.to_sql(table_name(sheet_name), conn, index=True, index_label='linha')
+            _create_indexes(conn, table_name(sheet_name), typed.columns)
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
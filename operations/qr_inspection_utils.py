@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-import pandas as pd
 
 def decode_qr_from_image(image_file):
     """
@@ -51,23 +50,3 @@ def decode_qr_from_image(image_file):
             
     except Exception:
         return None, None
-
-def find_last_record_from_history(df_history, search_value, column_name):
-    """
-    Função genérica para encontrar o último registro em um DataFrame de histórico.
-    """
-    if df_history.empty or column_name not in df_history.columns: 
-        return None
-        
-    records = df_history[df_history[column_name].astype(str) == str(search_value)].copy()
-    
-    if records.empty: 
-        return None
-        
-    records['data_servico'] = pd.to_datetime(records['data_servico'], errors='coerce')
-    records.dropna(subset=['data_servico'], inplace=True)
-    
-    if records.empty: 
-        return None
-        
-    return records.sort_values(by='data_servico', ascending=False).iloc[0].to_dict()
@@ -2,38 +2,41 @@ import streamlit as st
 import json
 from datetime import date
 from dateutil.relativedelta import relativedelta
-from gdrive.gdrive_upload import GoogleDriveUploader
+from utils.save_action import enqueue_rows_checked
 from gdrive.config import SCBA_SHEET_NAME, SCBA_VISUAL_INSPECTIONS_SHEET_NAME, LOG_SCBA_SHEET_NAME
 
+def build_scba_inspection_row(record, pdf_link, user_name):
+    """
+    Monta a linha da aba de conjuntos autônomos para um teste Posi3.
+    """
+    return [
+        record.get('data_teste'),
+        record.get('data_validade'),
+        record.get('numero_serie_equipamento'),
+        record.get('marca'),
+        record.get('modelo'),
+        record.get('numero_serie_mascara'),
+        record.get('numero_serie_segundo_estagio'),
+        record.get('resultado_final'),
+        record.get('vazamento_mascara_resultado'),
+        record.get('vazamento_mascara_valor'),
+        record.get('vazamento_pressao_alta_resultado'),
+        record.get('vazamento_pressao_alta_valor'),
+        record.get('pressao_alarme_resultado'),
+        record.get('pressao_alarme_valor'),
+        pdf_link,
+        user_name,
+        record.get('empresa_executante'),
+        record.get('responsavel_tecnico')
+    ]
+
+
 def save_scba_inspection(record, pdf_link, user_name):
     """
     Salva um novo registro de inspeção de conjunto autônomo na planilha.
     """
     try:
-        uploader = GoogleDriveUploader()
-        
-        data_row = [
-            record.get('data_teste'),
-            record.get('data_validade'),
-            record.get('numero_serie_equipamento'),
-            record.get('marca'),
-            record.get('modelo'),
-            record.get('numero_serie_mascara'),
-            record.get('numero_serie_segundo_estagio'),
-            record.get('resultado_final'),
-            record.get('vazamento_mascara_resultado'),
-            record.get('vazamento_mascara_valor'),
-            record.get('vazamento_pressao_alta_resultado'),
-            record.get('vazamento_pressao_alta_valor'),
-            record.get('pressao_alarme_resultado'),
-            record.get('pressao_alarme_valor'),
-            pdf_link,
-            user_name,
-            record.get('empresa_executante'),
-            record.get('responsavel_tecnico')
-        ]
-        
-        uploader.append_data_to_sheet(SCBA_SHEET_NAME, data_row)
+        enqueue_rows_checked(SCBA_SHEET_NAME, [build_scba_inspection_row(record, pdf_link, user_name)])
         return True
 
     except Exception as e:
@@ -41,12 +44,55 @@ def save_scba_inspection(record, pdf_link, user_name):
         return False
 
 
+def save_scba_inspections(records, pdf_link, user_name):
+    """
+    Salva os testes de VÁRIOS conjuntos autônomos do mesmo relatório com uma única chamada em lote.
+    """
+    if not records:
+        return True
+    try:
+        data_rows = [build_scba_inspection_row(record, pdf_link, user_name) for record in records]
+        enqueue_rows_checked(SCBA_SHEET_NAME, data_rows)
+        return True
+
+    except Exception as e:
+        st.error(f"Erro ao salvar o lote de {len(records)} testes de SCBA: {e}")
+        return False
+
+
+def save_air_quality_report(report, pdf_link):
+    """
+    Registra um laudo de qualidade do ar para todos os cilindros citados, em uma única chamada em lote.
+    As colunas do teste Posi3 ficam vazias; apenas o número de série e as colunas do laudo são preenchidos.
+    """
+    cilindros = report.get('cilindros', [])
+    if not cilindros:
+        return False
+    try:
+        data_rows = []
+        for cilindro_sn in cilindros:
+            data_row = [None] * 18
+            data_row[2] = cilindro_sn # Coluna C: numero_serie_equipamento
+            data_row.extend([
+                report.get('data_ensaio'),
+                report.get('resultado_geral'),
+                report.get('observacoes'),
+                pdf_link
+            ])
+            data_rows.append(data_row)
+        enqueue_rows_checked(SCBA_SHEET_NAME, data_rows)
+        return True
+
+    except Exception as e:
+        st.error(f"Erro ao registrar o laudo de qualidade do ar: {e}")
+        return False
+
+
 def save_scba_visual_inspection(equipment_id, overall_status, results_dict, inspector_name):
     """
     Salva o resultado de uma inspeção visual periódica de SCBA na planilha.
     """
     try:
-        uploader = GoogleDriveUploader()
         today = date.today()
         next_inspection_date = (today + relativedelta(months=3)).isoformat()
         
@@ -61,7 +107,7 @@ def save_scba_visual_inspection(equipment_id, overall_status, results_dict, insp
             next_inspection_date
         ]
         
-        uploader.append_data_to_sheet(SCBA_VISUAL_INSPECTIONS_SHEET_NAME, data_row)
+        enqueue_rows_checked(SCBA_VISUAL_INSPECTIONS_SHEET_NAME, [data_row])
         return True
     except Exception as e:
         st.error(f"Erro ao salvar inspeção visual do SCBA {equipment_id}: {e}")
@@ -72,7 +118,6 @@ def save_scba_action_log(equipment_id, problem, action_taken, responsible):
     Salva um registro de ação corretiva para um SCBA no log.
     """
     try:
-        uploader = GoogleDriveUploader()
         data_row = [
             date.today().isoformat(),
             equipment_id,
@@ -80,7 +125,7 @@ def save_scba_action_log(equipment_id, problem, action_taken, responsible):
             action_taken,
             responsible
         ]
-        uploader.append_data_to_sheet(LOG_SCBA_SHEET_NAME, data_row)
+        enqueue_rows_checked(LOG_SCBA_SHEET_NAME, [data_row])
         return True
     except Exception as e:
         st.error(f"Erro ao salvar log de ação para o SCBA {equipment_id}: {e}")
@@ -1,6 +1,6 @@
 import streamlit as st
 import json
-from gdrive.gdrive_upload import GoogleDriveUploader
+from utils.save_action import enqueue_rows_checked
 from gdrive.config import SHELTER_SHEET_NAME, INSPECTIONS_SHELTER_SHEET_NAME, LOG_SHELTER_SHEET_NAME
 from datetime import date 
 from dateutil.relativedelta import relativedelta 
@@ -11,21 +11,42 @@ def save_shelter_inventory(shelter_id, client, local, items_dict):
     Converte o dicionário de itens em uma string JSON para armazenamento.
     """
     try:
-        uploader = GoogleDriveUploader()
         items_json_string = json.dumps(items_dict, ensure_ascii=False)
         data_row = [shelter_id, client, local, items_json_string]
-        uploader.append_data_to_sheet(SHELTER_SHEET_NAME, data_row)
+        enqueue_rows_checked(SHELTER_SHEET_NAME, [data_row])
         return True
     except Exception as e:
         st.error(f"Erro ao salvar inventário do abrigo {shelter_id}: {e}")
         return False
 
+def save_shelter_inventories(records):
+    """
+    Salva o inventário de VÁRIOS abrigos extraídos do mesmo documento com uma única chamada em lote.
+    Cada registro deve conter 'id_abrigo', 'cliente', 'local' e 'itens'.
+    """
+    if not records:
+        return True
+    try:
+        data_rows = [
+            [
+                record.get('id_abrigo'),
+                record.get('cliente'),
+                record.get('local'),
+                json.dumps(record.get('itens', {}), ensure_ascii=False)
+            ]
+            for record in records
+        ]
+        enqueue_rows_checked(SHELTER_SHEET_NAME, data_rows)
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar o lote de {len(records)} abrigos: {e}")
+        return False
+
 def save_shelter_inspection(shelter_id, overall_status, inspection_results, inspector_name):
     """
     Salva o resultado de uma inspeção de abrigo e calcula a próxima data de inspeção.
     """
     try:
-        uploader = GoogleDriveUploader()
         today = date.today()
         next_inspection_date = (today + relativedelta(months=3)).isoformat()
         results_json_string = json.dumps(inspection_results, ensure_ascii=False)
@@ -37,7 +58,7 @@ def save_shelter_inspection(shelter_id, overall_status, inspection_results, insp
             inspector_name,
             next_inspection_date
         ]
-        uploader.append_data_to_sheet(INSPECTIONS_SHELTER_SHEET_NAME, data_row)
+        enqueue_rows_checked(INSPECTIONS_SHELTER_SHEET_NAME, [data_row])
         return True
     except Exception as e:
         st.error(f"Erro ao salvar inspeção do abrigo {shelter_id}: {e}")
@@ -48,7 +69,6 @@ def save_shelter_action_log(shelter_id, problem, action_taken, responsible):
     Salva um registro de ação corretiva para um abrigo no log.
     """
     try:
-        uploader = GoogleDriveUploader()
         data_row = [
             date.today().isoformat(),
             shelter_id,
@@ -56,7 +76,7 @@ def save_shelter_action_log(shelter_id, problem, action_taken, responsible):
             action_taken,
             responsible
         ]
-        uploader.append_data_to_sheet(LOG_SHELTER_SHEET_NAME, data_row)
+        enqueue_rows_checked(LOG_SHELTER_SHEET_NAME, [data_row])
         return True
     except Exception as e:
         st.error(f"Erro ao salvar log de ação para o abrigo {shelter_id}: {e}")
@@ -8,12 +8,16 @@ from streamlit_js_eval import streamlit_js_eval
 # Adiciona o diretório raiz ao path para encontrar os outros módulos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from operations.extinguisher_operations import (
-    process_extinguisher_pdf, calculate_next_dates, save_inspection, generate_action_plan, clean_and_prepare_ia_data
+    calculate_next_dates, save_inspection, save_inspections, generate_action_plan, clean_and_prepare_ia_data,
+    extinguishers_from_extraction, extraction_has_maintenance, MAINTENANCE_SERVICE_LEVELS
 )
-from operations.history import load_sheet_data, find_last_record
+from operations.import_pipeline import start_imports, wait_for_imports
+from utils.prompts import get_extinguisher_inspection_prompt
+from operations.current_status import lookup_current_record
+from utils.save_action import save_action
+from gdrive.config import EXTINGUISHER_SHEET_NAME
 from operations.qr_inspection_utils import decode_qr_from_image
 from operations.photo_operations import upload_evidence_photo
-from gdrive.gdrive_upload import GoogleDriveUploader
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import is_admin, can_edit, can_view, get_user_display_name 
 from operations.demo_page import show_demo_page
@@ -29,22 +33,44 @@ def main_inspection_page():
         st.header("Processar Relatório de Inspeção/Manutenção")
         st.session_state.setdefault('batch_step', 'start')
         st.session_state.setdefault('processed_data', None)
-        st.session_state.setdefault('uploaded_pdf_file', None)
+        st.session_state.setdefault('processed_sources', None)
+        st.session_state.setdefault('uploaded_pdf_files', None)
+        st.session_state.setdefault('import_jobs', None)
+        st.session_state.setdefault('import_failures', None)
 
-        st.subheader("1. Faça o Upload do Relatório")
-        st.info("O sistema analisará o PDF, buscará o histórico de cada equipamento e atualizará as datas de vencimento conforme o serviço realizado.")
+        st.subheader("1. Faça o Upload dos Relatórios")
+        st.info("O sistema analisará os PDFs, buscará o histórico de cada equipamento e atualizará as datas de vencimento conforme o serviço realizado.")
         
-        uploaded_pdf = st.file_uploader("Escolha o relatório PDF", type=["pdf"], key="batch_pdf_uploader")
-        if uploaded_pdf: 
-            st.session_state.uploaded_pdf_file = uploaded_pdf
+        uploaded_pdfs = st.file_uploader("Escolha os relatórios PDF", type=["pdf"], key="batch_pdf_uploader", accept_multiple_files=True)
+        if uploaded_pdfs: 
+            st.session_state.uploaded_pdf_files = uploaded_pdfs
         
-        if st.session_state.uploaded_pdf_file and st.button("🔎 Analisar Dados do PDF com IA"):
-            with st.spinner("Analisando o documento e cruzando com histórico..."):
-                extracted_list = process_extinguisher_pdf(st.session_state.uploaded_pdf_file)
-                if extracted_list:
-                    
-                    df_history = load_sheet_data("extintores")
-                    processed_list = []
+        if st.session_state.uploaded_pdf_files and st.button("🔎 Analisar Dados do PDF com IA"):
+            with st.spinner("Analisando os documentos e cruzando com histórico..."):
+                # Extração e upload (quando houver manutenção N2/N3) correm em paralelo, em segundo plano
+                jobs = start_imports(
+                    st.session_state.uploaded_pdf_files,
+                    get_extinguisher_inspection_prompt(),
+                    upload_name=lambda file_name, data: f"Relatorio_Manutencao_{date.today().isoformat()}_{file_name}",
+                    upload_if=extraction_has_maintenance,
+                    chunk_by=("extintores", "numero_identificacao")
+                )
+                wait_for_imports(jobs)
+
+                processed_list = []
+                processed_sources = []
+                failures = []
+                for job_index, job in enumerate(jobs):
+                    try:
+                        extracted_data = job.get_extracted_data()
+                    except Exception as e:
+                        failures.append(f"Erro ao processar '{job.file_name}' com a IA: {e}")
+                        continue
+
+                    extracted_list = extinguishers_from_extraction(extracted_data)
+                    if not extracted_list:
+                        failures.append(f"Nenhum extintor encontrado em '{job.file_name}'.")
+                        continue
                     
                     for item in extracted_list:
                         
@@ -54,7 +80,7 @@ def main_inspection_page():
                             service_level = item.get('tipo_servico', 'Inspeção')
                             ext_id = item.get('numero_identificacao')
                             
-                            last_record = find_last_record(df_history, ext_id, 'numero_identificacao')
+                            last_record = lookup_current_record(EXTINGUISHER_SHEET_NAME, ext_id)
                             
                             existing_dates = {}
                             if last_record:
@@ -77,41 +103,53 @@ def main_inspection_page():
                             final_item['plano_de_acao'] = generate_action_plan(final_item)
 
                             processed_list.append(final_item)
+                            processed_sources.append(job_index)
 
+                if processed_list:
                     st.session_state.processed_data = processed_list
+                    st.session_state.processed_sources = processed_sources
+                    st.session_state.import_jobs = jobs
+                    st.session_state.import_failures = failures
                     st.session_state.batch_step = 'confirm'
                     st.rerun()
                 else: 
-                    st.error("Não foi possível extrair dados do arquivo.")
+                    for message in failures:
+                        st.error(message)
+                    st.error("Não foi possível extrair dados dos arquivos.")
         
         if st.session_state.batch_step == 'confirm' and st.session_state.processed_data:
             st.subheader("2. Confira os Dados e Confirme o Registro")
+            # Arquivos que falharam na análise ficam listados até o lote ser salvo
+            for message in st.session_state.import_failures or []:
+                st.warning(f"Arquivo não importado: {message}")
             st.dataframe(pd.DataFrame(st.session_state.processed_data))
             if st.button("💾 Confirmar e Salvar no Sistema", type="primary"):
                 with st.spinner("Salvando..."):
-                    pdf_link = None
-                    if any(rec.get('tipo_servico') in ["Manutenção Nível 2", "Manutenção Nível 3"] for rec in st.session_state.processed_data):
-                        st.session_state.uploaded_pdf_file.seek(0)
-                        uploader = GoogleDriveUploader()
-                        pdf_name = f"Relatorio_Manutencao_{date.today().isoformat()}_{st.session_state.uploaded_pdf_file.name}"
-                        pdf_link = uploader.upload_file(st.session_state.uploaded_pdf_file, novo_nome=pdf_name)
-                    
-                    progress_bar = st.progress(0, "Salvando registros...")
-                    total_count = len(st.session_state.processed_data)
-                    for i, record in enumerate(st.session_state.processed_data):
-                        if record.get('tipo_servico') in ["Manutenção Nível 2", "Manutenção Nível 3"]:
-                            record['link_relatorio_pdf'] = pdf_link
+                    jobs = st.session_state.import_jobs
+                    for record, job_index in zip(st.session_state.processed_data, st.session_state.processed_sources):
+                        if record.get('tipo_servico') in MAINTENANCE_SERVICE_LEVELS:
+                            # O upload começou durante a análise; normalmente o link já está pronto
+                            try:
+                                record['link_relatorio_pdf'] = jobs[job_index].get_pdf_link()
+                            except Exception as e:
+                                st.error(f"Erro ao fazer upload de '{jobs[job_index].file_name}': {e}")
+                                st.stop()
                         else:
                             record['link_relatorio_pdf'] = None
-                        save_inspection(record)
-                        progress_bar.progress((i + 1) / total_count)
+                    
+                    with save_action("extinguisher_batch"):
+                        saved = save_inspections(st.session_state.processed_data)
+                    if not saved:
+                        st.stop()
                     
                     st.success("Registros salvos com sucesso!")
                     st.balloons()
                     st.session_state.batch_step = 'start'
                     st.session_state.processed_data = None
-                    st.session_state.uploaded_pdf_file = None
-                    st.cache_data.clear()
+                    st.session_state.processed_sources = None
+                    st.session_state.uploaded_pdf_files = None
+                    st.session_state.import_jobs = None
+                    st.session_state.import_failures = None
                     st.rerun()
 
     with tab_qr:
@@ -165,7 +203,7 @@ def main_inspection_page():
                 if st.button("🔍 Buscar por ID", use_container_width=True, disabled=not location):
                     if manual_id:
                         st.session_state.qr_id = manual_id
-                        st.session_state.last_record = find_last_record(load_sheet_data("extintores"), manual_id, 'numero_identificacao')
+                        st.session_state.last_record = lookup_current_record(EXTINGUISHER_SHEET_NAME, manual_id)
                         st.session_state.qr_step = 'inspect'
                         st.rerun()
                     else:
@@ -184,7 +222,7 @@ def main_inspection_page():
                     decoded_id, _ = decode_qr_from_image(qr_image)
                     if decoded_id:
                         st.session_state.qr_id = decoded_id
-                        st.session_state.last_record = find_last_record(load_sheet_data("extintores"), decoded_id, 'numero_identificacao')
+                        st.session_state.last_record = lookup_current_record(EXTINGUISHER_SHEET_NAME, decoded_id)
                         st.session_state.qr_step = 'inspect'
                         st.rerun()
                     else:
@@ -281,12 +319,13 @@ def main_inspection_page():
                             
                             new_record.update(updated_dates)
                             
-                            if save_inspection(new_record):
+                            with save_action("extinguisher_qr"):
+                                saved = save_inspection(new_record)
+                            if saved:
                                 st.success("Inspeção registrada!")
                                 st.balloons()
                                 st.session_state.qr_step = 'start'
                                 st.session_state.location = None
-                                st.cache_data.clear()
                                 st.rerun()
             else:
                 st.error(f"Nenhum registro encontrado para o ID '{st.session_state.qr_id}'.")
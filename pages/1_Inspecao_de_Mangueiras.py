@@ -9,9 +9,10 @@ import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Imports necessários para o novo fluxo
-from operations.hose_operations import save_hose_inspection
-from operations.shelter_operations import save_shelter_inventory, save_shelter_inspection
-from gdrive.gdrive_upload import GoogleDriveUploader
+from operations.hose_operations import save_hose_inspections
+from operations.import_pipeline import start_imports, wait_for_imports
+from operations.shelter_operations import save_shelter_inventories, save_shelter_inspection
+from utils.save_action import save_action
 from AI.api_Operation import PDFQA
 from gdrive.config import SHELTER_SHEET_NAME
 from operations.history import load_sheet_data 
@@ -38,56 +39,88 @@ def show_hose_and_shelter_page():
         
         st.session_state.setdefault('hose_step', 'start')
         st.session_state.setdefault('hose_processed_data', None)
-        st.session_state.setdefault('hose_uploaded_pdf', None)
+        st.session_state.setdefault('hose_uploaded_pdfs', None)
+        st.session_state.setdefault('hose_import_batches', None)
+        st.session_state.setdefault('hose_import_failures', None)
 
-        st.subheader("1. Faça o Upload do Certificado de Teste")
-        st.info("O sistema analisará o PDF, extrairá os dados de todas as mangueiras e preparará os registros para salvamento.")
+        st.subheader("1. Faça o Upload dos Certificados de Teste")
+        st.info("O sistema analisará os PDFs, extrairá os dados de todas as mangueiras e preparará os registros para salvamento.")
         
-        uploaded_pdf = st.file_uploader("Escolha o certificado PDF", type=["pdf"], key="hose_pdf_uploader")
-        if uploaded_pdf:
-            st.session_state.hose_uploaded_pdf = uploaded_pdf
+        uploaded_pdfs = st.file_uploader("Escolha os certificados PDF", type=["pdf"], key="hose_pdf_uploader", accept_multiple_files=True)
+        if uploaded_pdfs:
+            st.session_state.hose_uploaded_pdfs = uploaded_pdfs
         
-        if st.session_state.hose_uploaded_pdf and st.button("🔎 Analisar Certificado com IA"):
-            with st.spinner("Analisando o documento..."):
-                prompt = get_hose_inspection_prompt()
-                extracted_data = pdf_qa.extract_structured_data(st.session_state.hose_uploaded_pdf, prompt)
-                
-                if extracted_data and "mangueiras" in extracted_data and isinstance(extracted_data["mangueiras"], list):
-                    st.session_state.hose_processed_data = extracted_data["mangueiras"]
+        if st.session_state.hose_uploaded_pdfs and st.button("🔎 Analisar Certificado com IA"):
+            with st.spinner("Analisando os documentos..."):
+                # O upload de cada certificado para o Drive começa junto com a extração pela IA
+                jobs = start_imports(
+                    st.session_state.hose_uploaded_pdfs,
+                    get_hose_inspection_prompt(),
+                    upload_name=lambda file_name, data: f"Certificado_Mangueiras_{date.today().isoformat()}_{file_name}",
+                    chunk_by=("mangueiras", "id_mangueira")
+                )
+                wait_for_imports(jobs)
+
+                batches = []
+                failures = []
+                for job in jobs:
+                    try:
+                        extracted_data = job.get_extracted_data()
+                    except Exception as e:
+                        failures.append(f"Erro ao processar '{job.file_name}' com a IA: {e}")
+                        continue
+
+                    if extracted_data and "mangueiras" in extracted_data and isinstance(extracted_data["mangueiras"], list):
+                        batches.append((job, extracted_data["mangueiras"]))
+                    else:
+                        failures.append(f"A IA não conseguiu extrair os dados de '{job.file_name}' no formato esperado. Verifique o documento.")
+                        st.json(extracted_data)
+
+                if batches:
+                    st.session_state.hose_import_batches = batches
+                    st.session_state.hose_processed_data = [record for _, records in batches for record in records]
+                    st.session_state.hose_import_failures = failures
                     st.session_state.hose_step = 'confirm'
                     st.rerun()
-                else:
-                    st.error("A IA não conseguiu extrair os dados no formato esperado. Verifique o documento.")
-                    st.json(extracted_data)
+                for message in failures:
+                    st.error(message)
         
         if st.session_state.hose_step == 'confirm' and st.session_state.hose_processed_data:
             st.subheader("2. Confira os Dados Extraídos e Salve no Sistema")
+            # Arquivos que falharam na análise ficam listados até o lote ser salvo
+            for message in st.session_state.hose_import_failures or []:
+                st.warning(f"Arquivo não importado: {message}")
             st.dataframe(pd.DataFrame(st.session_state.hose_processed_data))
             
             if st.button("💾 Confirmar e Salvar Registros", type="primary", use_container_width=True):
                 with st.spinner("Salvando registros..."):
-                    uploader = GoogleDriveUploader()
-                    pdf_name = f"Certificado_Mangueiras_{date.today().isoformat()}_{st.session_state.hose_uploaded_pdf.name}"
-                    pdf_link = uploader.upload_file(st.session_state.hose_uploaded_pdf, novo_nome=pdf_name)
-                    
-                    if not pdf_link:
+                    # Confere todos os uploads antes de gravar, para não salvar apenas parte dos certificados
+                    pdf_links = []
+                    for job, _ in st.session_state.hose_import_batches:
+                        try:
+                            pdf_links.append(job.get_pdf_link())
+                        except Exception as e:
+                            st.error(f"Erro ao fazer upload do arquivo '{job.file_name}': {e}")
+                            pdf_links.append(None)
+
+                    if not all(pdf_links):
                         st.error("Falha ao fazer o upload do certificado. Os dados não foram salvos.")
                         st.stop()
+
+                    with save_action("hose_batch"):
+                        for (_, records), pdf_link in zip(st.session_state.hose_import_batches, pdf_links):
+                            if not save_hose_inspections(records, pdf_link=pdf_link, user_name=get_user_display_name()):
+                                st.stop()
                     
                     total_count = len(st.session_state.hose_processed_data)
-                    progress_bar = st.progress(0, "Salvando...")
-                    
-                    for i, record in enumerate(st.session_state.hose_processed_data):
-                        save_hose_inspection(record=record, pdf_link=pdf_link, user_name=get_user_display_name())
-                        progress_bar.progress((i + 1) / total_count)
-                    
                     st.success(f"{total_count} registros de mangueiras salvos com sucesso!")
                     st.balloons()
                     
                     st.session_state.hose_step = 'start'
                     st.session_state.hose_processed_data = None
-                    st.session_state.hose_uploaded_pdf = None
-                    st.cache_data.clear()
+                    st.session_state.hose_uploaded_pdfs = None
+                    st.session_state.hose_import_batches = None
+                    st.session_state.hose_import_failures = None
                     st.rerun()
 
     with tab_shelters:
@@ -132,16 +165,11 @@ def show_hose_and_shelter_page():
             if st.button("💾 Confirmar e Salvar Abrigos", type="primary", use_container_width=True):
                 with st.spinner("Salvando registros dos abrigos..."):
                     total_count = len(st.session_state.shelter_processed_data)
-                    progress_bar = st.progress(0, "Salvando...")
                     
-                    for i, record in enumerate(st.session_state.shelter_processed_data):
-                        save_shelter_inventory(
-                            shelter_id=record.get('id_abrigo'),
-                            client=record.get('cliente'),
-                            local=record.get('local'),
-                            items_dict=record.get('itens', {})
-                        )
-                        progress_bar.progress((i + 1) / total_count)
+                    with save_action("shelter_inventory"):
+                        saved = save_shelter_inventories(st.session_state.shelter_processed_data)
+                    if not saved:
+                        st.stop()
                     
                     st.success(f"{total_count} abrigos salvos com sucesso!")
                     st.balloons()
@@ -150,7 +178,6 @@ def show_hose_and_shelter_page():
                     st.session_state.shelter_step = 'start'
                     st.session_state.shelter_processed_data = None
                     st.session_state.shelter_uploaded_pdf = None
-                    st.cache_data.clear()
                     st.rerun()
 
     with tab_shelters_insp:
@@ -212,10 +239,11 @@ def show_hose_and_shelter_page():
                     if submitted:
                         overall_status = "Reprovado com Pendências" if has_issues else "Aprovado"
                         with st.spinner("Salvando resultado da inspeção..."):
-                            if save_shelter_inspection(selected_shelter_id, overall_status, inspection_results, get_user_display_name()):
+                            with save_action("shelter_inspection"):
+                                saved = save_shelter_inspection(selected_shelter_id, overall_status, inspection_results, get_user_display_name())
+                            if saved:
                                 st.success(f"Inspeção do abrigo '{selected_shelter_id}' salva com sucesso como '{overall_status}'!")
                                 #st.balloons() if not has_issues else None
-                                st.cache_data.clear()
                             else:
                                 st.error("Ocorreu um erro ao salvar a inspeção.")
                                 
@@ -7,7 +7,9 @@ from config.page_config import set_page_config
 set_page_config()
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from operations.history import load_sheet_data
+from operations.history import load_sheet_data, invalidate_sheet_cache
+from operations.archive import load_sheet_history, list_archive_years
+from gdrive.sheet_snapshot import reset_sheet_snapshot
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import is_admin, can_edit, can_view, get_user_display_name 
 from operations.demo_page import show_demo_page
@@ -62,7 +64,16 @@ def format_dataframe_for_display(df, sheet_name):
 
 def display_formatted_dataframe(sheet_name):
     """Função helper para carregar, formatar e exibir um DataFrame com links clicáveis."""
-    df = load_sheet_data(sheet_name)
+    archive_years = list_archive_years(sheet_name)
+    since_year = None
+    if archive_years:
+        # Os anos arquivados só são baixados quando o usuário pede por eles
+        since_year = st.selectbox(
+            "Incluir registros arquivados desde:", [None] + archive_years[::-1],
+            format_func=lambda year: "Apenas anos recentes" if year is None else str(year),
+            key=f"arquivo_{sheet_name}"
+        )
+    df = load_sheet_data(sheet_name) if since_year is None else load_sheet_history(sheet_name, since_year=since_year)
     
     if df.empty:
         st.info("Nenhum registro encontrado.")
@@ -90,6 +101,8 @@ def show_history_page():
     
     if st.button("Limpar Cache e Recarregar Dados"):
         st.cache_data.clear()
+        invalidate_sheet_cache()
+        reset_sheet_snapshot()
         st.rerun()
 
     tab_registros, tab_logs = st.tabs(["📜 Histórico de Registros", "📖 Logs de Ações Corretivas"])
@@ -6,9 +6,9 @@ from datetime import date
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from operations.scba_operations import save_scba_inspection, save_scba_visual_inspection
-from gdrive.gdrive_upload import GoogleDriveUploader
-from AI.api_Operation import PDFQA
+from operations.scba_operations import save_scba_inspections, save_scba_visual_inspection, save_air_quality_report
+from operations.import_pipeline import ImportJob, start_imports, wait_for_imports
+from utils.save_action import save_action
 from utils.prompts import get_scba_inspection_prompt, get_air_quality_prompt 
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import is_admin, can_edit, can_view, get_user_display_name 
@@ -19,7 +19,6 @@ from gdrive.config import SCBA_SHEET_NAME, SCBA_VISUAL_INSPECTIONS_SHEET_NAME
 
 
 set_page_config()
-pdf_qa = PDFQA()
 
 def show_scba_inspection_page():
     st.title("💨 Inspeção de Conjuntos Autônomos (SCBA)")
@@ -33,55 +32,87 @@ def show_scba_inspection_page():
         st.header("Registrar Teste de SCBA com IA")
         st.session_state.setdefault('scba_step', 'start')
         st.session_state.setdefault('scba_processed_data', None)
-        st.session_state.setdefault('scba_uploaded_pdf', None)
+        st.session_state.setdefault('scba_uploaded_pdfs', None)
+        st.session_state.setdefault('scba_import_batches', None)
+        st.session_state.setdefault('scba_import_failures', None)
         
-        st.subheader("1. Faça o Upload do Relatório de Teste Posi3")
-        st.info("O sistema analisará o PDF, extrairá os dados de todos os equipamentos listados e preparará os registros para salvamento.")
+        st.subheader("1. Faça o Upload dos Relatórios de Teste Posi3")
+        st.info("O sistema analisará os PDFs, extrairá os dados de todos os equipamentos listados e preparará os registros para salvamento.")
         
-        uploaded_pdf = st.file_uploader("Escolha o relatório PDF", type=["pdf"], key="scba_pdf_uploader")
-        if uploaded_pdf:
-            st.session_state.scba_uploaded_pdf = uploaded_pdf
+        uploaded_pdfs = st.file_uploader("Escolha os relatórios PDF", type=["pdf"], key="scba_pdf_uploader", accept_multiple_files=True)
+        if uploaded_pdfs:
+            st.session_state.scba_uploaded_pdfs = uploaded_pdfs
         
-        if st.session_state.scba_uploaded_pdf and st.button("🔎 Analisar Relatório com IA"):
-            with st.spinner("Analisando o documento com IA..."):
-                prompt = get_scba_inspection_prompt()
-                extracted_data = pdf_qa.extract_structured_data(st.session_state.scba_uploaded_pdf, prompt)
-                
-                if extracted_data and "scbas" in extracted_data and isinstance(extracted_data["scbas"], list):
-                    st.session_state.scba_processed_data = extracted_data["scbas"]
+        if st.session_state.scba_uploaded_pdfs and st.button("🔎 Analisar Relatório com IA"):
+            with st.spinner("Analisando os documentos com IA..."):
+                # O upload de cada relatório para o Drive começa junto com a extração pela IA
+                jobs = start_imports(
+                    st.session_state.scba_uploaded_pdfs,
+                    get_scba_inspection_prompt(),
+                    upload_name=lambda file_name, data: f"Relatorio_SCBA_{date.today().isoformat()}_{file_name}",
+                    chunk_by=("scbas", "numero_serie_equipamento")
+                )
+                wait_for_imports(jobs)
+
+                batches = []
+                failures = []
+                for job in jobs:
+                    try:
+                        extracted_data = job.get_extracted_data()
+                    except Exception as e:
+                        failures.append(f"Erro ao processar '{job.file_name}' com a IA: {e}")
+                        continue
+
+                    if extracted_data and "scbas" in extracted_data and isinstance(extracted_data["scbas"], list):
+                        batches.append((job, extracted_data["scbas"]))
+                    else:
+                        failures.append(f"A IA não conseguiu extrair os dados de '{job.file_name}' no formato esperado. Verifique o documento.")
+                        st.json(extracted_data)
+
+                if batches:
+                    st.session_state.scba_import_batches = batches
+                    st.session_state.scba_processed_data = [record for _, records in batches for record in records]
+                    st.session_state.scba_import_failures = failures
                     st.session_state.scba_step = 'confirm'
                     st.rerun()
-                else:
-                    st.error("A IA não conseguiu extrair os dados no formato esperado. Verifique o documento.")
-                    st.json(extracted_data)
+                for message in failures:
+                    st.error(message)
         
         if st.session_state.scba_step == 'confirm' and st.session_state.scba_processed_data:
             st.subheader("2. Confira os Dados Extraídos e Salve no Sistema")
+            # Arquivos que falharam na análise ficam listados até o lote ser salvo
+            for message in st.session_state.scba_import_failures or []:
+                st.warning(f"Arquivo não importado: {message}")
             st.dataframe(pd.DataFrame(st.session_state.scba_processed_data))
             
             if st.button("💾 Confirmar e Salvar Registros", type="primary", use_container_width=True):
                 with st.spinner("Salvando registros..."):
-                    uploader = GoogleDriveUploader()
-                    pdf_name = f"Relatorio_SCBA_{date.today().isoformat()}_{st.session_state.scba_uploaded_pdf.name}"
-                    pdf_link = uploader.upload_file(st.session_state.scba_uploaded_pdf, novo_nome=pdf_name)
-                    
-                    if not pdf_link:
+                    # Confere todos os uploads antes de gravar, para não salvar apenas parte dos relatórios
+                    pdf_links = []
+                    for job, _ in st.session_state.scba_import_batches:
+                        try:
+                            pdf_links.append(job.get_pdf_link())
+                        except Exception as e:
+                            st.error(f"Erro ao fazer upload do arquivo '{job.file_name}': {e}")
+                            pdf_links.append(None)
+
+                    if not all(pdf_links):
                         st.error("Falha ao fazer o upload do relatório. Os dados não foram salvos.")
                         st.stop()
+
+                    with save_action("scba_batch"):
+                        for (_, records), pdf_link in zip(st.session_state.scba_import_batches, pdf_links):
+                            if not save_scba_inspections(records, pdf_link=pdf_link, user_name=get_user_display_name()):
+                                st.stop()
                     
                     total_count = len(st.session_state.scba_processed_data)
-                    progress_bar = st.progress(0, "Salvando...")
-                    
-                    for i, record in enumerate(st.session_state.scba_processed_data):
-                        save_scba_inspection(record=record, pdf_link=pdf_link, user_name=get_user_display_name())
-                        progress_bar.progress((i + 1) / total_count)
-                    
                     st.success(f"{total_count} registros de SCBA salvos com sucesso!")
                     
                     st.session_state.scba_step = 'start'
                     st.session_state.scba_processed_data = None
-                    st.session_state.scba_uploaded_pdf = None
-                    st.cache_data.clear()
+                    st.session_state.scba_uploaded_pdfs = None
+                    st.session_state.scba_import_batches = None
+                    st.session_state.scba_import_failures = None
                     st.rerun()
 
 
@@ -91,7 +122,7 @@ def show_scba_inspection_page():
         st.session_state.setdefault('airq_step', 'start')
         st.session_state.setdefault('airq_processed_data', None)
         st.session_state.setdefault('airq_uploaded_pdf', None)
-        uploader = GoogleDriveUploader()
+        st.session_state.setdefault('airq_import_job', None)
 
         st.subheader("1. Faça o Upload do Laudo PDF")
         st.info("A IA analisará o laudo, extrairá os dados e criará um registro para cada cilindro mencionado.")
@@ -102,9 +133,21 @@ def show_scba_inspection_page():
         
         if st.session_state.airq_uploaded_pdf and st.button("🔎 Analisar Laudo de Ar com IA"):
             with st.spinner("Analisando o laudo com IA..."):
-                prompt = get_air_quality_prompt()
-                extracted_data = pdf_qa.extract_structured_data(st.session_state.airq_uploaded_pdf, prompt)
+                # O nome do arquivo no Drive usa a data do ensaio: o upload começa assim que a IA termina
+                job = ImportJob(
+                    st.session_state.airq_uploaded_pdf,
+                    get_air_quality_prompt(),
+                    upload_name=lambda file_name, data: f"Laudo_Ar_{data.get('laudo', {}).get('data_ensaio')}_{file_name}",
+                    name_uses_data=True
+                )
+                try:
+                    extracted_data = job.get_extracted_data()
+                except Exception as e:
+                    st.error(f"Erro ao processar o laudo com a IA: {e}")
+                    extracted_data = None
+
                 if extracted_data and "laudo" in extracted_data:
+                    st.session_state.airq_import_job = job
                     st.session_state.airq_processed_data = extracted_data["laudo"]
                     st.session_state.airq_step = 'confirm'
                     st.rerun()
@@ -120,33 +163,27 @@ def show_scba_inspection_page():
             
             if st.button("💾 Confirmar e Registrar Laudo", type="primary", use_container_width=True):
                 with st.spinner("Processando e salvando..."):
-                    pdf_name = f"Laudo_Ar_{data.get('data_ensaio')}_{st.session_state.airq_uploaded_pdf.name}"
-                    pdf_link = uploader.upload_file(st.session_state.airq_uploaded_pdf, novo_nome=pdf_name)
+                    try:
+                        pdf_link = st.session_state.airq_import_job.get_pdf_link()
+                    except Exception as e:
+                        st.error(f"Erro ao fazer upload do laudo: {e}")
+                        pdf_link = None
                     
                     if pdf_link:
                         cilindros = data.get('cilindros', [])
                         if not cilindros:
                             st.error("Não é possível salvar, pois nenhum cilindro foi identificado no laudo.")
                         else:
-                            for cilindro_sn in cilindros:
-                                data_row = [None] * 18
-                                data_row[2] = cilindro_sn # Coluna C: numero_serie_equipamento
+                            with save_action("air_quality"):
+                                saved = save_air_quality_report(data, pdf_link)
+                            if saved:
+                                st.success(f"Laudo de qualidade do ar registrado com sucesso para {len(cilindros)} cilindros!")
                                 
-                                data_row.extend([
-                                    data.get('data_ensaio'),
-                                    data.get('resultado_geral'),
-                                    data.get('observacoes'),
-                                    pdf_link 
-                                ])
-                                uploader.append_data_to_sheet(SCBA_SHEET_NAME, data_row)
-                            
-                            st.success(f"Laudo de qualidade do ar registrado com sucesso para {len(cilindros)} cilindros!")
-                            
-                            st.session_state.airq_step = 'start'
-                            st.session_state.airq_processed_data = None
-                            st.session_state.airq_uploaded_pdf = None
-                            st.cache_data.clear()
-                            st.rerun()
+                                st.session_state.airq_step = 'start'
+                                st.session_state.airq_processed_data = None
+                                st.session_state.airq_uploaded_pdf = None
+                                st.session_state.airq_import_job = None
+                                st.rerun()
                     else:
                         st.error("Falha no upload do PDF para o Google Drive. Nenhum dado foi salvo.")
 
@@ -239,9 +276,10 @@ def show_scba_inspection_page():
                     if submitted:
                         overall_status = "Reprovado com Pendências" if has_issues else "Aprovado"
                         with st.spinner("Salvando inspeção..."):
-                            if save_scba_visual_inspection(selected_scba_id, overall_status, results, get_user_display_name()):
+                            with save_action("scba_visual_inspection"):
+                                saved = save_scba_visual_inspection(selected_scba_id, overall_status, results, get_user_display_name())
+                            if saved:
                                 st.success(f"Inspeção periódica para o SCBA '{selected_scba_id}' salva com sucesso!")
-                                st.cache_data.clear()
                             else:
                                 st.error("Ocorreu um erro ao salvar a inspeção.")
 
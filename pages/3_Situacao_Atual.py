@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from dateutil.relativedelta import relativedelta
 import sys
 import os
 import numpy as np
@@ -9,12 +8,16 @@ import json
 from streamlit_js_eval import streamlit_js_eval
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from operations.history import load_sheet_data, find_last_record
+from operations.history import load_sheet_data, load_sheets_data, invalidate_sheet_cache
+from operations.current_status import load_current_status, lookup_current_record, invalidate_current_status
+from gdrive.sheet_snapshot import reset_sheet_snapshot
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import is_admin, can_edit, can_view, get_user_display_name 
 from operations.demo_page import show_demo_page
+from operations.dashboard_status import extinguisher_status, latest_shelter_inspections, STATUS_OUT_OF_SERVICE
+from operations.inspection_results import load_inspection_results, index_results_by_row, has_unreadable_results
 from config.page_config import set_page_config 
-from gdrive.config import HOSE_SHEET_NAME, SHELTER_SHEET_NAME, INSPECTIONS_SHELTER_SHEET_NAME, LOG_SHELTER_SHEET_NAME, SCBA_SHEET_NAME, SCBA_VISUAL_INSPECTIONS_SHEET_NAME
+from gdrive.config import EXTINGUISHER_SHEET_NAME, HOSE_SHEET_NAME, SHELTER_SHEET_NAME, INSPECTIONS_SHELTER_SHEET_NAME, LOG_SHELTER_SHEET_NAME, SCBA_SHEET_NAME, SCBA_VISUAL_INSPECTIONS_SHEET_NAME
 from reports.reports_pdf import generate_shelters_html
 from operations.shelter_operations import save_shelter_action_log, save_shelter_inspection
 from operations.corrective_actions import save_corrective_action
@@ -22,6 +25,7 @@ from reports.reports_pdf import generate_shelters_html
 from operations.photo_operations import upload_evidence_photo
 from reports.monthly_report_ui import show_monthly_report_interface
 from operations.scba_operations import save_scba_visual_inspection, save_scba_action_log
+from utils.save_action import save_action
 
 set_page_config()
 
@@ -36,17 +40,17 @@ def get_scba_status_df(df_scba_main, df_scba_visual):
     latest_tests = equipment_tests.sort_values('data_teste', ascending=False).drop_duplicates(subset='numero_serie_equipamento', keep='first')
     
     if not df_scba_visual.empty:
-        df_scba_visual['data_inspecao'] = pd.to_datetime(df_scba_visual['data_inspecao'], errors='coerce')
         latest_visual = df_scba_visual.sort_values('data_inspecao', ascending=False).drop_duplicates(subset='numero_serie_equipamento', keep='first')
+        latest_visual = latest_visual.rename_axis('linha_origem').reset_index()
         dashboard_df = pd.merge(latest_tests, latest_visual, on='numero_serie_equipamento', how='left', suffixes=('_teste', '_visual'))
     else:
         dashboard_df = latest_tests
-        for col in ['data_inspecao', 'data_proxima_inspecao', 'status_geral', 'resultados_json']:
+        for col in ['data_inspecao', 'data_proxima_inspecao', 'status_geral', 'resultados_json', 'linha_origem']:
             dashboard_df[col] = None
 
     today = pd.Timestamp(date.today())
-    dashboard_df['data_validade'] = pd.to_datetime(dashboard_df['data_validade'], errors='coerce')
-    dashboard_df['data_proxima_inspecao'] = pd.to_datetime(dashboard_df['data_proxima_inspecao'], errors='coerce')
+    # Sem inspeção visual, a coluna vem vazia (None); com ela, já chega como datetime
+    dashboard_df['data_proxima_inspecao'] = pd.to_datetime(dashboard_df['data_proxima_inspecao'])
     
     conditions = [
         (dashboard_df['data_validade'] < today),
@@ -65,7 +69,6 @@ def get_hose_status_df(df_hoses):
     for col in ['data_inspecao', 'data_proximo_teste']:
         if col not in df_hoses.columns:
             df_hoses[col] = pd.NaT
-        df_hoses[col] = pd.to_datetime(df_hoses[col], errors='coerce')
 
     df_hoses = df_hoses.sort_values('data_inspecao', ascending=False).drop_duplicates(subset='id_mangueira', keep='first').copy()
     
@@ -87,38 +90,20 @@ def get_hose_status_df(df_hoses):
 
 
 
-def get_shelter_status_df(df_shelters_registered, df_inspections):
+def get_shelter_status_df(df_shelters_registered, df_inspections, latest_inspections=None):
     if df_shelters_registered.empty:
         return pd.DataFrame()
 
-    latest_inspections_list = []
-    if not df_inspections.empty:
-        df_inspections['data_inspecao'] = pd.to_datetime(df_inspections['data_inspecao'], errors='coerce').dt.date
-
-        for shelter_id in df_shelters_registered['id_abrigo'].unique():
-            shelter_inspections = df_inspections[df_inspections['id_abrigo'] == shelter_id].copy()
-            if not shelter_inspections.empty:
-                shelter_inspections = shelter_inspections.sort_values(by='data_inspecao', ascending=False)
-                
-        
-                latest_date = shelter_inspections['data_inspecao'].iloc[0]
-                inspections_on_latest_date = shelter_inspections[shelter_inspections['data_inspecao'] == latest_date]
-                
-                approved_on_latest = inspections_on_latest_date[inspections_on_latest_date['status_geral'] != 'Reprovado com Pendências']
-                
-                if not approved_on_latest.empty:
-                    latest_inspections_list.append(approved_on_latest.iloc[0])
-                else:
-                    latest_inspections_list.append(inspections_on_latest_date.iloc[0])
-
-    latest_inspections = pd.DataFrame(latest_inspections_list)
+    if latest_inspections is None:
+        latest_inspections = latest_shelter_inspections(df_inspections)
 
     if not latest_inspections.empty:
+        latest_inspections = latest_inspections.rename_axis('linha_origem').reset_index()
         dashboard_df = pd.merge(df_shelters_registered[['id_abrigo', 'cliente', 'local']], latest_inspections, on='id_abrigo', how='left')
     else:
 
         dashboard_df = df_shelters_registered.copy()
-        for col in ['data_inspecao', 'data_proxima_inspecao', 'status_geral', 'inspetor', 'resultados_json']:
+        for col in ['data_inspecao', 'data_proxima_inspecao', 'status_geral', 'inspetor', 'resultados_json', 'linha_origem']:
             dashboard_df[col] = None
 
     today = pd.to_datetime(date.today()).date()
@@ -137,72 +122,37 @@ def get_shelter_status_df(df_shelters_registered, df_inspections):
     dashboard_df['inspetor'] = dashboard_df['inspetor'].fillna('N/A')
     dashboard_df['resultados_json'] = dashboard_df['resultados_json'].fillna('{}')
 
-    display_columns = ['id_abrigo', 'status_dashboard', 'data_inspecao_str', 'data_proxima_inspecao_str', 'status_geral', 'inspetor', 'resultados_json', 'local']
+    display_columns = ['id_abrigo', 'status_dashboard', 'data_inspecao_str', 'data_proxima_inspecao_str', 'status_geral', 'inspetor', 'resultados_json', 'linha_origem', 'local']
     existing_columns = [col for col in display_columns if col in dashboard_df.columns]
     
     return dashboard_df[existing_columns]
 
 
-def get_consolidated_status_df(df_full, df_locais):
-    if df_full.empty: 
+def get_consolidated_status_df(df_status, df_locais):
+    summary = extinguisher_status(df_status)
+    if summary.empty:
         return pd.DataFrame()
-    
-    consolidated_data = []
-    df_copy = df_full.copy()
-    df_copy['data_servico'] = pd.to_datetime(df_copy['data_servico'], errors='coerce')
-    df_copy = df_copy.dropna(subset=['data_servico'])
-    
-    unique_ids = df_copy['numero_identificacao'].unique()
 
-    for ext_id in unique_ids:
-        ext_df = df_copy[df_copy['numero_identificacao'] == ext_id].sort_values(by='data_servico')
-        if ext_df.empty: 
-            continue
-        
-        latest_record_info = ext_df.iloc[-1]
-        
-        last_insp_date = ext_df['data_servico'].max()
-        last_maint2_date = ext_df[ext_df['tipo_servico'] == 'Manutenção Nível 2']['data_servico'].max()
-        last_maint3_date = ext_df[ext_df['tipo_servico'] == 'Manutenção Nível 3']['data_servico'].max()
-        
-        next_insp = (last_insp_date + relativedelta(months=1)) if pd.notna(last_insp_date) else pd.NaT
-        next_maint2 = (last_maint2_date + relativedelta(months=12)) if pd.notna(last_maint2_date) else pd.NaT
-        next_maint3 = (last_maint3_date + relativedelta(years=5)) if pd.notna(last_maint3_date) else pd.NaT
-        
-        vencimentos = [d for d in [next_insp, next_maint2, next_maint3] if pd.notna(d)]
-        if not vencimentos: 
-            continue
-        proximo_vencimento_real = min(vencimentos)
-        
-        today_ts = pd.Timestamp(date.today())
-        status_atual = "OK"
-        
-        if latest_record_info.get('plano_de_acao') == "FORA DE OPERAÇÃO (SUBSTITUÍDO)":
-            status_atual = "FORA DE OPERAÇÃO"
-        elif latest_record_info.get('aprovado_inspecao') == 'Não': 
-            status_atual = "NÃO CONFORME (Aguardando Ação)"
-        elif proximo_vencimento_real < today_ts: 
-            status_atual = "VENCIDO"
-
-        if status_atual == "FORA DE OPERAÇÃO":
-            continue
-
-        consolidated_data.append({
-            'numero_identificacao': ext_id,
-            'numero_selo_inmetro': latest_record_info.get('numero_selo_inmetro'),
-            'tipo_agente': latest_record_info.get('tipo_agente'),
-            'status_atual': status_atual,
-            'proximo_vencimento_geral': proximo_vencimento_real.strftime('%d/%m/%Y'),
-            'prox_venc_inspecao': next_insp.strftime('%d/%m/%Y') if pd.notna(next_insp) else "N/A",
-            'prox_venc_maint2': next_maint2.strftime('%d/%m/%Y') if pd.notna(next_maint2) else "N/A",
-            'prox_venc_maint3': next_maint3.strftime('%d/%m/%Y') if pd.notna(next_maint3) else "N/A",
-            'plano_de_acao': latest_record_info.get('plano_de_acao'),
-        })
-
-    if not consolidated_data:
+    summary = summary[summary['status_atual'] != STATUS_OUT_OF_SERVICE]
+    if summary.empty:
         return pd.DataFrame()
 
-    dashboard_df = pd.DataFrame(consolidated_data)
+    def format_date(series):
+        return series.dt.strftime('%d/%m/%Y').fillna("N/A")
+
+    consolidated_data = {
+        'numero_identificacao': summary['numero_identificacao'],
+        'numero_selo_inmetro': summary.get('numero_selo_inmetro'),
+        'tipo_agente': summary.get('tipo_agente'),
+        'status_atual': summary['status_atual'],
+        'proximo_vencimento_geral': format_date(summary['venc_geral']),
+        'prox_venc_inspecao': format_date(summary['venc_inspecao']),
+        'prox_venc_maint2': format_date(summary['venc_manutencao_2']),
+        'prox_venc_maint3': format_date(summary['venc_manutencao_3']),
+        'plano_de_acao': summary['plano_de_acao'],
+    }
+
+    dashboard_df = pd.DataFrame(consolidated_data).reset_index(drop=True)
     if not df_locais.empty:
         df_locais = df_locais.rename(columns={'id': 'numero_identificacao'})
         df_locais['numero_identificacao'] = df_locais['numero_identificacao'].astype(str)
@@ -223,11 +173,11 @@ def action_dialog_scba(equipment_id, problem):
     if st.button("Salvar Ação e Regularizar", type="primary"):
         if not action_taken: st.error("Por favor, descreva a ação."); return
         with st.spinner("Registrando..."):
-            save_scba_action_log(equipment_id, problem, action_taken, responsible)
-            results = {"Info": {"Status": "Regularizado via Ação Corretiva", "Ação": action_taken}}
-            save_scba_visual_inspection(equipment_id, "Aprovado", results, get_user_display_name())
+            with save_action("scba_action"):
+                save_scba_action_log(equipment_id, problem, action_taken, responsible)
+                results = {"Info": {"Status": "Regularizado via Ação Corretiva", "Ação": action_taken}}
+                save_scba_visual_inspection(equipment_id, "Aprovado", results, get_user_display_name())
             st.success("Ação registrada e status regularizado!")
-            st.cache_data.clear()
             st.rerun()
 
 
@@ -247,50 +197,50 @@ def action_dialog_shelter(shelter_id, problem):
             return
 
         with st.spinner("Registrando ação e regularizando status..."):
-            log_saved = save_shelter_action_log(shelter_id, problem, action_taken, responsible)
+            with save_action("shelter_action"):
+                log_saved = save_shelter_action_log(shelter_id, problem, action_taken, responsible)
             
-            if not log_saved:
-                st.error("Falha ao salvar o log da ação. O status não foi atualizado.")
-                return
+                if not log_saved:
+                    st.error("Falha ao salvar o log da ação. O status não foi atualizado.")
+                    return
 
             
-            df_shelters = load_sheet_data(SHELTER_SHEET_NAME)
-            shelter_inventory_row = df_shelters[df_shelters['id_abrigo'] == shelter_id]
+                df_shelters = load_sheet_data(SHELTER_SHEET_NAME)
+                shelter_inventory_row = df_shelters[df_shelters['id_abrigo'] == shelter_id]
             
-            if shelter_inventory_row.empty:
-                st.error(f"Não foi possível encontrar o inventário original para o abrigo {shelter_id}. A regularização falhou.")
-                return
+                if shelter_inventory_row.empty:
+                    st.error(f"Não foi possível encontrar o inventário original para o abrigo {shelter_id}. A regularização falhou.")
+                    return
 
-            try:
-                items_dict = json.loads(shelter_inventory_row.iloc[0]['itens_json'])
+                try:
+                    items_dict = json.loads(shelter_inventory_row.iloc[0]['itens_json'])
                 
-                inspection_results = {item: {"status": "OK", "observacao": "Regularizado via ação corretiva"} for item in items_dict}
+                    inspection_results = {item: {"status": "OK", "observacao": "Regularizado via ação corretiva"} for item in items_dict}
                 
-                inspection_results["Condições Gerais"] = {
-                    "Lacre": "Sim", "Sinalização": "Sim", "Acesso": "Sim"
-                }
+                    inspection_results["Condições Gerais"] = {
+                        "Lacre": "Sim", "Sinalização": "Sim", "Acesso": "Sim"
+                    }
                 
-            except (json.JSONDecodeError, TypeError):
-                st.error(f"O inventário do abrigo {shelter_id} está corrompido na planilha. A regularização falhou.")
-                return
-
-            inspection_saved = save_shelter_inspection(
-                shelter_id=shelter_id,
-                overall_status="Aprovado",
-                inspection_results=inspection_results,
-                inspector_name=get_user_display_name()
-            )
+                except (json.JSONDecodeError, TypeError):
+                    st.error(f"O inventário do abrigo {shelter_id} está corrompido na planilha. A regularização falhou.")
+                    return
+
+                inspection_saved = save_shelter_inspection(
+                    shelter_id=shelter_id,
+                    overall_status="Aprovado",
+                    inspection_results=inspection_results,
+                    inspector_name=get_user_display_name()
+                )
             
             if inspection_saved:
                 st.success("Plano de ação registrado e status do abrigo regularizado com sucesso!")
-                st.cache_data.clear()
                 st.rerun()
             else:
                 st.error("Log salvo, mas falha ao registrar a nova inspeção de regularização. O status pode continuar pendente.")
 
 
 @st.dialog("Registrar Ação Corretiva")
-def action_form(item, df_full_history, location):
+def action_form(item, location):
     st.write(f"**Equipamento ID:** `{item['numero_identificacao']}`")
     st.write(f"**Problema Identificado:** `{item['plano_de_acao']}`")
     
@@ -321,7 +271,7 @@ def action_form(item, df_full_history, location):
             st.error("Por favor, descreva a ação realizada.")
             return
 
-        original_record = find_last_record(df_full_history, item['numero_identificacao'], 'numero_identificacao')
+        original_record = lookup_current_record(EXTINGUISHER_SHEET_NAME, item['numero_identificacao'])
         if id_substituto:
             df_locais = load_sheet_data("locais")
             if not df_locais.empty:
@@ -343,7 +293,7 @@ def action_form(item, df_full_history, location):
 
             substitute_last_record = {}
             if id_substituto:
-                substitute_last_record = find_last_record(df_full_history, id_substituto, 'numero_identificacao') or {}
+                substitute_last_record = lookup_current_record(EXTINGUISHER_SHEET_NAME, id_substituto) or {}
                 if not substitute_last_record:
                     st.info(f"Aviso: Equipamento substituto com ID '{id_substituto}' não tem histórico. Será criado um novo registro.")
 
@@ -355,9 +305,10 @@ def action_form(item, df_full_history, location):
                 'photo_link': photo_link_evidence
             }
             
-            if save_corrective_action(original_record, substitute_last_record, action_details, get_user_display_name()):
+            with save_action("extinguisher_corrective_action"):
+                saved = save_corrective_action(original_record, substitute_last_record, action_details, get_user_display_name())
+            if saved:
                 st.success("Ação corretiva registrada com sucesso!")
-                st.cache_data.clear() 
                 st.rerun()
             else:
                 st.error("Falha ao registrar a ação.")
@@ -367,6 +318,9 @@ def show_dashboard_page():
       
     if st.button("Limpar Cache e Recarregar Dados"):
         st.cache_data.clear()
+        invalidate_sheet_cache()
+        invalidate_current_status()
+        reset_sheet_snapshot()
         st.rerun()
 
     tab_extinguishers, tab_hoses, tab_shelters, tab_scba = st.tabs(["🔥 Extintores", "💧 Mangueiras", "🧯 Abrigos", "💨 C. Autônomo"])
@@ -387,14 +341,15 @@ def show_dashboard_page():
             show_monthly_report_interface()
         st.markdown("---")
         
-        df_full_history = load_sheet_data("extintores")
-        df_locais = load_sheet_data("locais") 
+        # Status atual (uma linha por extintor), sem carregar todo o histórico
+        df_status = load_current_status(EXTINGUISHER_SHEET_NAME)
+        df_locais = load_sheet_data("locais")
 
-        if df_full_history.empty:
+        if df_status.empty:
             st.warning("Ainda não há registros de inspeção para exibir."); return
 
         with st.spinner("Analisando o status de todos os extintores..."):
-            dashboard_df = get_consolidated_status_df(df_full_history, df_locais)
+            dashboard_df = get_consolidated_status_df(df_status, df_locais)
         
         if dashboard_df.empty:
             st.warning("Não foi possível gerar o dashboard ou não há equipamentos ativos."); return
@@ -435,14 +390,14 @@ def show_dashboard_page():
                     if row['status_atual'] != 'OK':
                         st.markdown("---")
                         if st.button("✍️ Registrar Ação Corretiva", key=f"action_{row['numero_identificacao']}", use_container_width=True):
-                            action_form(row.to_dict(), df_full_history, location)
+                            action_form(row.to_dict(), location)
                             
                            
 
     with tab_hoses:
         st.header("Dashboard de Mangueiras de Incêndio")
                 
-        df_hoses_history = load_sheet_data(HOSE_SHEET_NAME)
+        df_hoses_history = load_current_status(HOSE_SHEET_NAME)
 
         if df_hoses_history.empty:
             st.warning("Ainda não há registros de inspeção de mangueiras para exibir no dashboard.")
@@ -476,16 +431,21 @@ def show_dashboard_page():
     with tab_shelters:
         st.header("Dashboard de Status dos Abrigos de Emergência")
         
-        df_shelters_registered = load_sheet_data(SHELTER_SHEET_NAME)
-        df_inspections_history = load_sheet_data(INSPECTIONS_SHELTER_SHEET_NAME)
-        df_action_log = load_sheet_data(LOG_SHELTER_SHEET_NAME)
+        sheets = load_sheets_data([SHELTER_SHEET_NAME, INSPECTIONS_SHELTER_SHEET_NAME, LOG_SHELTER_SHEET_NAME], typed=True)
+        df_shelters_registered = sheets[SHELTER_SHEET_NAME]
+        df_inspections_history = sheets[INSPECTIONS_SHELTER_SHEET_NAME]
+        df_action_log = sheets[LOG_SHELTER_SHEET_NAME]
 
         if df_shelters_registered.empty:
             st.warning("Nenhum abrigo de emergência cadastrado.")
         else:
             st.info("Aqui está o status de todos os abrigos. Gere um relatório de status completo para impressão ou registre ações corretivas.")
+            latest_inspections = latest_shelter_inspections(df_inspections_history)
             if st.button("📄 Gerar Relatório de Status em PDF", type="primary"):
-                report_html = generate_shelters_html(df_shelters_registered, df_inspections_history, df_action_log)
+                report_html = generate_shelters_html(
+                    df_shelters_registered, df_inspections_history, df_action_log, latest_inspections,
+                    load_inspection_results(INSPECTIONS_SHELTER_SHEET_NAME, 'id_abrigo')
+                )
                 js_code = f"""
                     const reportHtml = {json.dumps(report_html)};
                     const printWindow = window.open('', '_blank');
@@ -502,7 +462,9 @@ def show_dashboard_page():
                 st.success("Relatório de status enviado para impressão!")
             st.markdown("---")
 
-            dashboard_df_shelters = get_shelter_status_df(df_shelters_registered, df_inspections_history)
+            dashboard_df_shelters = get_shelter_status_df(df_shelters_registered, df_inspections_history, latest_inspections)
+            shelter_results = load_inspection_results(INSPECTIONS_SHELTER_SHEET_NAME, 'id_abrigo')
+            shelter_results_by_row = index_results_by_row(shelter_results)
             
             status_counts = dashboard_df_shelters['status_dashboard'].value_counts()
             ok_count = status_counts.get("🟢 OK", 0) + status_counts.get("🟢 OK (Ação Realizada)", 0)
@@ -534,36 +496,36 @@ def show_dashboard_page():
                     st.markdown("---")
                     st.write("**Detalhes da Última Inspeção:**")
 
-                    try:
-                        results_dict = json.loads(row['resultados_json'])
-                        
-                        if results_dict:                
-                            general_conditions = results_dict.pop('Condições Gerais', {})
-                           
-                            if results_dict: 
-                                st.write("**Itens do Inventário:**")
-                                items_df = pd.DataFrame.from_dict(results_dict, orient='index')
-                                st.table(items_df)
-                            
-                            if general_conditions:
-                                st.write("**Condições Gerais do Abrigo:**")
-                                cols = st.columns(len(general_conditions))
-                                for i, (key, value) in enumerate(general_conditions.items()):
-                                    with cols[i]:
-                                        st.metric(label=key, value=value)
-                            
-                        else:
-                            st.info("Nenhum detalhe de inspeção disponível.")
-                            
-                    except (json.JSONDecodeError, TypeError):
+                    inspection_items = shelter_results_by_row.get(row['linha_origem'])
+                    if inspection_items is not None:
+                        is_general = inspection_items['categoria'] == 'Condições Gerais'
+                        inventory_items = inspection_items[~is_general]
+                        general_conditions = inspection_items[is_general]
+
+                        if not inventory_items.empty:
+                            st.write("**Itens do Inventário:**")
+                            items_df = inventory_items.set_index('item')[['status', 'observacao']]
+                            st.table(items_df)
+
+                        if not general_conditions.empty:
+                            st.write("**Condições Gerais do Abrigo:**")
+                            cols = st.columns(len(general_conditions))
+                            for i, (key, value) in enumerate(zip(general_conditions['item'], general_conditions['status'])):
+                                with cols[i]:
+                                    st.metric(label=key, value=value)
+
+                    elif has_unreadable_results(row['resultados_json']):
                         st.error("Não foi possível carregar os detalhes desta inspeção (formato inválido).")
+                    else:
+                        st.info("Nenhum detalhe de inspeção disponível.")
     
     with tab_scba:
         st.header("Dashboard de Status dos Conjuntos Autônomos")
         
         # Carrega os dados diretamente como DataFrames
-        df_scba_main = load_sheet_data(SCBA_SHEET_NAME)
-        df_scba_visual = load_sheet_data(SCBA_VISUAL_INSPECTIONS_SHEET_NAME)
+        sheets = load_sheets_data([SCBA_SHEET_NAME, SCBA_VISUAL_INSPECTIONS_SHEET_NAME], typed=True)
+        df_scba_main = sheets[SCBA_SHEET_NAME]
+        df_scba_visual = sheets[SCBA_VISUAL_INSPECTIONS_SHEET_NAME]
 
         # A VERIFICAÇÃO AGORA USA .empty
         if df_scba_main.empty:
@@ -582,6 +544,9 @@ def show_dashboard_page():
                 col4.metric("🔴 Vencidos", status_counts.get("🔴 VENCIDO (Teste Posi3)", 0) + status_counts.get("🔴 VENCIDO (Insp. Periódica)", 0))
                 st.markdown("---")
                 
+                scba_results_by_row = index_results_by_row(
+                    load_inspection_results(SCBA_VISUAL_INSPECTIONS_SHEET_NAME, 'numero_serie_equipamento')
+                )
                 for _, row in dashboard_df.iterrows():
                     val_teste_str = pd.to_datetime(row['data_validade']).strftime('%d/%m/%Y') if pd.notna(row['data_validade']) else 'N/A'
                     prox_insp_str = pd.to_datetime(row['data_proxima_inspecao']).strftime('%d/%m/%Y') if pd.notna(row['data_proxima_inspecao']) else 'N/A'
@@ -597,59 +562,59 @@ def show_dashboard_page():
                                 action_dialog_scba(row['numero_serie_equipamento'], status)
                         
                         st.markdown("**Detalhes da Última Inspeção Periódica:**")
-                    try:
-                        results_json = row.get('resultados_json')
-                        if results_json and pd.notna(results_json):
-                            results = json.loads(results_json)
+                    inspection_items = scba_results_by_row.get(row.get('linha_origem'))
+                    if inspection_items is not None:
+                        results = {
+                            category: dict(zip(items['item'], items['status']))
+                            for category, items in inspection_items.groupby('categoria', sort=False)
+                        }
+                            
+                        with st.expander("Ver detalhes da inspeção"):
+                            
+                            st.markdown("""
+                            <style>
+                            .small-font {
+                                font-size:0.9rem;
+                                line-height: 1.2;
+                            }
+                            </style>
+                            """, unsafe_allow_html=True)
+
+                            # 1. Testes Funcionais (agora dentro de colunas menores)
+                            st.markdown("<p class='small-font' style='font-weight: bold;'>Testes Funcionais</p>", unsafe_allow_html=True)
+                            testes = results.get("Testes Funcionais", {})
+                            if testes:
+                                cols_testes = st.columns(len(testes))
+                                for i, (teste, resultado) in enumerate(testes.items()):
+                                    icon = "✅" if resultado == "Aprovado" else "❌"
+                                    # Usando markdown para controlar o tamanho
+                                    cols_testes[i].markdown(f"<p class='small-font'><b>{teste}</b><br>{icon} {resultado}</p>", unsafe_allow_html=True)
                             
-                            with st.expander("Ver detalhes da inspeção"):
-                                
-                                st.markdown("""
-                                <style>
-                                .small-font {
-                                    font-size:0.9rem;
-                                    line-height: 1.2;
-                                }
-                                </style>
-                                """, unsafe_allow_html=True)
-
-                                # 1. Testes Funcionais (agora dentro de colunas menores)
-                                st.markdown("<p class='small-font' style='font-weight: bold;'>Testes Funcionais</p>", unsafe_allow_html=True)
-                                testes = results.get("Testes Funcionais", {})
-                                if testes:
-                                    cols_testes = st.columns(len(testes))
-                                    for i, (teste, resultado) in enumerate(testes.items()):
-                                        icon = "✅" if resultado == "Aprovado" else "❌"
-                                        # Usando markdown para controlar o tamanho
-                                        cols_testes[i].markdown(f"<p class='small-font'><b>{teste}</b><br>{icon} {resultado}</p>", unsafe_allow_html=True)
-                                
-                                # 2. Checklist Visual
-                                st.markdown("<p class='small-font' style='font-weight: bold; margin-top: 10px;'>Checklist Visual</p>", unsafe_allow_html=True)
-                                col_cilindro, col_mascara = st.columns(2)
-
-                                with col_cilindro:
-                                    st.markdown("<p class='small-font'><b>Cilindro de Ar</b></p>", unsafe_allow_html=True)
-                                    cilindro_itens = results.get("Cilindro", {})
-                                    obs_cilindro = cilindro_itens.pop("Observações", "")
-                                    for item, status in cilindro_itens.items():
-                                        icon = "✔️" if status == "C" else ("❌" if status == "N/C" else "➖")
-                                        st.markdown(f"<p class='small-font'>{icon} {item}</p>", unsafe_allow_html=True)
-                                    if obs_cilindro:
-                                        st.markdown(f"<p class='small-font' style='font-style: italic;'>Obs: {obs_cilindro}</p>", unsafe_allow_html=True)
-
-                                with col_mascara:
-                                    st.markdown("<p class='small-font'><b>Máscara Facial</b></p>", unsafe_allow_html=True)
-                                    mascara_itens = results.get("Mascara", {})
-                                    obs_mascara = mascara_itens.pop("Observações", "")
-                                    for item, status in mascara_itens.items():
-                                        icon = "✔️" if status == "C" else ("❌" if status == "N/C" else "➖")
-                                        st.markdown(f"<p class='small-font'>{icon} {item}</p>", unsafe_allow_html=True)
-                                    if obs_mascara:
-                                        st.markdown(f"<p class='small-font' style='font-style: italic;'>Obs: {obs_mascara}</p>", unsafe_allow_html=True)
-
-                        else:
-                            st.info("Nenhum detalhe de inspeção periódica encontrado.")
-                    except (json.JSONDecodeError, TypeError, AttributeError):
+                            # 2. Checklist Visual
+                            st.markdown("<p class='small-font' style='font-weight: bold; margin-top: 10px;'>Checklist Visual</p>", unsafe_allow_html=True)
+                            col_cilindro, col_mascara = st.columns(2)
+
+                            with col_cilindro:
+                                st.markdown("<p class='small-font'><b>Cilindro de Ar</b></p>", unsafe_allow_html=True)
+                                cilindro_itens = results.get("Cilindro", {})
+                                obs_cilindro = cilindro_itens.pop("Observações", "")
+                                for item, status in cilindro_itens.items():
+                                    icon = "✔️" if status == "C" else ("❌" if status == "N/C" else "➖")
+                                    st.markdown(f"<p class='small-font'>{icon} {item}</p>", unsafe_allow_html=True)
+                                if obs_cilindro:
+                                    st.markdown(f"<p class='small-font' style='font-style: italic;'>Obs: {obs_cilindro}</p>", unsafe_allow_html=True)
+
+                            with col_mascara:
+                                st.markdown("<p class='small-font'><b>Máscara Facial</b></p>", unsafe_allow_html=True)
+                                mascara_itens = results.get("Mascara", {})
+                                obs_mascara = mascara_itens.pop("Observações", "")
+                                for item, status in mascara_itens.items():
+                                    icon = "✔️" if status == "C" else ("❌" if status == "N/C" else "➖")
+                                    st.markdown(f"<p class='small-font'>{icon} {item}</p>", unsafe_allow_html=True)
+                                if obs_mascara:
+                                    st.markdown(f"<p class='small-font' style='font-style: italic;'>Obs: {obs_mascara}</p>", unsafe_allow_html=True)
+
+                    else:
                         st.info("Nenhum detalhe de inspeção periódica encontrado.")
 
 # --- Boilerplate de Autenticação ---
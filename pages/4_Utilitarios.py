@@ -14,15 +14,22 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import can_edit, get_user_display_name # Usando a nova lógica de permissões
-from operations.history import load_sheet_data
+from operations.history import load_sheet_columns
+from operations.current_status import load_current_status, rebuild_current_status, STATUS_PROJECTIONS
+from operations.archive import archive_closed_years, list_archive_years
 from gdrive.config import (
-    EXTINGUISHER_SHEET_NAME, HOSE_SHEET_NAME,
+    EXTINGUISHER_SHEET_NAME, HOSE_SHEET_NAME, ARCHIVE_DATE_COLUMNS, ARCHIVE_HOT_YEARS,
     EXTINGUISHER_SHIPMENT_LOG_SHEET_NAME, TH_SHIPMENT_LOG_SHEET_NAME
 )
+from gdrive.write_queue import (
+    get_queue_status, list_entries, retry_failed, flush_now,
+    STATUS_PENDING, STATUS_SENDING, STATUS_FAILED, STATUS_FLUSHED
+)
 from reports.shipment_report import (
     generate_shipment_html_and_pdf, log_shipment, 
     select_extinguishers_for_maintenance, select_hoses_for_th
 )
+from utils.save_action import save_action
 from operations.demo_page import show_demo_page
 from config.page_config import set_page_config 
 
@@ -54,10 +61,97 @@ def image_to_bytes(img: Image.Image):
     img.save(buf, format="PNG")
     return buf.getvalue()
 
+def show_write_queue_panel():
+    """
+    Painel da fila de gravação: mostra quantos registros aguardam envio ao Google Sheets,
+    quantos já foram confirmados e quais falharam, com opções para reenviar.
+    """
+    st.header("Fila de Sincronização com o Google Sheets")
+    st.info(
+        "Os registros são salvos primeiro em um diário local e enviados à planilha em segundo plano, "
+        "em lotes. Entradas com falha temporária (limite de cota ou erro do servidor) são reenviadas automaticamente."
+    )
+
+    status_counts = get_queue_status()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("⏳ Pendentes", status_counts[STATUS_PENDING])
+    col2.metric("📤 Enviando", status_counts[STATUS_SENDING])
+    col3.metric("✅ Enviados", status_counts[STATUS_FLUSHED])
+    col4.metric("❌ Com falha", status_counts[STATUS_FAILED])
+
+    col_a, col_b, col_c = st.columns(3)
+    if col_a.button("🔄 Atualizar", use_container_width=True):
+        st.rerun()
+    if col_b.button("📤 Enviar agora", use_container_width=True, disabled=status_counts[STATUS_PENDING] == 0):
+        flush_now()
+        st.rerun()
+    if col_c.button("♻️ Reenviar com falha", use_container_width=True, disabled=status_counts[STATUS_FAILED] == 0):
+        count = retry_failed()
+        st.success(f"{count} registro(s) devolvido(s) para a fila.")
+        st.rerun()
+
+    with st.expander("Abas de status atual"):
+        st.caption(
+            "As abas de status guardam uma linha por equipamento e são atualizadas a cada gravação. "
+            "Depois de editar o histórico diretamente na planilha, reconstrua-as a partir dele."
+        )
+        for sheet_name, projection in STATUS_PROJECTIONS.items():
+            if st.button(f"🔁 Reconstruir '{projection['status_sheet']}'", key=f"rebuild_{sheet_name}", use_container_width=True):
+                with st.spinner(f"Recalculando o status a partir de '{sheet_name}'..."):
+                    try:
+                        count = rebuild_current_status(sheet_name)
+                    except Exception as e:
+                        st.error(f"Erro ao reconstruir a aba '{projection['status_sheet']}': {e}")
+                    else:
+                        st.success(f"Aba '{projection['status_sheet']}' reconstruída com {count} equipamento(s).")
+
+    with st.expander("Arquivamento anual do histórico"):
+        st.caption(
+            f"Registros com mais de {ARCHIVE_HOT_YEARS} ano(s) saem das abas de histórico e vão para abas "
+            "'<aba>_arquivo_<ano>', consultadas só no Histórico e nos relatórios de anos antigos. "
+            "O arquivamento roda automaticamente uma vez por ano; use o botão para executá-lo agora."
+        )
+        st.write({sheet_name: list_archive_years(sheet_name) for sheet_name in ARCHIVE_DATE_COLUMNS})
+        if st.button("🗄️ Arquivar anos encerrados", key="archive_closed_years", use_container_width=True):
+            for sheet_name in ARCHIVE_DATE_COLUMNS:
+                with st.spinner(f"Arquivando '{sheet_name}'..."):
+                    try:
+                        archived = archive_closed_years(sheet_name)
+                    except Exception as e:
+                        st.error(f"Erro ao arquivar a aba '{sheet_name}': {e}")
+                        continue
+                if archived:
+                    st.success(f"'{sheet_name}': " + ", ".join(f"{count} linha(s) de {year}" for year, count in archived.items()))
+                else:
+                    st.info(f"'{sheet_name}': nenhum registro a arquivar.")
+
+    entries = list_entries(statuses=[STATUS_PENDING, STATUS_SENDING, STATUS_FAILED])
+    if not entries:
+        st.success("Nenhum registro aguardando envio.")
+        return
+
+    df_entries = pd.DataFrame(entries)
+    for col in ['created_at', 'updated_at', 'next_attempt_at']:
+        df_entries[col] = pd.to_datetime(df_entries[col], unit='s').dt.strftime('%d/%m/%Y %H:%M:%S')
+    df_entries['row_json'] = df_entries['row_json'].apply(lambda x: ", ".join(str(v) for v in json.loads(x) if v not in (None, "")))
+    st.dataframe(
+        df_entries[['id', 'sheet_name', 'status', 'attempts', 'created_at', 'next_attempt_at', 'last_error', 'row_json']],
+        column_config={
+            "id": "Nº", "sheet_name": "Aba", "status": "Status", "attempts": "Tentativas",
+            "created_at": "Salvo em", "next_attempt_at": "Próxima tentativa",
+            "last_error": "Último erro", "row_json": "Dados"
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
 def show_utilities_page():
     st.title("🛠️ Utilitários do Sistema")
 
-    tab_qr, tab_shipment = st.tabs(["Gerador de QR Code", "Gerador de Boletim de Remessa"])
+    tab_qr, tab_shipment, tab_sync = st.tabs(["Gerador de QR Code", "Gerador de Boletim de Remessa", "Fila de Sincronização"])
+
+    with tab_sync:
+        show_write_queue_panel()
 
     with tab_qr:
         st.header("Gerador de QR Codes para Equipamentos")
@@ -108,27 +202,33 @@ def show_utilities_page():
         )
 
         # --- Carregamento de Dados ---
+        # As opções e as sugestões vêm do mesmo status atual (um registro por equipamento,
+        # incluindo os que só têm registros em anos arquivados)
         if item_type == 'Extintores':
-            df_all_items = load_sheet_data(EXTINGUISHER_SHEET_NAME)
-            df_log_items = load_sheet_data(EXTINGUISHER_SHIPMENT_LOG_SHEET_NAME)
+            df_latest = load_current_status(EXTINGUISHER_SHEET_NAME)
             id_column = 'numero_identificacao'
         elif item_type == 'Mangueiras':
-            df_all_items = load_sheet_data(HOSE_SHEET_NAME)
-            df_log_items = load_sheet_data(TH_SHIPMENT_LOG_SHEET_NAME)
+            df_latest = load_current_status(HOSE_SHEET_NAME)
             id_column = 'id_mangueira'
         
         # --- Lógica de Sugestão Automática ---
         st.subheader("Sugestão Automática")
         if item_type == 'Extintores':
             if st.button("Sugerir ~50% dos Extintores (manutenção mais antiga)"):
-                suggested_items = select_extinguishers_for_maintenance(df_all_items, df_log_items)
+                suggested_items = select_extinguishers_for_maintenance(
+                    df_latest,
+                    load_sheet_columns(EXTINGUISHER_SHIPMENT_LOG_SHEET_NAME, ['numero_identificacao', 'ano_remessa'])
+                )
                 if not suggested_items.empty:
                     st.session_state['suggested_ids'] = suggested_items[id_column].tolist()
                     st.rerun()
                 else: st.success("Nenhum extintor elegível encontrado.")
         elif item_type == 'Mangueiras':
             if st.button("Sugerir ~50% das Mangueiras (mais antigas)"):
-                suggested_items = select_hoses_for_th(df_all_items, df_log_items)
+                suggested_items = select_hoses_for_th(
+                    df_latest,
+                    load_sheet_columns(TH_SHIPMENT_LOG_SHEET_NAME, ['id_mangueira', 'ano_remessa'])
+                )
                 if not suggested_items.empty:
                     st.session_state['suggested_ids'] = suggested_items[id_column].tolist()
                     st.rerun()
@@ -138,12 +238,11 @@ def show_utilities_page():
 
         # --- Seleção Manual e Geração do Boletim ---
         st.subheader("Seleção de Itens e Geração do Boletim")
-        if df_all_items.empty:
+        if df_latest.empty:
             st.warning(f"Nenhum registro de {item_type.lower()} encontrado para selecionar.")
         else:
-            df_latest = df_all_items.sort_values(by=df_all_items.columns[0], ascending=False).drop_duplicates(subset=[id_column], keep='first')
             options = df_latest[id_column].tolist()
-            default_selection = st.session_state.get('suggested_ids', [])
+            default_selection = [item_id for item_id in st.session_state.get('suggested_ids', []) if item_id in options]
             
             selected_ids = st.multiselect(
                 f"Selecione ou edite os IDs dos {item_type} para a remessa:",
@@ -189,14 +288,14 @@ def show_utilities_page():
                                 "responsavel": get_user_display_name()
                             }
                             pdf_bytes = generate_shipment_html_and_pdf(df_selected, item_type, remetente_info, destinatario_info, bulletin_number)
-                            log_shipment(df_selected, item_type, bulletin_number)
+                            with save_action("shipment"):
+                                log_shipment(df_selected, item_type, bulletin_number)
                             
                             # Armazena os dados do PDF no session_state para exibir o botão de download após o rerun
                             st.session_state['pdf_generated_info'] = {
                                 "data": pdf_bytes,
                                 "file_name": f"Boletim_Remessa_{bulletin_number}.pdf"
                             }
-                            st.cache_data.clear()
                             st.rerun()
 
             # Exibe o botão de download se um PDF foi gerado
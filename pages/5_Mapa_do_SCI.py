@@ -5,7 +5,8 @@ import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from operations.history import load_sheet_data
+from operations.current_status import load_current_status
+from gdrive.config import EXTINGUISHER_SHEET_NAME
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import is_admin, can_edit, can_view, get_user_display_name 
 from operations.demo_page import show_demo_page
@@ -14,14 +15,11 @@ from config.page_config import set_page_config
 set_page_config()
 
 def get_latest_locations(df_full):
-    if df_full.empty: return pd.DataFrame()
-    df = df_full.copy()
-    df['data_servico'] = pd.to_datetime(df['data_servico'], errors='coerce')
-    df = df.dropna(subset=['data_servico'])
+    """Último registro de cada extintor com coordenadas válidas (espera o DataFrame tipado da aba ou o status atual)."""
+    if df_full.empty or 'data_servico' not in df_full.columns: return pd.DataFrame()
+    df = df_full.dropna(subset=['data_servico'])
     latest_records_df = df.sort_values('data_servico').drop_duplicates(subset='numero_identificacao', keep='last')
     if 'latitude' not in latest_records_df.columns or 'longitude' not in latest_records_df.columns: return pd.DataFrame()
-    latest_records_df['latitude'] = pd.to_numeric(latest_records_df['latitude'].astype(str).str.replace(',', '.'), errors='coerce')
-    latest_records_df['longitude'] = pd.to_numeric(latest_records_df['longitude'].astype(str).str.replace(',', '.'), errors='coerce')
     return latest_records_df.dropna(subset=['latitude', 'longitude'])
 
 def assign_visual_properties(df):
@@ -34,7 +32,7 @@ def assign_visual_properties(df):
             if key in agent_type_str:
                 return color
         return default_color
-    df_copy['color'] = df_copy['tipo_agente'].apply(get_color)
+    df_copy['color'] = df_copy['tipo_agente'].astype(str).apply(get_color)
     df_copy['capacidade_num'] = pd.to_numeric(df_copy['capacidade'].astype(str).str.extract(r'(\d+\.?\d*)')[0], errors='coerce').fillna(1)
     df_copy['size'] = 0.3 + (df_copy['capacidade_num'] * 0.1)
     return df_copy
@@ -48,7 +46,7 @@ def show_map_page():
 
     if equip_type == "Extintores":
         st.header("Localização dos Extintores")
-        df_history = load_sheet_data("extintores")
+        df_history = load_current_status(EXTINGUISHER_SHEET_NAME)
         
         if df_history.empty:
             st.warning("Não há dados de extintores para exibir no mapa."); return
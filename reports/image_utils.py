@@ -0,0 +1,110 @@
+import io
+import re
+import base64
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+from gdrive.config import (
+    REPORT_IMAGE_MAX_WORKERS, REPORT_IMAGE_TIMEOUT_SECONDS, REPORT_THUMBNAIL_CACHE_DB_PATH,
+    REPORT_THUMBNAIL_CACHE_MAX_BYTES, REPORT_THUMBNAIL_MAX_SIZE, REPORT_THUMBNAIL_JPEG_QUALITY
+)
+from utils.disk_cache import DiskLRUCache
+
+# Download das fotos embutidas nos relatórios. Todas as requisições usam a mesma
+# requests.Session, que reaproveita as conexões com o Drive entre as fotos.
+# As fotos são reduzidas para miniaturas JPEG, guardadas em disco pelo ID do arquivo no Drive:
+# a mesma evidência usada em outro relatório não é baixada de novo.
+
+_session = None
+_session_lock = threading.Lock()
+_thumbnail_cache = DiskLRUCache(REPORT_THUMBNAIL_CACHE_DB_PATH, REPORT_THUMBNAIL_CACHE_MAX_BYTES)
+
+DRIVE_ID_PATTERNS = (r'[?&]id=([\w-]+)', r'/d/([\w-]+)')
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=REPORT_IMAGE_MAX_WORKERS, pool_maxsize=REPORT_IMAGE_MAX_WORKERS)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def drive_file_id(url):
+    """Extrai o ID do arquivo de um link do Drive (formatos '?id=...' e '/d/.../'), ou None."""
+    for pattern in DRIVE_ID_PATTERNS:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def make_thumbnail(image_bytes):
+    """
+    Reduz a imagem para caber em REPORT_THUMBNAIL_MAX_SIZE pixels e a recomprime como JPEG.
+    Respeita a orientação EXIF das fotos de celular; transparências viram fundo branco.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((REPORT_THUMBNAIL_MAX_SIZE, REPORT_THUMBNAIL_MAX_SIZE))
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=REPORT_THUMBNAIL_JPEG_QUALITY, optimize=True)
+        return output.getvalue()
+
+
+def _thumbnail_key(url):
+    file_id = drive_file_id(url) or url
+    return f"{file_id}:{REPORT_THUMBNAIL_MAX_SIZE}:{REPORT_THUMBNAIL_JPEG_QUALITY}"
+
+
+def get_image_as_base64(url):
+    """
+    Retorna a miniatura JPEG de uma imagem do Google Drive como data URI em base64.
+    Retorna None se o link não for do Drive, se o download falhar ou se o arquivo não for uma imagem.
+    """
+    if not isinstance(url, str) or not url.strip() or 'drive.google.com' not in url:
+        return None
+    key = _thumbnail_key(url)
+    thumbnail = _thumbnail_cache.get(key)
+    if thumbnail is None:
+        try:
+            response = _get_session().get(url, timeout=REPORT_IMAGE_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            thumbnail = make_thumbnail(response.content)
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Falha ao baixar a imagem '{url}': {e}")
+            return None
+        except (UnidentifiedImageError, OSError) as e:
+            logging.warning(f"O arquivo '{url}' não pôde ser lido como imagem: {e}")
+            return None
+        _thumbnail_cache.set(key, thumbnail)
+    return f"data:image/jpeg;base64,{base64.b64encode(thumbnail).decode()}"
+
+
+def prefetch_images(urls):
+    """
+    Baixa em paralelo (até REPORT_IMAGE_MAX_WORKERS por vez) as imagens dos links informados.
+    Retorna um dicionário link -> data URI, com None para os links que falharam.
+    """
+    unique_urls = list(dict.fromkeys(url for url in urls if isinstance(url, str) and url.strip()))
+    if not unique_urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(REPORT_IMAGE_MAX_WORKERS, len(unique_urls))) as executor:
+        return dict(zip(unique_urls, executor.map(get_image_as_base64, unique_urls)))
+
+
+def clear_thumbnail_cache():
+    _thumbnail_cache.clear()
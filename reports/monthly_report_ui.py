@@ -4,31 +4,58 @@ from datetime import datetime
 import sys
 import os
 import json
-import base64
-import requests
 from streamlit_js_eval import streamlit_js_eval
 
 # Adiciona o diretório raiz ao path para encontrar a pasta 'operations'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from operations.local_replica import query_replica, query_frames
 from operations.history import load_sheet_data
+from operations.archive import load_sheet_history, list_archive_years
+from reports.image_utils import prefetch_images
+from gdrive.config import EXTINGUISHER_SHEET_NAME, LOG_ACTIONS
 
-# --- FUNÇÃO PARA EMBUTIR IMAGENS ---
-def get_image_as_base64(url):
-    """Baixa uma imagem de uma URL e a converte para o formato base64."""
-    if not isinstance(url, str) or not url.strip() or 'drive.google.com' not in url:
-        return None
-    try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        b64_string = base64.b64encode(response.content).decode()
-        # Determina o tipo de imagem (assumindo jpeg como padrão)
-        content_type = response.headers.get('Content-Type', 'image/jpeg')
-        return f"data:{content_type};base64,{b64_string}"
-    except requests.exceptions.RequestException:
-        # Retorna o link original como fallback se o download falhar
-        return url
+# Inspeções do mês com o local do equipamento e a primeira ação corretiva registrada
+# a partir da data da inspeção, em uma única consulta à réplica local
+MONTHLY_REPORT_QUERY = """
+SELECT
+    e.numero_identificacao, e.data_servico, e.aprovado_inspecao, e.observacoes_gerais,
+    e.link_foto_nao_conformidade,
+    l.local,
+    a.linha AS acao_linha, a.acao_realizada, a.responsavel_acao, a.data_correcao, a.link_foto_evidencia
+FROM extintores e
+LEFT JOIN locais l ON l.linha = (
+    SELECT MIN(l2.linha) FROM locais l2 WHERE l2.id = e.numero_identificacao
+)
+LEFT JOIN log_acoes a ON a.linha = (
+    SELECT a2.linha FROM log_acoes a2
+    WHERE a2.id_equipamento = e.numero_identificacao AND a2.data_correcao >= e.data_servico
+    ORDER BY a2.data_correcao, a2.linha
+    LIMIT 1
+)
+WHERE e.tipo_servico = 'Inspeção'
+  AND strftime('%Y', e.data_servico) = ?
+  AND strftime('%m', e.data_servico) = ?
+ORDER BY e.data_servico, e.linha
+"""
 
-def generate_report_html(df_inspections_month, df_action_log, df_locais, month, year):
+def load_monthly_report_data(month, year):
+    """Retorna as inspeções do mês, já com o local e a ação corretiva de cada uma (ver MONTHLY_REPORT_QUERY)."""
+    params = (f"{year:04d}", f"{month:02d}")
+    if year in list_archive_years(EXTINGUISHER_SHEET_NAME):
+        # Ano arquivado: lê só as abas de arquivo necessárias (as ações podem ser de anos seguintes)
+        frames = {
+            EXTINGUISHER_SHEET_NAME: load_sheet_history(EXTINGUISHER_SHEET_NAME, since_year=year, until_year=year),
+            "locais": load_sheet_data("locais"),
+            LOG_ACTIONS: load_sheet_history(LOG_ACTIONS, since_year=year),
+        }
+        df = query_frames(MONTHLY_REPORT_QUERY, frames, params=params)
+    else:
+        df = query_replica(MONTHLY_REPORT_QUERY, [EXTINGUISHER_SHEET_NAME, "locais", LOG_ACTIONS], params=params)
+    for column in ['data_servico', 'data_correcao']:
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+def generate_report_html(df_inspections_month, month, year):
     """Gera o conteúdo do relatório como uma string HTML pura."""
     
     styles = """
@@ -58,20 +85,18 @@ def generate_report_html(df_inspections_month, df_action_log, df_locais, month,
     if df_inspections_month.empty:
         html += "<p>Nenhum registro de inspeção de extintor encontrado para o período.</p>"
     else:
-        if not df_action_log.empty:
-            df_action_log['data_correcao_dt'] = pd.to_datetime(df_action_log['data_correcao'], errors='coerce')
-        if not df_locais.empty:
-            df_locais['id'] = df_locais['id'].astype(str)
+        # Fotos das não conformidades e das ações corretivas, baixadas em paralelo antes de montar o HTML
+        failed = df_inspections_month[df_inspections_month['aprovado_inspecao'] != "Sim"]
+        images = prefetch_images(
+            failed['link_foto_nao_conformidade'].tolist()
+            + failed.loc[failed['acao_linha'].notna(), 'link_foto_evidencia'].tolist()
+        )
 
         for _, inspection in df_inspections_month.iterrows():
             ext_id = inspection['numero_identificacao']
             
-            # Busca o local do equipamento
-            local_info = "Local não definido"
-            if not df_locais.empty:
-                local_row = df_locais[df_locais['id'] == str(ext_id)]
-                if not local_row.empty:
-                    local_info = local_row.iloc[0].get('local', local_info)
+            # Local do equipamento, vindo da junção com a aba 'locais'
+            local_info = inspection.get('local') if pd.notna(inspection.get('local')) else "Local não definido"
             
             is_ok = inspection.get('aprovado_inspecao') == "Sim"
             status_class = "status-ok" if is_ok else "status-fail"
@@ -79,7 +104,7 @@ def generate_report_html(df_inspections_month, df_action_log, df_locais, month,
             icon = "✅" if is_ok else "❌"
             obs = inspection.get('observacoes_gerais', '')
             photo_nc_link = inspection.get('link_foto_nao_conformidade')
-            inspection_date = pd.to_datetime(inspection['data_servico'])
+            inspection_date = inspection['data_servico']
 
             html += f"""
             <div class='inspection-item'>
@@ -95,7 +120,7 @@ def generate_report_html(df_inspections_month, df_action_log, df_locais, month,
             if not is_ok:
                 html += "<div class='subsection-header'>Evidência da Não Conformidade</div>"
                 if pd.notna(photo_nc_link):
-                    base64_image = get_image_as_base64(photo_nc_link)
+                    base64_image = images.get(photo_nc_link)
                     if base64_image:
                         html += f"<img src='{base64_image}' class='evidence-img' alt='Foto da Não Conformidade'>"
                     else:
@@ -105,25 +130,23 @@ def generate_report_html(df_inspections_month, df_action_log, df_locais, month,
                 
                 html += "<div class='subsection-header'>Ação Corretiva</div>"
                 action_info = "<p class='pending'>Ação Corretiva Pendente.</p>"
-                if not df_action_log.empty:
-                    action = df_action_log[(df_action_log['id_equipamento'].astype(str) == str(ext_id)) & (df_action_log['data_correcao_dt'] >= inspection_date)].sort_values(by='data_correcao_dt')
-                    if not action.empty:
-                        action_taken = action.iloc[0]
-                        action_photo_link = action_taken.get('link_foto_evidencia')
-                        action_info = f"<p class='success-text'>Ação Corretiva Registrada:</p>"
-                        action_info += f"""
-                        <p><b>Ação Realizada:</b> {action_taken.get('acao_realizada', 'N/A')}</p>
-                        <p><b>Responsável:</b> {action_taken.get('responsavel_acao', 'N/A')}</p>
-                        <p><b>Data da Correção:</b> {pd.to_datetime(action_taken['data_correcao_dt']).strftime('%d/%m/%Y')}</p>
-                        """
-                        if pd.notna(action_photo_link):
-                            base64_action_image = get_image_as_base64(action_photo_link)
-                            if base64_action_image:
-                                action_info += f"<img src='{base64_action_image}' class='evidence-img' alt='Foto da Ação Corretiva'>"
-                            else:
-                                action_info += f"<p>Falha ao carregar imagem. <a href='{action_photo_link}' target='_blank'>Abrir link da evidência</a></p>"
+                if pd.notna(inspection.get('acao_linha')):
+                    action_taken = inspection
+                    action_photo_link = action_taken.get('link_foto_evidencia')
+                    action_info = f"<p class='success-text'>Ação Corretiva Registrada:</p>"
+                    action_info += f"""
+                    <p><b>Ação Realizada:</b> {action_taken.get('acao_realizada', 'N/A')}</p>
+                    <p><b>Responsável:</b> {action_taken.get('responsavel_acao', 'N/A')}</p>
+                    <p><b>Data da Correção:</b> {action_taken['data_correcao'].strftime('%d/%m/%Y')}</p>
+                    """
+                    if pd.notna(action_photo_link):
+                        base64_action_image = images.get(action_photo_link)
+                        if base64_action_image:
+                            action_info += f"<img src='{base64_action_image}' class='evidence-img' alt='Foto da Ação Corretiva'>"
                         else:
-                            action_info += "<p>Nenhuma foto da ação corretiva anexada.</p>"
+                            action_info += f"<p>Falha ao carregar imagem. <a href='{action_photo_link}' target='_blank'>Abrir link da evidência</a></p>"
+                    else:
+                        action_info += "<p>Nenhuma foto da ação corretiva anexada.</p>"
                 html += action_info
 
             html += "</div>"
@@ -149,20 +172,13 @@ def show_monthly_report_interface():
         month = months.index(month_name) + 1
         
         with st.spinner(f"Gerando relatório para {month:02d}/{year}..."):
-            df_inspections = load_sheet_data("extintores")
-            df_action_log = load_sheet_data("log_acoes")
-            df_locais = load_sheet_data("locais") # Carrega os dados de locais
-
-            if not df_inspections.empty:
-                df_inspections['data_servico'] = pd.to_datetime(df_inspections['data_servico'], errors='coerce')
-                mask = (df_inspections['data_servico'].dt.year == year) & \
-                       (df_inspections['data_servico'].dt.month == month) & \
-                       (df_inspections['tipo_servico'] == 'Inspeção')
-                df_inspections_month = df_inspections[mask].sort_values(by='data_servico')
-            else:
-                df_inspections_month = pd.DataFrame()
+            try:
+                df_inspections_month = load_monthly_report_data(month, year)
+            except Exception as e:
+                st.error(f"Erro ao consultar os dados do relatório: {e}")
+                return
             
-            report_html = generate_report_html(df_inspections_month, df_action_log, df_locais, month, year)
+            report_html = generate_report_html(df_inspections_month, month, year)
             
             js_code = f"""
                 const reportHtml = {json.dumps(report_html)};
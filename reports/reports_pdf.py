@@ -1,12 +1,15 @@
-import json
 import pandas as pd
 import base64
 import requests
+from operations.dashboard_status import latest_shelter_inspections
+from operations.inspection_results import parse_inspection_results, index_results_by_row, has_unreadable_results
 
-def generate_shelters_html(df_shelters_registered, df_inspections, df_action_log):
+def generate_shelters_html(df_shelters_registered, df_inspections, df_action_log, latest_inspections=None, inspection_results=None):
     """
     Gera um relatório de status completo para os abrigos, destacando as pendências
     na última inspeção.
+    'latest_inspections' e 'inspection_results' aceitam os resultados de latest_shelter_inspections
+    e load_inspection_results já calculados pelo dashboard.
     """
     styles = """
     <style>
@@ -29,10 +32,19 @@ def generate_shelters_html(df_shelters_registered, df_inspections, df_action_log
     html = f"<html><head><title>Relatório de Status de Abrigos</title>{styles}</head><body>"
     html += "<div class='report-header'><h1>Relatório de Status de Abrigos de Emergência</h1></div>"
 
-    latest_inspections = pd.DataFrame()
-    if not df_inspections.empty:
-        df_inspections['data_inspecao_dt'] = pd.to_datetime(df_inspections['data_inspecao'])
-        latest_inspections = df_inspections.sort_values('data_inspecao_dt', ascending=False).drop_duplicates('id_abrigo', keep='first')
+    if latest_inspections is None:
+        latest_inspections = latest_shelter_inspections(df_inspections)
+    if inspection_results is None:
+        inspection_results = parse_inspection_results(latest_inspections, 'id_abrigo')
+    results_by_row = index_results_by_row(inspection_results)
+
+    # Índices por abrigo, para não filtrar os DataFrames inteiros a cada abrigo
+    last_inspection_by_shelter = {}
+    if not latest_inspections.empty:
+        last_inspection_by_shelter = {row['id_abrigo']: (linha, row) for linha, row in latest_inspections.iterrows()}
+    action_log_by_shelter = {}
+    if not df_action_log.empty:
+        action_log_by_shelter = {shelter_id: group for shelter_id, group in df_action_log.groupby('id_abrigo', sort=False)}
 
     for _, shelter in df_shelters_registered.iterrows():
         shelter_id = shelter['id_abrigo']
@@ -45,10 +57,10 @@ def generate_shelters_html(df_shelters_registered, df_inspections, df_action_log
         
         html += "<div class='subsection-title'>Resultado da Última Inspeção</div>"
         
-        last_inspection = latest_inspections[latest_inspections['id_abrigo'] == shelter_id]
+        last_inspection = last_inspection_by_shelter.get(shelter_id)
         
-        if not last_inspection.empty:
-            inspection_details = last_inspection.iloc[0]
+        if last_inspection is not None:
+            linha, inspection_details = last_inspection
             inspection_date = pd.to_datetime(inspection_details['data_inspecao']).strftime('%d/%m/%Y')
             status_geral = inspection_details['status_geral']
             
@@ -56,35 +68,33 @@ def generate_shelters_html(df_shelters_registered, df_inspections, df_action_log
             status_class_geral = "status-fail" if status_geral == "Reprovado com Pendências" else "status-ok"
             html += f"<p><strong>Data da Inspeção:</strong> {inspection_date} | <strong>Status Geral:</strong> <span class='{status_class_geral}'>{status_geral}</span></p>"
             
-            try:
-                results = json.loads(inspection_details['resultados_json'])
+            inspection_items = results_by_row.get(linha)
+            if inspection_items is not None:
                 html += "<table><tr><th>Item</th><th>Status</th><th>Observação</th></tr>"
+                categories = inspection_items.groupby(inspection_items['categoria'].fillna(''), sort=False)
                 
-                # Itera sobre todas as categorias (Cilindro, Mascara, Testes Funcionais, etc.)
-                for category, items in results.items():
+                # Itens sem categoria (inventário) e categorias (Condições Gerais, etc.)
+                for category, items in categories:
                     # Adiciona uma linha de cabeçalho para a categoria, se houver mais de uma
-                    if len(results) > 1:
+                    if category and categories.ngroups > 1:
                         html += f"<tr><th colspan='3' style='background-color: #e9ecef;'>{category}</th></tr>"
                     
-                    for item, details in items.items():
+                    for item, item_status, observacao in zip(items['item'], items['status'], items['observacao']):
                         # Lógica para determinar o status e a classe CSS
-                        item_status = details.get('status', 'N/A') if isinstance(details, dict) else details
                         is_ok = str(item_status).upper() in ["C", "APROVADO", "SIM", "OK"]
                         status_class = "status-ok" if is_ok else "status-fail"
-                        
-                        observacao = details.get('observacao', '') if isinstance(details, dict) else ''
 
                         # Gera a linha da tabela com o destaque de cor se não estiver OK
                         html += f"<tr class='{status_class}'><td class='{status_class}'>{item}</td><td class='{status_class}'>{item_status}</td><td class='{status_class}'>{observacao}</td></tr>"
 
                 html += "</table>"
-            except (json.JSONDecodeError, TypeError):
+            elif has_unreadable_results(inspection_details['resultados_json']):
                 html += "<p>Erro ao ler os detalhes da inspeção.</p>"
         else:
             html += "<p>Nenhuma inspeção registrada para este abrigo.</p>"
 
         html += "<div class='subsection-title'>Histórico de Ações Corretivas</div>"
-        action_log_entries = df_action_log[df_action_log['id_abrigo'] == shelter_id] if not df_action_log.empty else pd.DataFrame()
+        action_log_entries = action_log_by_shelter.get(shelter_id, pd.DataFrame())
         
         if not action_log_entries.empty:
             for _, log in action_log_entries.iterrows():
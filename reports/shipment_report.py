@@ -1,17 +1,15 @@
 import pandas as pd
 from datetime import date
-import base64
-import requests
 import io
 from weasyprint import HTML
-from gdrive.gdrive_upload import GoogleDriveUploader
+from utils.save_action import enqueue_rows_checked
+from reports.image_utils import get_image_as_base64
 from gdrive.config import TH_SHIPMENT_LOG_SHEET_NAME, EXTINGUISHER_SHIPMENT_LOG_SHEET_NAME
 
 
 
 def log_shipment(df_selected_items, item_type, bulletin_number):
     """Salva o log dos itens enviados na planilha correspondente."""
-    uploader = GoogleDriveUploader()
     today_iso = date.today().isoformat()
     current_year = date.today().year
     if item_type == 'Mangueiras':
@@ -22,20 +20,21 @@ def log_shipment(df_selected_items, item_type, bulletin_number):
         id_column = 'numero_identificacao'
     else:
         return
-    for _, row in df_selected_items.iterrows():
-        data_row = [today_iso, row[id_column], current_year, bulletin_number]
-        uploader.append_data_to_sheet(sheet_name, data_row)
+    data_rows = [
+        [today_iso, item_id, current_year, bulletin_number]
+        for item_id in df_selected_items[id_column]
+    ]
+    enqueue_rows_checked(sheet_name, data_rows)
 
 def select_extinguishers_for_maintenance(df_extinguishers, df_shipment_log):
-    """Seleciona ~50% dos extintores para manutenção."""
+    """Seleciona ~50% dos extintores para manutenção (espera os DataFrames tipados das abas)."""
     if df_extinguishers.empty: return pd.DataFrame()
-    df_extinguishers['data_servico'] = pd.to_datetime(df_extinguishers['data_servico'], errors='coerce')
     latest_extinguishers = df_extinguishers.sort_values('data_servico', ascending=False).drop_duplicates('numero_identificacao', keep='first')
     current_year = date.today().year
     sent_this_year = []
     if not df_shipment_log.empty and 'ano_remessa' in df_shipment_log.columns:
         if 'numero_identificacao' in df_shipment_log.columns:
-            sent_this_year = df_shipment_log[df_shipment_log['ano_remessa'].astype(str) == str(current_year)]['numero_identificacao'].tolist()
+            sent_this_year = df_shipment_log[df_shipment_log['ano_remessa'] == current_year]['numero_identificacao'].tolist()
     eligible = latest_extinguishers[~latest_extinguishers['numero_identificacao'].isin(sent_this_year)]
     if eligible.empty: return pd.DataFrame()
     eligible = eligible.sort_values(by='data_servico', ascending=True)
@@ -43,16 +42,15 @@ def select_extinguishers_for_maintenance(df_extinguishers, df_shipment_log):
     return eligible.head(num_to_select)
 
 def select_hoses_for_th(df_hoses, df_shipment_log):
-    """Seleciona ~50% das mangueiras para teste."""
+    """Seleciona ~50% das mangueiras para teste (espera os DataFrames tipados das abas)."""
     if df_hoses.empty: return pd.DataFrame()
     if 'ano_fabricacao' not in df_hoses.columns: return pd.DataFrame()
-    df_hoses['ano_fabricacao'] = pd.to_numeric(df_hoses['ano_fabricacao'], errors='coerce')
     df_hoses = df_hoses.dropna(subset=['ano_fabricacao', 'id_mangueira'])
     current_year = date.today().year
     sent_this_year = []
     if not df_shipment_log.empty and 'ano_remessa' in df_shipment_log.columns:
         if 'id_mangueira' in df_shipment_log.columns:
-            sent_this_year = df_shipment_log[df_shipment_log['ano_remessa'].astype(str) == str(current_year)]['id_mangueira'].tolist()
+            sent_this_year = df_shipment_log[df_shipment_log['ano_remessa'] == current_year]['id_mangueira'].tolist()
     eligible = df_hoses[~df_hoses['id_mangueira'].isin(sent_this_year)]
     if eligible.empty: return pd.DataFrame()
     eligible = eligible.sort_values(by='ano_fabricacao', ascending=True)
@@ -61,19 +59,6 @@ def select_hoses_for_th(df_hoses, df_shipment_log):
 
 # --- Funções de Geração de HTML e PDF ---
 
-def get_image_base64_from_drive(file_id):
-    """Baixa uma imagem do Google Drive e a converte para uma string Base64."""
-    url = f'https://drive.google.com/uc?export=download&id={file_id}'
-    try:
-        response = requests.get(url, timeout=15)
-        if response.status_code == 200:
-            encoded_string = base64.b64encode(response.content).decode('utf-8')
-            content_type = response.headers.get('Content-Type', 'image/png')
-            return f"data:{content_type};base64,{encoded_string}"
-        return None
-    except requests.exceptions.RequestException:
-        return None
-
 def generate_pdf_from_html(html_content):
     """Converte uma string HTML em um objeto de bytes de PDF usando WeasyPrint."""
     pdf_bytes = io.BytesIO()
@@ -87,7 +72,7 @@ def generate_shipment_html_and_pdf(df_selected_items, item_type, remetente_info,
     today = date.today().strftime('%d/%m/%Y')
     
     logo_file_id = "1AABdw4iGBJ7tsQ7fR1WGTP5cML3Jlfx_"
-    logo_base64 = get_image_base64_from_drive(logo_file_id)
+    logo_base64 = get_image_as_base64(f'https://drive.google.com/uc?export=download&id={logo_file_id}')
     logo_html = f'<img src="{logo_base64}" alt="Logo VIBRA">' if logo_base64 else '<h2>VIBRA ENERGIA S.A</h2>'
 
     styles = """
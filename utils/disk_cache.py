@@ -0,0 +1,110 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+# Cache persistente em disco (SQLite) com limite de tamanho e descarte LRU:
+# quando o total de bytes passa do limite, saem primeiro as entradas acessadas há mais tempo.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access);
+"""
+
+
+class DiskLRUCache:
+    """
+    Cache chave -> bytes gravado em um arquivo SQLite, limitado a 'max_bytes'.
+    Falhas de leitura/gravação são registradas no log e tratadas como ausência no cache,
+    para que um problema no disco nunca impeça o app de funcionar.
+    """
+
+    def __init__(self, db_path, max_bytes):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, key):
+        """Retorna os bytes guardados para a chave, ou None se não estiverem no cache."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                try:
+                    row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                    if row is None:
+                        return None
+                    conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+                    return bytes(row[0])
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                logging.exception(f"Falha ao ler o cache em disco '{self.db_path}'.")
+                return None
+
+    def set(self, key, value):
+        """Grava os bytes da chave e descarta as entradas menos usadas se o limite for ultrapassado."""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                        (key, sqlite3.Binary(value), size, time.time())
+                    )
+                    self._evict(conn)
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                logging.exception(f"Falha ao gravar no cache em disco '{self.db_path}'.")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        removed = 0
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            stale_keys.append((key,))
+            removed += size
+            if removed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale_keys)
+
+    def clear(self):
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                try:
+                    conn.execute("DELETE FROM entries")
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                logging.exception(f"Falha ao limpar o cache em disco '{self.db_path}'.")
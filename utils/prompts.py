@@ -231,3 +231,50 @@ def get_air_quality_prompt():
       }
     }
     """
+
+def get_field_repair_prompt(key, is_list, pending_json):
+    """
+    Retorna um prompt curto para pedir de novo apenas os campos que vieram ausentes
+    ou inválidos em uma extração anterior do mesmo documento.
+    """
+    if is_list:
+        output_format = f"""{{
+      "{key}": [
+        {{"indice": 0, "campo_pendente": "valor"}}
+      ]
+    }}"""
+        instructions = f"""Cada item abaixo identifica, pelo "indice", um registro da lista "{key}" já extraído do documento,
+    traz os "dados_conhecidos" desse registro (para você localizá-lo no PDF) e os "campos" que faltam.
+    Para cada item, retorne o "indice" e APENAS os campos listados em "campos"."""
+    else:
+        output_format = f"""{{
+      "{key}": {{"campo_pendente": "valor"}}
+    }}"""
+        instructions = f"""Retorne APENAS os campos listados abaixo para o objeto "{key}"."""
+
+    return f"""
+    Você já analisou este documento PDF, mas alguns campos ficaram ausentes ou em formato inválido.
+    {instructions}
+    Datas devem estar no formato AAAA-MM-DD (ou AAAA-MM-DD HH:MM:SS para data e hora).
+    Se um campo realmente não existir no documento, retorne null.
+
+    Pendências:
+    {pending_json}
+
+    **Formato de Saída OBRIGATÓRIO (apenas JSON):**
+    {output_format}
+    """
+
+def get_missing_items_prompt(original_prompt, key, id_field, extracted_ids):
+    """
+    Retorna o prompt original acrescido da lista de itens já extraídos, para pedir
+    apenas os registros que faltaram quando a resposta anterior veio incompleta.
+    """
+    return f"""{original_prompt}
+
+    **ATENÇÃO:** uma extração anterior deste documento foi interrompida. Os itens da lista "{key}"
+    com os seguintes valores de `{id_field}` JÁ foram extraídos e NÃO devem ser retornados novamente:
+    {", ".join(extracted_ids) if extracted_ids else "(nenhum)"}
+
+    Retorne no mesmo formato JSON apenas os itens restantes (uma lista vazia se não houver mais nenhum).
+    """
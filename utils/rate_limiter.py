@@ -0,0 +1,97 @@
+import time
+import random
+import logging
+import threading
+from gdrive.config import API_RATE_LIMITS, THROTTLE_MAX_ATTEMPTS, THROTTLE_BACKOFF_MAX_SECONDS
+
+# Controle de ritmo das chamadas às APIs externas (Sheets, Drive, Gemini), compartilhado por
+# todas as sessões do processo: um "balde de fichas" por API limita as chamadas por segundo e
+# um semáforo limita as chamadas simultâneas. Ao receber um erro de cota (429), o ritmo cai
+# pela metade e volta a subir aos poucos a cada sucesso (AIMD); a chamada é repetida após
+# o tempo indicado pela API (Retry-After) ou um backoff exponencial.
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador de uma API: até 'rate' chamadas por segundo (com rajadas de até 'burst')
+    e até 'max_concurrency' chamadas em andamento ao mesmo tempo.
+    """
+
+    def __init__(self, name, rate, burst, max_concurrency):
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = rate / 10
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _wait_for_token(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def _on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def _on_throttled(self, attempt, retry_after):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            if not retry_after:
+                retry_after = min(THROTTLE_BACKOFF_MAX_SECONDS, 2 ** attempt) + random.uniform(0, 1)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            return retry_after
+
+    def call(self, func, throttle_delay):
+        """
+        Executa func() respeitando o limite da API.
+        'throttle_delay' é uma função(exceção) -> None se o erro não for de cota; senão,
+        os segundos de espera indicados pela API (0 se ela não indicar).
+        Erros de cota são repetidos até THROTTLE_MAX_ATTEMPTS vezes; os demais sobem na hora.
+        """
+        for attempt in range(1, THROTTLE_MAX_ATTEMPTS + 1):
+            self._wait_for_token()
+            with self._slots:
+                try:
+                    result = func()
+                except Exception as e:
+                    delay = throttle_delay(e)
+                    if delay is None or attempt == THROTTLE_MAX_ATTEMPTS:
+                        raise
+                    waited = self._on_throttled(attempt, delay)
+                    logging.warning(
+                        f"Cota da API '{self.name}' atingida; nova tentativa em {waited:.1f}s "
+                        f"(ritmo reduzido para {self.rate:.2f} chamadas/s)."
+                    )
+                    continue
+            self._on_success()
+            return result
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_name):
+    """Retorna o limitador compartilhado da API, com os limites de API_RATE_LIMITS."""
+    with _limiters_lock:
+        limiter = _limiters.get(api_name)
+        if limiter is None:
+            rate, burst, max_concurrency = API_RATE_LIMITS[api_name]
+            limiter = AdaptiveRateLimiter(api_name, rate, burst, max_concurrency)
+            _limiters[api_name] = limiter
+        return limiter
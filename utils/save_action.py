@@ -0,0 +1,44 @@
+import uuid
+from contextlib import contextmanager
+import streamlit as st
+from streamlit.runtime.scriptrunner import RerunException
+from gdrive.write_queue import enqueue_rows, save_action_scope
+
+# Identificador de cada envio de formulário para a fila de gravação: as linhas enfileiradas
+# dentro de save_action usam o identificador guardado no session_state. Se o script for
+# interrompido no meio da gravação por um rerun (ex.: clique duplo), a nova execução
+# reaproveita o mesmo identificador e a fila ignora as linhas já enfileiradas. Em qualquer
+# outro fim do bloco (sucesso, st.stop, erro) o identificador é descartado, e o próximo envio
+# do formulário é uma ação nova.
+
+
+@contextmanager
+def save_action(form_key):
+    """Bloco de gravação do formulário 'form_key' (ex.: 'extinguisher_batch')."""
+    state_key = f"save_action_{form_key}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = uuid.uuid4().hex
+    interrupted = False
+    try:
+        with save_action_scope(st.session_state[state_key]):
+            yield
+    except RerunException:
+        interrupted = True
+        raise
+    finally:
+        if not interrupted:
+            st.session_state.pop(state_key, None)
+
+
+def enqueue_rows_checked(sheet_name, rows):
+    """
+    Enfileira as linhas como enqueue_rows e avisa se parte delas foi ignorada por já estar
+    na fila (reenvio da mesma ação de gravação). Retorna o número de linhas novas.
+    """
+    inserted = enqueue_rows(sheet_name, rows)
+    if inserted < len(rows):
+        st.warning(
+            f"{len(rows) - inserted} de {len(rows)} linha(s) da aba '{sheet_name}' já estavam na fila "
+            f"de gravação por um envio anterior e não foram gravadas de novo."
+        )
+    return inserted